@@ -0,0 +1,14 @@
+-- Migration to support content-addressed photo files
+-- Photos uploaded with photo_storage = "filesystem" keep their bytes under /data/photos
+-- and reference them by SHA-256 hash; photo_data stays populated only for legacy rows
+
+ALTER TABLE animal_photos ADD COLUMN IF NOT EXISTS photo_hash VARCHAR(64);
+ALTER TABLE animal_photos ALTER COLUMN photo_data DROP NOT NULL;
+CREATE INDEX IF NOT EXISTS idx_animal_photos_photo_hash ON animal_photos(photo_hash);
+
+ALTER TABLE asset_photos ADD COLUMN IF NOT EXISTS photo_hash VARCHAR(64);
+ALTER TABLE asset_photos ALTER COLUMN photo_data DROP NOT NULL;
+CREATE INDEX IF NOT EXISTS idx_asset_photos_photo_hash ON asset_photos(photo_hash);
+
+COMMENT ON COLUMN animal_photos.photo_hash IS 'SHA-256 of the photo file in the file store (NULL when stored in photo_data)';
+COMMENT ON COLUMN asset_photos.photo_hash IS 'SHA-256 of the photo file in the file store (NULL when stored in photo_data)';
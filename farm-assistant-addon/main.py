@@ -2,18 +2,27 @@
 import json
 import os
 import sys
+import asyncio
 import asyncpg
+import ast
+import hashlib
+import io
+import itertools
 import logging
-from datetime import datetime, timedelta
-from fastapi import FastAPI, Request, HTTPException, UploadFile, File
+import time
+from datetime import date, datetime, timedelta, time as dt_time
+from decimal import Decimal, InvalidOperation
+from fastapi import FastAPI, Request, Response, HTTPException, UploadFile, File
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import HTMLResponse, FileResponse, JSONResponse
+from fastapi.responses import HTMLResponse, FileResponse, JSONResponse, StreamingResponse
+from fastapi.encoders import jsonable_encoder
 from fastapi.exceptions import RequestValidationError
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from pydantic import BaseModel
 from typing import List, Dict, Optional
 import zipfile
+from email.utils import formatdate
 import tempfile
 
 # Configure logging
@@ -58,12 +67,203 @@ logging.info(f"Database configuration loaded: Host={DB_HOST}, Port={DB_PORT}, Us
 
 DATABASE_URL = f"postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
 
+# Connection pool settings (optional in options.json)
+DB_POOL_MIN_SIZE = config.get("db_pool_min_size", 2)
+DB_POOL_MAX_SIZE = config.get("db_pool_max_size", 10)
+DB_POOL_ACQUIRE_TIMEOUT = config.get("db_pool_acquire_timeout", 10)
+DB_COMMAND_TIMEOUT = config.get("db_command_timeout", 60)
+
+# Seconds a cached list response stays valid (writes through the API invalidate it immediately)
+RESPONSE_CACHE_TTL = config.get("response_cache_ttl", 300)
+
+# Photo storage: "filesystem" (content-addressed files) or "database" (legacy BYTEA columns)
+PHOTO_STORAGE = config.get("photo_storage", "filesystem")
+PHOTO_STORAGE_PATH = config.get("photo_storage_path", "data/photos" if os.path.exists("data") else "/data/photos")
+
+# Per-request calendar tracing (can also be enabled per request with ?debug=true)
+CALENDAR_DEBUG = bool(config.get("calendar_debug", False))
+
+db_pool = None
+
+async def init_db_pool():
+    """Creates the application-wide connection pool if it does not exist yet."""
+    global db_pool
+    if db_pool is None:
+        logging.info(f"Creating database connection pool (min={DB_POOL_MIN_SIZE}, max={DB_POOL_MAX_SIZE})...")
+        db_pool = await asyncpg.create_pool(
+            DATABASE_URL,
+            min_size=DB_POOL_MIN_SIZE,
+            max_size=DB_POOL_MAX_SIZE,
+            command_timeout=DB_COMMAND_TIMEOUT,
+            timeout=10
+        )
+    return db_pool
+
+async def close_db_pool():
+    """Closes the connection pool, waiting for acquired connections to be released."""
+    global db_pool
+    if db_pool is not None:
+        logging.info("Closing database connection pool...")
+        try:
+            await asyncio.wait_for(db_pool.close(), timeout=DB_POOL_ACQUIRE_TIMEOUT)
+        except asyncio.TimeoutError:
+            logging.warning("Timed out waiting for database connections to be released, terminating pool.")
+            db_pool.terminate()
+        db_pool = None
+
+async def acquire_connection():
+    """Acquires a connection from the pool (created lazily if startup could not reach the database)."""
+    pool = await init_db_pool()
+    try:
+        return await pool.acquire(timeout=DB_POOL_ACQUIRE_TIMEOUT)
+    except asyncio.TimeoutError:
+        logging.error(f"Timed out after {DB_POOL_ACQUIRE_TIMEOUT}s waiting for a database connection")
+        raise HTTPException(status_code=503, detail="Database is busy, please try again")
+
+async def release_connection(conn):
+    """Returns a connection acquired with acquire_connection() to the pool."""
+    if db_pool is not None:
+        await db_pool.release(conn)
+    else:
+        await conn.close()
+
+# --- Prepared Statements ---
+
+# Hot read queries, prepared once per pooled connection (asyncpg's statement cache) and reused by the handlers
+PREPARED_QUERIES = {
+    "animals_with_parents": """
+        SELECT
+            lr.id, lr.tag_id, lr.name, lr.breed, lr.birth_date, lr.gender, lr.health_status, lr.notes, lr.created_at, 
+            dam.name as dam_name, sire.name as sire_name, 
+            lr.status, lr.features, lr.photo_path, lr.pic, lr.dod
+        FROM livestock_records lr
+        LEFT JOIN livestock_records dam ON lr.dam_id = dam.id
+        LEFT JOIN livestock_records sire ON lr.sire_id = sire.id
+        ORDER BY lr.name
+    """,
+    "animals_dropdown": "SELECT id, name, gender FROM livestock_records ORDER BY name",
+    "animal_genders": "SELECT gender FROM livestock_records WHERE gender IS NOT NULL ORDER BY gender",
+    "assets_all": """
+        SELECT id, name, make, model, location, status, quantity, category,
+               serial_number, purchase_date, registration_no, registration_due,
+               permit_info, insurance_info, insurance_due, warranty_provider,
+               warranty_expiry_date, purchase_price, purchase_location,
+               manual_or_doc_path, notes, parent_asset_id, body_feature, badge, created_at
+        FROM asset_inventory 
+        ORDER BY name
+    """,
+    "assets_by_parent": """
+        SELECT id, name, make, model, location, status, quantity, category,
+               serial_number, purchase_date, registration_no, registration_due,
+               permit_info, insurance_info, insurance_due, warranty_provider,
+               warranty_expiry_date, purchase_price, purchase_location,
+               manual_or_doc_path, notes, parent_asset_id, body_feature, badge, created_at
+        FROM asset_inventory 
+        WHERE parent_asset_id = $1
+        ORDER BY name
+    """,
+    "asset_by_id": """
+        SELECT id, name, make, model, location, status, quantity, category,
+               serial_number, purchase_date, registration_no, registration_due,
+               permit_info, insurance_info, insurance_due, warranty_provider,
+               warranty_expiry_date, purchase_price, purchase_location,
+               manual_or_doc_path, notes, parent_asset_id, body_feature, badge, created_at,
+               year
+        FROM asset_inventory 
+        WHERE id = $1
+    """,
+    "asset_latest_usage": """
+        SELECT usage_type, usage_value, timestamp
+        FROM asset_usage_log 
+        WHERE asset_id = $1 
+        ORDER BY timestamp DESC 
+        LIMIT 1
+    """,
+    "vehicle_makes": "SELECT DISTINCT make FROM vehicle_data ORDER BY make",
+    "vehicle_makes_by_category": "SELECT DISTINCT make FROM vehicle_data WHERE category = $1 ORDER BY make",
+    "vehicle_models": "SELECT DISTINCT model FROM vehicle_data ORDER BY model",
+    "vehicle_models_by_make": "SELECT DISTINCT model FROM vehicle_data WHERE make = $1 ORDER BY model",
+    "vehicle_years": """
+        SELECT DISTINCT year_start, year_end 
+        FROM vehicle_data 
+        ORDER BY year_start
+    """,
+    "vehicle_years_by_make": """
+        SELECT DISTINCT year_start, year_end 
+        FROM vehicle_data 
+        WHERE make = $1 
+        ORDER BY year_start
+    """,
+    "vehicle_years_by_make_model": """
+        SELECT DISTINCT year_start, year_end 
+        FROM vehicle_data 
+        WHERE make = $1 AND model = $2 
+        ORDER BY year_start
+    """,
+}
+
+async def fetch_prepared(conn, name, *args):
+    """Runs a registered statement and returns all rows.
+
+    asyncpg prepares each query once per connection and keeps it in that
+    connection's statement cache, which is dropped with the connection and
+    re-prepared automatically when a migration changes the underlying tables.
+    """
+    return await conn.fetch(PREPARED_QUERIES[name], *args)
+
+async def fetchrow_prepared(conn, name, *args):
+    """Runs a registered statement and returns the first row."""
+    return await conn.fetchrow(PREPARED_QUERIES[name], *args)
+
+# --- Response Cache ---
+
+# (group, key) -> (etag, body, created); groups are invalidated by the write endpoints
+response_cache = {}
+# Bumped on every invalidation so a load that raced a write is not stored
+response_cache_generations = {}
+
+def invalidate_response_cache(*groups):
+    """Drops all cached responses in the given groups (e.g. "animals", "assets")."""
+    for group in groups:
+        response_cache_generations[group] = response_cache_generations.get(group, 0) + 1
+    for cache_key in [k for k in response_cache if k[0] in groups]:
+        del response_cache[cache_key]
+
+def etag_matches(request, etag):
+    """True when the request's If-None-Match already names `etag`"""
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    return if_none_match.strip() == "*" or etag in [t.strip() for t in if_none_match.split(",")]
+
+async def cached_json_response(request, group, key, loader):
+    """Returns a JSON response from the cache, calling `loader` on a miss.
+
+    Responses carry a strong ETag; a matching If-None-Match returns 304 without a body.
+    """
+    cache_key = (group, key)
+    entry = response_cache.get(cache_key)
+    if entry is None or time.monotonic() - entry[2] > RESPONSE_CACHE_TTL:
+        generation = response_cache_generations.get(group, 0)
+        data = await loader()
+        body = JSONResponse(content=jsonable_encoder(data)).body
+        etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+        entry = (etag, body, time.monotonic())
+        if response_cache_generations.get(group, 0) == generation:
+            response_cache[cache_key] = entry
+    
+    etag, body, _ = entry
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
 async def check_connection():
     """Checks if a connection to the database can be established."""
     try:
         logging.info(f"Attempting to connect to the database at {DB_HOST}...")
-        conn = await asyncpg.connect(DATABASE_URL, timeout=10)
-        await conn.close()
+        pool = await init_db_pool()
+        await pool.fetchval("SELECT 1")
         logging.info("Database connection successful.")
         return True
     except Exception as e:
@@ -95,6 +295,13 @@ async def startup_event():
     if not await check_connection():
         logging.error("Database connection failed. The application will not work correctly.")
     await create_chemical_table()
+    await ensure_photo_storage_schema()
+    start_photo_variant_worker()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await stop_photo_variant_worker()
+    await close_db_pool()
 
 # Use local paths for development, production paths for container
 static_dir = "static" if os.path.exists("static") else "/app/static"
@@ -209,18 +416,11 @@ async def read_item(request: Request):
         except:
             continue
     try:
-        conn = await asyncpg.connect(DATABASE_URL)
-        records = await conn.fetch("""
-            SELECT
-                lr.id, lr.tag_id, lr.name, lr.breed, lr.birth_date, lr.gender, lr.health_status, lr.notes, lr.created_at, 
-                dam.name as dam_name, sire.name as sire_name, 
-                lr.status, lr.features, lr.photo_path, lr.pic, lr.dod
-            FROM livestock_records lr
-            LEFT JOIN livestock_records dam ON lr.dam_id = dam.id
-            LEFT JOIN livestock_records sire ON lr.sire_id = sire.id
-            ORDER BY lr.name
-        """)
-        await conn.close()
+        conn = await acquire_connection()
+        try:
+            records = await fetch_prepared(conn, "animals_with_parents")
+        finally:
+            await release_connection(conn)
         animals = [dict(record) for record in records]
         for animal in animals:
             animal['animal_type'] = get_animal_type(animal['gender'])
@@ -233,43 +433,47 @@ async def read_item(request: Request):
 
 
 @app.get("/get_animals")
-async def get_animals():
-    try:
-        conn = await asyncpg.connect(DATABASE_URL)
-        records = await conn.fetch("""
-            SELECT
-                lr.id, lr.tag_id, lr.name, lr.breed, lr.birth_date, lr.gender, lr.health_status, lr.notes, lr.created_at, 
-                dam.name as dam_name, sire.name as sire_name, 
-                lr.status, lr.features, lr.photo_path, lr.pic, lr.dod
-            FROM livestock_records lr
-            LEFT JOIN livestock_records dam ON lr.dam_id = dam.id
-            LEFT JOIN livestock_records sire ON lr.sire_id = sire.id
-            ORDER BY lr.name
-        """)
-        await conn.close()
+async def get_animals(request: Request):
+    async def load_animals():
+        conn = await acquire_connection()
+        try:
+            records = await fetch_prepared(conn, "animals_with_parents")
+        finally:
+            await release_connection(conn)
         logging.info(f"Fetched {len(records)} animals from database.")
         animals = [dict(record) for record in records]
         for animal in animals:
             animal['animal_type'] = get_animal_type(animal['gender'])
         return animals
+    
+    try:
+        return await cached_json_response(request, "animals", "get_animals", load_animals)
+    except HTTPException:
+        raise
     except Exception as e:
         logging.error(f"Error fetching animals: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/animals")
-async def get_animals_for_dropdown():
-    conn = await asyncpg.connect(DATABASE_URL)
-    records = await conn.fetch("SELECT id, name, gender FROM livestock_records ORDER BY name")
-    await conn.close()
-    animals = [dict(record) for record in records]
-    return animals
+async def get_animals_for_dropdown(request: Request):
+    async def load_animals():
+        conn = await acquire_connection()
+        try:
+            records = await fetch_prepared(conn, "animals_dropdown")
+        finally:
+            await release_connection(conn)
+        return [dict(record) for record in records]
+    
+    return await cached_json_response(request, "animals", "api_animals", load_animals)
 
 @app.get("/api/animal-types")
-async def get_available_animal_types():
-    try:
-        conn = await asyncpg.connect(DATABASE_URL)
-        records = await conn.fetch("SELECT gender FROM livestock_records WHERE gender IS NOT NULL ORDER BY gender")
-        await conn.close()
+async def get_available_animal_types(request: Request):
+    async def load_animal_types():
+        conn = await acquire_connection()
+        try:
+            records = await fetch_prepared(conn, "animal_genders")
+        finally:
+            await release_connection(conn)
         
         # Get all unique animal types from existing records
         animal_types = set()
@@ -279,16 +483,18 @@ async def get_available_animal_types():
                 animal_types.add(animal_type)
         
         # Always include "All" option
-        available_types = ["All"] + sorted(list(animal_types))
-        return available_types
+        return ["All"] + sorted(list(animal_types))
+    
+    try:
+        return await cached_json_response(request, "animals", "api_animal_types", load_animal_types)
     except Exception as e:
         logging.error(f"Error getting animal types: {e}")
         return ["All"]
 
 @app.get("/get_animal/{animal_id}")
 async def get_animal(animal_id: int):
+    conn = await acquire_connection()
     try:
-        conn = await asyncpg.connect(DATABASE_URL)
         record = await conn.fetchrow("""
             SELECT id, tag_id, name, breed, birth_date, gender, health_status, notes, created_at, 
                    dam_id, sire_id, status, features, photo_path, pic, dod,
@@ -306,20 +512,32 @@ async def get_animal(animal_id: int):
             ORDER BY birth_date DESC
         """, animal_id)
         
-        await conn.close()
         animal_data = dict(record)
         animal_data['offspring'] = [dict(off) for off in offspring]
         return animal_data
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        await release_connection(conn)
 
 @app.delete("/delete_animal/{animal_id}")
 async def delete_animal(animal_id: int):
     try:
-        conn = await asyncpg.connect(DATABASE_URL)
-        await conn.execute("DELETE FROM livestock_records WHERE id = $1", animal_id)
-        await conn.close()
+        conn = await acquire_connection()
+        try:
+            # Remove photos explicitly so their stored files can be released
+            async with conn.transaction():
+                deleted = await conn.fetch("DELETE FROM animal_photos WHERE animal_id = $1 RETURNING photo_hash, encode(sha256(photo_data), 'hex') AS blob_hash", animal_id)
+                legacy_hash = await conn.fetchval(
+                    "DELETE FROM livestock_records WHERE id = $1 RETURNING encode(sha256(photo_data), 'hex') AS blob_hash", animal_id)
+            await release_photo_files(conn, [row['photo_hash'] for row in deleted],
+                                      [row['blob_hash'] for row in deleted] + [legacy_hash])
+        finally:
+            await release_connection(conn)
+        invalidate_response_cache("animals")
         return {"message": "Animal deleted successfully"}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -336,8 +554,8 @@ async def add_animal(animal: Animal):
     if animal.status != 'Deceased':
         dod = None
 
+    conn = await acquire_connection()
     try:
-        conn = await asyncpg.connect(DATABASE_URL)
         result = await conn.fetchval("""
             INSERT INTO livestock_records 
             (tag_id, name, gender, breed, birth_date, health_status, notes, dam_id, sire_id, features, photo_path, pic, dod, status)
@@ -346,14 +564,16 @@ async def add_animal(animal: Animal):
         """, animal.tag_id, animal.name, animal.gender, animal.breed, birth_date, animal.health_status, 
               animal.notes, animal.dam_id, animal.sire_id, animal.features, animal.photo_path, 
               animal.pic, dod, animal.status)
-        await conn.close()
+        invalidate_response_cache("animals")
         return {"message": "Animal added successfully", "id": result}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        await release_connection(conn)
 
 @app.put("/update_animal/{animal_id}")
 async def update_animal(animal_id: int, animal: Animal):
-    conn = await asyncpg.connect(DATABASE_URL)
+    conn = await acquire_connection()
     try:
         logging.info(f"Updating animal {animal_id} with data: {animal}")
         
@@ -387,19 +607,20 @@ async def update_animal(animal_id: int, animal: Animal):
             
             logging.info(f"Weight history recorded for animal {animal_id}: {animal.weight}kg")
         
+        invalidate_response_cache("animals")
         logging.info(f"Animal {animal_id} updated successfully")
         return {"message": "Animal updated successfully"}
     except Exception as e:
         logging.error(f"Error updating animal {animal_id}: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
     finally:
-        await conn.close()
+        await release_connection(conn)
 
 # --- Event Management Endpoints ---
 
 @app.post("/api/events")
 async def add_event(event: Event):
-    conn = await asyncpg.connect(DATABASE_URL)
+    conn = await acquire_connection()
     try:
         logging.info(f"Adding event: {event}")
         
@@ -451,12 +672,12 @@ async def add_event(event: Event):
         logging.error(f"Error adding event: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
     finally:
-        await conn.close()
+        await release_connection(conn)
 
 @app.delete("/api/events/{event_id}")
 async def delete_event(event_id: int):
     """Delete a calendar event by ID"""
-    conn = await asyncpg.connect(DATABASE_URL)
+    conn = await acquire_connection()
     try:
         logging.info(f"Deleting event with ID: {event_id}")
         
@@ -485,12 +706,12 @@ async def delete_event(event_id: int):
         logging.error(f"Error deleting event: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
     finally:
-        await conn.close()
+        await release_connection(conn)
 
 @app.get("/api/events/{event_id}")
 async def get_event(event_id: int):
     """Get a specific calendar event by ID"""
-    conn = await asyncpg.connect(DATABASE_URL)
+    conn = await acquire_connection()
     try:
         logging.info(f"Fetching event with ID: {event_id}")
         
@@ -528,12 +749,12 @@ async def get_event(event_id: int):
         logging.error(f"Error fetching event: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
     finally:
-        await conn.close()
+        await release_connection(conn)
 
 @app.put("/api/events/{event_id}")
 async def update_event(event_id: int, event: Event):
     """Update a calendar event by ID"""
-    conn = await asyncpg.connect(DATABASE_URL)
+    conn = await acquire_connection()
     try:
         logging.info(f"Updating event {event_id}: {event}")
         
@@ -591,7 +812,7 @@ async def update_event(event_id: int, event: Event):
         logging.error(f"Error updating event: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
     finally:
-        await conn.close()
+        await release_connection(conn)
 
 class MaintenanceScheduleCreate(BaseModel):
     asset_id: int
@@ -614,7 +835,7 @@ class MaintenanceScheduleCreate(BaseModel):
 @app.post("/api/maintenance-schedule")
 async def create_maintenance_schedule(schedule: MaintenanceScheduleCreate):
     # Create the maintenance schedule
-    conn = await asyncpg.connect(DATABASE_URL)
+    conn = await acquire_connection()
     try:
         # Convert date strings to date objects for asyncpg
         # due_date is now mandatory
@@ -666,7 +887,7 @@ async def create_maintenance_schedule(schedule: MaintenanceScheduleCreate):
         
         return {"message": "Maintenance schedule created successfully", "id": result['id']}
     finally:
-        await conn.close()
+        await release_connection(conn)
 
 @app.post("/api/maintenance/check-schedule")
 async def trigger_maintenance_scheduling():
@@ -676,7 +897,7 @@ async def trigger_maintenance_scheduling():
 @app.post("/api/migrate/animal_history")
 async def migrate_animal_history():
     """Create animal_history table if it doesn't exist"""
-    conn = await asyncpg.connect(DATABASE_URL)
+    conn = await acquire_connection()
     try:
         # Read and execute migration script
         with open('create_animal_history_table.sql', 'r') as f:
@@ -690,12 +911,12 @@ async def migrate_animal_history():
         logging.error(f"Error running animal history migration: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
     finally:
-        await conn.close()
+        await release_connection(conn)
 
 @app.post("/api/migrate/calendar_entries")
 async def migrate_calendar_entries():
     """Create calendar_entries table if it doesn't exist"""
-    conn = await asyncpg.connect(DATABASE_URL)
+    conn = await acquire_connection()
     try:
         # Read and execute migration script
         with open('create_calendar_entries_table.sql', 'r') as f:
@@ -709,12 +930,12 @@ async def migrate_calendar_entries():
         logging.error(f"Error running calendar entries migration: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
     finally:
-        await conn.close()
+        await release_connection(conn)
 
 @app.post("/api/migrate/asset_badge")
 async def migrate_asset_badge():
     """Add badge field to asset_inventory table"""
-    conn = await asyncpg.connect(DATABASE_URL)
+    conn = await acquire_connection()
     try:
         # Read and execute migration script
         with open('add_badge_to_assets.sql', 'r') as f:
@@ -728,12 +949,12 @@ async def migrate_asset_badge():
         logging.error(f"Error running asset badge migration: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
     finally:
-        await conn.close()
+        await release_connection(conn)
 
 @app.post("/api/migrate/asset_year_body")
 async def migrate_asset_year_body():
     """Add year and body_feature fields to asset_inventory table"""
-    conn = await asyncpg.connect(DATABASE_URL)
+    conn = await acquire_connection()
     try:
         # Read and execute migration script
         with open('add_year_body_feature_to_assets.sql', 'r') as f:
@@ -747,12 +968,12 @@ async def migrate_asset_year_body():
         logging.error(f"Error running asset year/body migration: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
     finally:
-        await conn.close()
+        await release_connection(conn)
 
 @app.post("/api/migrate/vehicle_data")
 async def migrate_vehicle_data():
     """Create vehicle_data table and populate with data"""
-    conn = await asyncpg.connect(DATABASE_URL)
+    conn = await acquire_connection()
     try:
         # Create vehicle_data table
         with open('create_vehicle_data_table.sql', 'r') as f:
@@ -771,12 +992,12 @@ async def migrate_vehicle_data():
         logging.error(f"Error running vehicle data migration: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
     finally:
-        await conn.close()
+        await release_connection(conn)
 
 @app.post("/api/migrate/badge-feature")
 async def migrate_badge_feature():
     """Add badge/trim level support to vehicle_data table"""
-    conn = await asyncpg.connect(DATABASE_URL)
+    conn = await acquire_connection()
     try:
         # Read and execute the badge migration script
         with open('add_badge_feature_to_vehicle_data.sql', 'r') as f:
@@ -790,12 +1011,12 @@ async def migrate_badge_feature():
         logging.error(f"Error running badge feature migration: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
     finally:
-        await conn.close()
+        await release_connection(conn)
 
 @app.post("/api/migrate/weight")
 async def migrate_weight_columns():
     """Add weight columns to database tables"""
-    conn = await asyncpg.connect(DATABASE_URL)
+    conn = await acquire_connection()
     try:
         # Add weight column to livestock_records
         await conn.execute("""
@@ -838,12 +1059,12 @@ async def migrate_weight_columns():
         logging.error(f"Error in weight migration: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
     finally:
-        await conn.close()
+        await release_connection(conn)
 
 @app.post("/api/migrate/all")
 async def migrate_all():
     """Run all pending migrations"""
-    conn = await asyncpg.connect(DATABASE_URL)
+    conn = await acquire_connection()
     try:
         # Run animal history migration
         with open('create_animal_history_table.sql', 'r') as f:
@@ -877,7 +1098,7 @@ async def migrate_all():
         logging.error(f"Error running migrations: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
     finally:
-        await conn.close()
+        await release_connection(conn)
 
 # --- VIN Decoder Service ---
 from vin_decoder import decode_vin, lookup_vehicle_specifications, validate_vin
@@ -887,74 +1108,48 @@ from vin_decoder import decode_vin, lookup_vehicle_specifications, validate_vin
 @app.get("/api/vehicle/makes")
 async def get_vehicle_makes(category: str = None):
     """Get all vehicle makes, optionally filtered by category"""
-    conn = await asyncpg.connect(DATABASE_URL)
+    conn = await acquire_connection()
     try:
         if category:
-            makes = await conn.fetch(
-                "SELECT DISTINCT make FROM vehicle_data WHERE category = $1 ORDER BY make",
-                category
-            )
+            makes = await fetch_prepared(conn, "vehicle_makes_by_category", category)
         else:
-            makes = await conn.fetch(
-                "SELECT DISTINCT make FROM vehicle_data ORDER BY make"
-            )
+            makes = await fetch_prepared(conn, "vehicle_makes")
         return [make['make'] for make in makes]
     finally:
-        await conn.close()
+        await release_connection(conn)
 
 @app.get("/api/vehicle/models")
 async def get_vehicle_models(make: str = None):
     """Get vehicle models, optionally filtered by make"""
-    conn = await asyncpg.connect(DATABASE_URL)
+    conn = await acquire_connection()
     try:
         if make:
-            models = await conn.fetch(
-                "SELECT DISTINCT model FROM vehicle_data WHERE make = $1 ORDER BY model",
-                make
-            )
+            models = await fetch_prepared(conn, "vehicle_models_by_make", make)
         else:
-            models = await conn.fetch(
-                "SELECT DISTINCT model FROM vehicle_data ORDER BY model"
-            )
+            models = await fetch_prepared(conn, "vehicle_models")
         return [model['model'] for model in models]
     finally:
-        await conn.close()
+        await release_connection(conn)
 
 @app.get("/api/vehicle/years")
 async def get_vehicle_years(make: str = None, model: str = None):
     """Get vehicle years, optionally filtered by make and model"""
-    conn = await asyncpg.connect(DATABASE_URL)
+    conn = await acquire_connection()
     try:
         if make and model:
-            years = await conn.fetch(
-                """SELECT DISTINCT year_start, year_end 
-                   FROM vehicle_data 
-                   WHERE make = $1 AND model = $2 
-                   ORDER BY year_start""",
-                make, model
-            )
+            years = await fetch_prepared(conn, "vehicle_years_by_make_model", make, model)
         elif make:
-            years = await conn.fetch(
-                """SELECT DISTINCT year_start, year_end 
-                   FROM vehicle_data 
-                   WHERE make = $1 
-                   ORDER BY year_start""",
-                make
-            )
+            years = await fetch_prepared(conn, "vehicle_years_by_make", make)
         else:
-            years = await conn.fetch(
-                """SELECT DISTINCT year_start, year_end 
-                   FROM vehicle_data 
-                   ORDER BY year_start"""
-            )
+            years = await fetch_prepared(conn, "vehicle_years")
         return [{"year_start": year['year_start'], "year_end": year['year_end']} for year in years]
     finally:
-        await conn.close()
+        await release_connection(conn)
 
 @app.get("/api/vehicle/body-types")
 async def get_vehicle_body_types(make: str = None, model: str = None, year: int = None):
     """Get vehicle body types, optionally filtered by make, model, and year"""
-    conn = await asyncpg.connect(DATABASE_URL)
+    conn = await acquire_connection()
     try:
         query = "SELECT DISTINCT body_type FROM vehicle_data WHERE 1=1"
         params = []
@@ -980,12 +1175,12 @@ async def get_vehicle_body_types(make: str = None, model: str = None, year: int
         body_types = await conn.fetch(query, *params)
         return [body_type['body_type'] for body_type in body_types]
     finally:
-        await conn.close()
+        await release_connection(conn)
 
 @app.get("/api/vehicle/badges")
 async def get_vehicle_badges(make: str = None, model: str = None, year: int = None, body_type: str = None):
     """Get vehicle badges/trim levels, optionally filtered by make, model, year, and body type"""
-    conn = await asyncpg.connect(DATABASE_URL)
+    conn = await acquire_connection()
     try:
         query = "SELECT DISTINCT badge FROM vehicle_data WHERE badge IS NOT NULL AND badge != ''"
         params = []
@@ -1016,7 +1211,7 @@ async def get_vehicle_badges(make: str = None, model: str = None, year: int = No
         badges = await conn.fetch(query, *params)
         return [badge['badge'] for badge in badges]
     finally:
-        await conn.close()
+        await release_connection(conn)
 
 @app.get("/api/vin/decode/{vin}")
 async def decode_vin_endpoint(vin: str):
@@ -1052,7 +1247,7 @@ async def validate_vin_endpoint(request: dict):
 @app.get("/api/vin/vehicle-data/{vin}")
 async def get_vehicle_data_from_vin(vin: str):
     """Decode VIN and return vehicle data in database-compatible format"""
-    conn = await asyncpg.connect(DATABASE_URL)
+    conn = await acquire_connection()
     try:
         # First decode the VIN
         decoded = decode_vin(vin)
@@ -1145,12 +1340,12 @@ async def get_vehicle_data_from_vin(vin: str):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error looking up vehicle data from VIN: {str(e)}")
     finally:
-        await conn.close()
+        await release_connection(conn)
 
 @app.get("/api/vehicle/search")
 async def search_vehicles(make: str = None, model: str = None, year: int = None, body_type: str = None, badge: str = None):
     """Search vehicles with multiple filters"""
-    conn = await asyncpg.connect(DATABASE_URL)
+    conn = await acquire_connection()
     try:
         query = "SELECT make, model, year_start, year_end, body_type, badge, category FROM vehicle_data WHERE 1=1"
         params = []
@@ -1197,7 +1392,7 @@ async def search_vehicles(make: str = None, model: str = None, year: int = None,
             for v in vehicles
         ]
     finally:
-        await conn.close()
+        await release_connection(conn)
 
 # --- Vehicle Data Management Endpoints ---
 
@@ -1207,7 +1402,7 @@ async def add_vehicle_make(make: str = None, category: str = "Vehicle"):
     if not make:
         return {"success": False, "message": "Make is required"}
     
-    conn = await asyncpg.connect(DATABASE_URL)
+    conn = await acquire_connection()
     try:
         # Check if make already exists
         existing = await conn.fetchval(
@@ -1229,7 +1424,7 @@ async def add_vehicle_make(make: str = None, category: str = "Vehicle"):
         
         return {"success": True, "message": f"Make '{make}' added successfully"}
     finally:
-        await conn.close()
+        await release_connection(conn)
 
 @app.post("/api/vehicle/model")
 async def add_vehicle_model(make: str = None, model: str = None, category: str = "Vehicle"):
@@ -1237,7 +1432,7 @@ async def add_vehicle_model(make: str = None, model: str = None, category: str =
     if not make or not model:
         return {"success": False, "message": "Both make and model are required"}
     
-    conn = await asyncpg.connect(DATABASE_URL)
+    conn = await acquire_connection()
     try:
         # Check if model already exists for this make
         existing = await conn.fetchval(
@@ -1259,7 +1454,7 @@ async def add_vehicle_model(make: str = None, model: str = None, category: str =
         
         return {"success": True, "message": f"Model '{model}' added for make '{make}'"}
     finally:
-        await conn.close()
+        await release_connection(conn)
 
 @app.put("/api/vehicle/model")
 async def update_vehicle_model(make: str = None, model: str = None, year_start: int = None, year_end: int = None):
@@ -1267,7 +1462,7 @@ async def update_vehicle_model(make: str = None, model: str = None, year_start:
     if not make or not model:
         return {"success": False, "message": "Both make and model are required"}
     
-    conn = await asyncpg.connect(DATABASE_URL)
+    conn = await acquire_connection()
     try:
         # Update the model with new years
         await conn.execute(
@@ -1283,183 +1478,406 @@ async def update_vehicle_model(make: str = None, model: str = None, year_start:
     except Exception as e:
         return {"success": False, "message": f"Error updating model: {str(e)}"}
     finally:
-        await conn.close()
+        await release_connection(conn)
 
 # --- Database Backup and Restore Endpoints ---
 
-@app.get("/api/backup")
-async def backup_database():
-    """Create a complete backup of all database tables"""
-    conn = await asyncpg.connect(DATABASE_URL)
-    try:
-        # Get all table names
-        tables = await conn.fetch("""
-            SELECT tablename FROM pg_tables 
-            WHERE schemaname = 'public' 
-            AND tablename IN (
-                'asset_inventory', 'animals', 'animal_history', 'animal_weight_history',
-                'animal_photos', 'asset_photos', 'vehicle_data', 'calendar_entries'
-            )
-            ORDER BY tablename
-        """)
-        
-        backup_data = {}
-        
-        for table in tables:
-            table_name = table['tablename']
-            # Get all data from the table
-            records = await conn.fetch(f"SELECT * FROM {table_name}")
-            backup_data[table_name] = [dict(record) for record in records]
-        
-        # Create backup JSON with metadata
-        backup = {
-            "version": "1.0",
-            "created_at": datetime.now().isoformat(),
-            "description": "Farm Assistant Database Backup",
-            "tables": backup_data
-        }
-        
-        # Create temporary file
-        with tempfile.NamedTemporaryFile(mode='w', suffix='.json', delete=False) as tmp_file:
-            json.dump(backup, tmp_file, indent=2, default=str)
-            tmp_file_path = tmp_file.name
-        
-        # Create zip file
-        zip_path = tmp_file_path.replace('.json', '.zip')
-        with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-            zipf.write(tmp_file_path, f"farm_assistant_backup_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
-        
-        # Clean up temp JSON file
-        os.unlink(tmp_file_path)
-        
-        return FileResponse(
-            path=zip_path,
-            filename=f"farm_assistant_backup_{datetime.now().strftime('%Y%m%d_%H%M%S')}.zip",
-            media_type="application/zip"
-        )
-        
+# Tables included in backups, parents before the tables that reference them
+BACKUP_TABLES = [
+    'livestock_records', 'asset_inventory', 'vehicle_data', 'animal_history',
+    'animal_weight_history', 'animal_photos', 'asset_photos', 'calendar_entries',
+    'maintenance_schedules', 'maintenance_history', 'asset_usage_log', 'chemical_inventory'
+]
+BACKUP_FORMAT_VERSION = "2.0"
+# Rows fetched per round trip by the backup cursors
+BACKUP_FETCH_SIZE = 200
+# Zip output is handed to the client whenever this much has accumulated
+BACKUP_CHUNK_SIZE = 256 * 1024
+
+class BackupStreamBuffer:
+    """Write-only file object that collects zipfile output until the response drains it"""
+    
+    def __init__(self):
+        self.chunks = []
+        self.size = 0
+    
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.size += len(data)
+        return len(data)
+    
+    def flush(self):
+        pass
+    
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        self.size = 0
+        return data
+
+def backup_json_default(value):
+    """Encode dates and times as ISO strings, anything else (Decimal, UUID) via str"""
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return str(value)
+
+def backup_zip_info(name, compress_type=zipfile.ZIP_DEFLATED):
+    info = zipfile.ZipInfo(name, date_time=datetime.now().timetuple()[:6])
+    info.compress_type = compress_type
+    return info
+
+async def stream_backup():
+    """Yield a ZIP backup: manifest.json, tables/<table>.ndjson, blobs/ and photos/.
+
+    Rows are read through server-side cursors inside one read-only snapshot. Binary
+    columns become their own members and rows reference them as {"$file": name}.
+    Photos held in the file store are added once per hash. Memory use depends on
+    the chunk size, not on the size of the database. The connection is acquired
+    here, so a client that disconnects before the first chunk never holds one.
+    """
+    buffer = BackupStreamBuffer()
+    conn = await acquire_connection()
+    try:
+        async with conn.transaction(isolation='repeatable_read', readonly=True):
+            existing = {
+                row['tablename'] for row in await conn.fetch(
+                    "SELECT tablename FROM pg_tables WHERE schemaname = 'public' AND tablename = ANY($1::text[])",
+                    BACKUP_TABLES
+                )
+            }
+            manifest = {
+                "version": BACKUP_FORMAT_VERSION,
+                "created_at": datetime.now().isoformat(),
+                "description": "Farm Assistant Database Backup",
+                "tables": {},
+                "photos": 0
+            }
+            photo_hashes = set()
+            
+            with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as zipf:
+                for table_name in [t for t in BACKUP_TABLES if t in existing]:
+                    columns = await conn.fetch("""
+                        SELECT column_name, data_type FROM information_schema.columns
+                        WHERE table_schema = 'public' AND table_name = $1
+                        ORDER BY ordinal_position
+                    """, table_name)
+                    binary_columns = [c['column_name'] for c in columns if c['data_type'] == 'bytea']
+                    row_count = 0
+                    
+                    # Blob members are written while the cursor runs, so the NDJSON is
+                    # spooled (to disk once large) and added after them
+                    with tempfile.SpooledTemporaryFile(max_size=BACKUP_CHUNK_SIZE) as ndjson:
+                        async for record in conn.cursor(f"SELECT * FROM {table_name}", prefetch=BACKUP_FETCH_SIZE):
+                            row = dict(record)
+                            for column in binary_columns:
+                                if row[column] is not None:
+                                    blob_name = f"blobs/{table_name}/{column}/{row_count}.bin"
+                                    zipf.writestr(backup_zip_info(blob_name, zipfile.ZIP_STORED), bytes(row[column]))
+                                    row[column] = {"$file": blob_name}
+                            
+                            photo_hash = row.get('photo_hash')
+                            if photo_hash and photo_hash not in photo_hashes:
+                                photo_hashes.add(photo_hash)
+                                path = photo_store.path(photo_hash)
+                                if path:
+                                    src = await asyncio.to_thread(open, path, 'rb')
+                                    try:
+                                        with zipf.open(backup_zip_info(f"photos/{photo_hash}", zipfile.ZIP_STORED), 'w') as dst:
+                                            while data := await asyncio.to_thread(src.read, BACKUP_CHUNK_SIZE):
+                                                dst.write(data)
+                                                if buffer.size >= BACKUP_CHUNK_SIZE:
+                                                    yield buffer.drain()
+                                    finally:
+                                        src.close()
+                                else:
+                                    logging.warning(f"Backup: photo file missing from store: {photo_hash}")
+                            
+                            ndjson.write(json.dumps(row, default=backup_json_default).encode() + b'\n')
+                            row_count += 1
+                            if buffer.size >= BACKUP_CHUNK_SIZE:
+                                yield buffer.drain()
+                        
+                        ndjson.seek(0)
+                        with zipf.open(backup_zip_info(f"tables/{table_name}.ndjson"), 'w') as dst:
+                            for data in iter(lambda: ndjson.read(BACKUP_CHUNK_SIZE), b''):
+                                dst.write(data)
+                                if buffer.size >= BACKUP_CHUNK_SIZE:
+                                    yield buffer.drain()
+                    
+                    manifest["tables"][table_name] = {
+                        "file": f"tables/{table_name}.ndjson",
+                        "rows": row_count,
+                        "columns": [c['column_name'] for c in columns]
+                    }
+                    logging.info(f"Backed up {row_count} records from {table_name}")
+                
+                manifest["photos"] = len(photo_hashes)
+                zipf.writestr(backup_zip_info("manifest.json"), json.dumps(manifest, indent=2))
+            
+            yield buffer.drain()
     except Exception as e:
+        # Headers are already sent, so the client sees a truncated download
         logging.error(f"Backup failed: {e}")
-        raise HTTPException(status_code=500, detail=f"Backup failed: {str(e)}")
+        raise
     finally:
-        await conn.close()
+        await release_connection(conn)
+
+@app.get("/api/backup")
+async def backup_database():
+    """Stream a complete backup of all database tables as a ZIP file"""
+    filename = f"farm_assistant_backup_{datetime.now().strftime('%Y%m%d_%H%M%S')}.zip"
+    return StreamingResponse(
+        stream_backup(),
+        media_type="application/zip",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+def read_backup_records(zipf, manifest, table_name):
+    """Yield the rows of one table from a v2 backup, loading blob members back into bytes"""
+    with zipf.open(manifest["tables"][table_name]["file"]) as member:
+        for line in io.TextIOWrapper(member, encoding='utf-8'):
+            if not line.strip():
+                continue
+            row = json.loads(line)
+            for column, value in row.items():
+                if isinstance(value, dict) and "$file" in value:
+                    row[column] = zipf.read(value["$file"])
+            yield row
+
+# Rows sent per COPY call during restore
+RESTORE_BATCH_SIZE = 1000
+
+# Progress of the running restore, polled by the UI through /api/restore/progress
+restore_progress = {"status": "idle", "table": None, "rows": 0, "total_rows": 0, "message": ""}
+
+def parse_backup_time(value):
+    try:
+        return dt_time.fromisoformat(value)
+    except ValueError:
+        # Older backups wrote unpadded times such as 9:5:0
+        hours, minutes, *seconds = value.split(':')
+        return dt_time(int(hours), int(minutes), int(float(seconds[0])) if seconds else 0)
+
+def parse_backup_bytes(value):
+    # Format 1.0 backups serialised bytes with str(), e.g. "b'\\xff\\xd8...'"
+    if value.startswith(("b'", 'b"')):
+        return ast.literal_eval(value)
+    return value.encode()
+
+# Converters from backup JSON values to the Python types asyncpg's COPY expects,
+# keyed by information_schema data_type
+BACKUP_VALUE_CONVERTERS = {
+    'smallint': int,
+    'integer': int,
+    'bigint': int,
+    'numeric': lambda v: Decimal(str(v)),
+    'real': float,
+    'double precision': float,
+    'boolean': lambda v: v.lower() in ('true', 't', '1') if isinstance(v, str) else bool(v),
+    'date': lambda v: date.fromisoformat(v[:10]),
+    'timestamp without time zone': lambda v: datetime.fromisoformat(v.replace('Z', '+00:00')).replace(tzinfo=None),
+    'timestamp with time zone': lambda v: datetime.fromisoformat(v.replace('Z', '+00:00')),
+    'time without time zone': parse_backup_time,
+    'bytea': parse_backup_bytes,
+    'json': json.dumps,
+    'jsonb': json.dumps,
+    'text': str,
+    'character varying': str,
+    'character': str,
+}
+# JSON keeps these types as-is, so the converter only runs on strings
+BACKUP_CONVERT_STRINGS_ONLY = {
+    'date', 'timestamp without time zone', 'timestamp with time zone', 'time without time zone', 'bytea'
+}
+# asyncpg returns json/jsonb as text, so backed-up values already are JSON text;
+# the converter only encodes values that are not strings
+BACKUP_CONVERT_NON_STRINGS_ONLY = {'json', 'jsonb'}
+
+def backup_record_converter(columns, schema):
+    """Build a function turning a backup row (dict) into a COPY tuple for `columns`"""
+    converters = []
+    for column in columns:
+        data_type = schema[column]['data_type']
+        converter = BACKUP_VALUE_CONVERTERS.get(data_type)
+        converters.append((column, data_type, converter, data_type in BACKUP_CONVERT_STRINGS_ONLY,
+                           data_type in BACKUP_CONVERT_NON_STRINGS_ONLY))
+    
+    def convert(row):
+        values = []
+        for column, data_type, converter, strings_only, non_strings_only in converters:
+            value = row.get(column)
+            is_string = isinstance(value, str)
+            if value is not None and converter and (is_string or not strings_only) and not (is_string and non_strings_only):
+                try:
+                    value = converter(value)
+                except (ValueError, TypeError, SyntaxError, InvalidOperation) as e:
+                    raise ValueError(f"Column {column} ({data_type}) has invalid value {value!r}: {e}")
+            values.append(value)
+        return tuple(values)
+    
+    return convert
+
+def next_restore_batch(rows, convert):
+    """Read and convert up to RESTORE_BATCH_SIZE backup rows (runs in a worker thread)"""
+    return [convert(row) for row in itertools.islice(rows, RESTORE_BATCH_SIZE)]
+
+def save_backup_photo(zipf, name):
+    """Copy one photos/ member of a backup into the file store (runs in a worker thread)"""
+    return photo_store.save(zipf.read(name))
+
+def open_backup_tables(zipf):
+    """Return {table: (columns, row_count, rows)} for a backup ZIP of either format"""
+    names = zipf.namelist()
+    if "manifest.json" in names:
+        manifest = json.loads(zipf.read("manifest.json"))
+        return {
+            table_name: (info["columns"], info["rows"], read_backup_records(zipf, manifest, table_name))
+            for table_name, info in manifest.get("tables", {}).items()
+        }
+    
+    # Format 1.0: a single JSON document holding every table
+    json_files = [name for name in names if name.endswith('.json')]
+    if not json_files:
+        raise HTTPException(status_code=400, detail="No JSON backup file found in ZIP")
+    with zipf.open(json_files[0]) as f:
+        backup = json.load(f)
+    if 'tables' not in backup:
+        raise HTTPException(status_code=400, detail="Invalid backup format")
+    return {
+        table_name: (list(records[0].keys()) if records else [], len(records), iter(records))
+        for table_name, records in backup['tables'].items()
+    }
+
+@app.get("/api/restore/progress")
+async def get_restore_progress():
+    """Report the progress of the running (or last) restore"""
+    return restore_progress
 
 @app.post("/api/restore")
-async def restore_database(file: UploadFile = File(...)):
+async def restore_database(backup_file: UploadFile = File(...)):
     """Restore database from backup file"""
-    if not file.filename.endswith('.zip'):
+    if not backup_file.filename.endswith('.zip'):
         raise HTTPException(status_code=400, detail="Only ZIP backup files are supported")
+    if restore_progress["status"] == "running":
+        raise HTTPException(status_code=409, detail="A restore is already running")
+    # Claim the restore before the first await so a concurrent request sees it running
+    restore_progress.update(status="running", table=None, rows=0, total_rows=0, message="Reading backup file")
     
-    conn = await asyncpg.connect(DATABASE_URL)
-    try:
-        # Save uploaded file to temp location
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.zip') as tmp_zip:
-            content = await file.read()
-            tmp_zip.write(content)
-            tmp_zip_path = tmp_zip.name
-        
-        # Extract ZIP file
-        with tempfile.TemporaryDirectory() as tmp_dir:
-            with zipfile.ZipFile(tmp_zip_path, 'r') as zipf:
-                zipf.extractall(tmp_dir)
-            
-            # Find JSON backup file
-            backup_files = [f for f in os.listdir(tmp_dir) if f.endswith('.json')]
-            if not backup_files:
-                raise HTTPException(status_code=400, detail="No JSON backup file found in ZIP")
+    conn = None
+    saved_hashes = []
+    replaced_hashes = []
+    replaced_blob_hashes = []
+    try:
+        conn = await acquire_connection()
+        # Save uploaded file to temp location without holding it in memory
+        with tempfile.TemporaryFile(suffix='.zip') as tmp_zip:
+            while chunk := await backup_file.read(1024 * 1024):
+                await asyncio.to_thread(tmp_zip.write, chunk)
+            tmp_zip.seek(0)
             
-            backup_file = os.path.join(tmp_dir, backup_files[0])
-            
-            # Load backup data
-            with open(backup_file, 'r') as f:
-                backup = json.load(f)
-            
-            # Validate backup format
-            if 'tables' not in backup:
-                raise HTTPException(status_code=400, detail="Invalid backup format")
-            
-            # Begin transaction
-            async with conn.transaction():
-                # Clear existing data (in correct order to avoid foreign key constraints)
-                tables_to_clear = [
-                    'animal_photos', 'asset_photos', 'animal_weight_history',
-                    'calendar_entries', 'animal_history', 'vehicle_data',
-                    'asset_inventory', 'animals'
-                ]
+            with zipfile.ZipFile(tmp_zip, 'r') as zipf:
+                tables = await asyncio.to_thread(open_backup_tables, zipf)
                 
-                for table in tables_to_clear:
-                    if table in backup['tables']:
-                        await conn.execute(f"DELETE FROM {table}")
-                        logging.info(f"Cleared table: {table}")
+                # Introspect every target table once
+                schema = {}
+                for column in await conn.fetch("""
+                    SELECT table_name, column_name, data_type, column_default
+                    FROM information_schema.columns
+                    WHERE table_schema = 'public' AND table_name = ANY($1::text[])
+                """, list(tables)):
+                    schema.setdefault(column['table_name'], {})[column['column_name']] = column
                 
-                # Restore data
-                for table_name, records in backup['tables'].items():
-                    if not records:
-                        continue
+                for table_name in tables:
+                    if table_name not in schema:
+                        logging.warning(f"Restore: skipping unknown table {table_name}")
+                # Parents before the tables that reference them
+                restore_order = [t for t in BACKUP_TABLES if t in tables and t in schema]
+                restore_order += [t for t in tables if t in schema and t not in restore_order]
+                restore_progress["total_rows"] = sum(tables[t][1] for t in restore_order)
+                
+                photo_members = [name for name in zipf.namelist() if name.startswith("photos/")]
+                for index, name in enumerate(photo_members):
+                    restore_progress["message"] = f"Restoring photo files ({index + 1}/{len(photo_members)})"
+                    saved_hashes.append(await asyncio.to_thread(save_backup_photo, zipf, name))
+                
+                async with conn.transaction():
+                    # Files of the photos being replaced are released once the restore commits
+                    for table_name in ("animal_photos", "asset_photos"):
+                        if table_name in restore_order:
+                            replaced_hashes += [row['photo_hash'] for row in await conn.fetch(
+                                f"SELECT DISTINCT photo_hash FROM {table_name} WHERE photo_hash IS NOT NULL")]
+                    # as are the cached variants of photos still held in the database
+                    for table_name in ("animal_photos", "asset_photos", "livestock_records"):
+                        if table_name in restore_order:
+                            replaced_blob_hashes += [row['blob_hash'] for row in await conn.fetch(
+                                f"SELECT DISTINCT encode(sha256(photo_data), 'hex') AS blob_hash FROM {table_name} "
+                                f"WHERE photo_data IS NOT NULL")]
                     
-                    # Get column names from first record
-                    if records:
-                        columns = list(records[0].keys())
+                    # Clear existing data (in correct order to avoid foreign key constraints)
+                    for table_name in reversed(restore_order):
+                        await conn.execute(f"DELETE FROM {table_name}")
+                        logging.info(f"Cleared table: {table_name}")
+                    
+                    for table_name in restore_order:
+                        backup_columns, row_count, rows = tables[table_name]
+                        table_schema = schema[table_name]
+                        columns = [c for c in backup_columns if c in table_schema]
+                        dropped = [c for c in backup_columns if c not in table_schema]
+                        if dropped:
+                            logging.warning(f"Restore: ignoring columns no longer in {table_name}: {', '.join(dropped)}")
                         
-                        # Build INSERT query
-                        placeholders = ', '.join([f'${i+1}' for i in range(len(columns))])
-                        columns_str = ', '.join(columns)
+                        restore_progress.update(table=table_name, message=f"Restoring {table_name}")
+                        convert = backup_record_converter(columns, table_schema)
+                        restored = 0
+                        # Decompressing, parsing and converting rows is CPU-bound, so it stays off the event loop
+                        while batch := await asyncio.to_thread(next_restore_batch, rows, convert):
+                            await conn.copy_records_to_table(table_name, records=batch, columns=columns)
+                            restored += len(batch)
+                            restore_progress["rows"] += len(batch)
                         
-                        for record in records:
-                            values = []
-                            for col in columns:
-                                value = record.get(col)
-                                # Handle date conversion for known date columns
-                                if value and col in ['purchase_date', 'registration_due', 'insurance_due', 'warranty_expiry_date', 'birth_date', 'event_date']:
-                                    if isinstance(value, str):
-                                        try:
-                                            # Try to parse the date string
-                                            value = datetime.strptime(value, '%Y-%m-%d').date()
-                                        except ValueError:
-                                            try:
-                                                # Try datetime format
-                                                value = datetime.fromisoformat(value.replace('Z', '+00:00')).date()
-                                            except ValueError:
-                                                value = None
-                                # Handle datetime conversion for known datetime columns
-                                elif value and col in ['created_at', 'updated_at']:
-                                    if isinstance(value, str):
-                                        try:
-                                            # Try to parse datetime string
-                                            value = datetime.fromisoformat(value.replace('Z', '+00:00'))
-                                        except ValueError:
-                                            try:
-                                                # Try datetime with time format
-                                                value = datetime.strptime(value, '%Y-%m-%d %H:%M:%S')
-                                            except ValueError:
-                                                value = None
-                                # Handle time conversion for known time columns
-                                elif value and col in ['event_time']:
-                                    if isinstance(value, str):
-                                        try:
-                                            # Parse time string
-                                            hours, minutes, seconds = value.split(':')
-                                            value = f"{hours.zfill(2)}:{minutes.zfill(2)}:{seconds.zfill(2)}"
-                                        except ValueError:
-                                            value = None
-                                values.append(value)
-                            await conn.execute(
-                                f"INSERT INTO {table_name} ({columns_str}) VALUES ({placeholders})",
-                                *values
-                            )
+                        # COPY bypasses nextval(), so move serial sequences past the restored ids
+                        for column, info in table_schema.items():
+                            if column in columns and (info['column_default'] or '').startswith('nextval('):
+                                await conn.execute(f"""
+                                    SELECT setval(pg_get_serial_sequence('{table_name}', '{column}'),
+                                                  COALESCE(MAX({column}), 0) + 1, false)
+                                    FROM {table_name}
+                                """)
                         
-                        logging.info(f"Restored {len(records)} records to {table_name}")
-        
-        # Clean up temp files
-        os.unlink(tmp_zip_path)
-        
+                        logging.info(f"Restored {restored} records to {table_name}")
+                
+                # A concurrent release may have deleted a file between saving it and the
+                # commit; now the rows exist, restore any such file under the hash lock
+                for name, photo_hash in zip(photo_members, saved_hashes):
+                    async with conn.transaction():
+                        await lock_photo_hash(conn, photo_hash)
+                        if not await asyncio.to_thread(photo_store.path, photo_hash):
+                            await asyncio.to_thread(save_backup_photo, zipf, name)
+        
+        await release_photo_files(conn, replaced_hashes, replaced_blob_hashes)
+        invalidate_response_cache("animals", "assets")
+        restore_progress.update(status="done", table=None, message="Database restored successfully")
         return {"success": True, "message": "Database restored successfully"}
         
+    except HTTPException as e:
+        restore_progress.update(status="failed", message=e.detail)
+        raise
     except Exception as e:
         logging.error(f"Restore failed: {e}")
+        restore_progress.update(status="failed", message=f"Restore failed: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Restore failed: {str(e)}")
     finally:
-        await conn.close()
+        # CancelledError (client disconnect, ingress timeout) is not an Exception
+        if restore_progress["status"] == "running":
+            restore_progress.update(status="failed", message="Restore was interrupted")
+        if conn is not None:
+            if restore_progress["status"] == "failed" and saved_hashes:
+                # The rows were rolled back, so remove the photo files nothing references
+                try:
+                    await release_photo_files(conn, saved_hashes)
+                except Exception as e:
+                    logging.error(f"Error removing photo files of failed restore: {e}")
+            await release_connection(conn)
 
 # --- Asset Management Endpoints ---
 
@@ -1518,7 +1936,7 @@ def get_next_saturday():
 
 async def check_and_schedule_maintenance():
     """Check all maintenance schedules and create calendar events for due maintenance"""
-    conn = await asyncpg.connect(DATABASE_URL)
+    conn = await acquire_connection()
     try:
         # Get all maintenance schedules with interval-based triggers
         schedules = await conn.fetch("""
@@ -1606,71 +2024,36 @@ async def check_and_schedule_maintenance():
         logging.error(f"Error in maintenance scheduling: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
     finally:
-        await conn.close()
+        await release_connection(conn)
 
 @app.get("/api/assets")
-async def get_assets(parent_id: Optional[int] = None):
-    conn = await asyncpg.connect(DATABASE_URL)
-    try:
-        if parent_id is not None:
-            # Return only child assets of the specified parent
-            print(f"Fetching assets with parent_id: {parent_id}")
-            try:
-                 records = await conn.fetch("""
-                 SELECT id, name, make, model, location, status, quantity, category,
-                         serial_number, purchase_date, registration_no, registration_due,
-                         permit_info, insurance_info, insurance_due, warranty_provider,
-                         warranty_expiry_date, purchase_price, purchase_location,
-                         manual_or_doc_path, notes, parent_asset_id, body_feature, badge, created_at
-                 FROM asset_inventory 
-                 WHERE parent_asset_id = $1
-                  ORDER BY name
-                """, parent_id)
-                 logging.info(f"Query executed successfully, found {len(records)} records")
-            except Exception as e:
-                print(f"Database query error: {e}")
-                raise
-        else:
-            # Return all assets
-            records = await conn.fetch("""
-                 SELECT id, name, make, model, location, status, quantity, category,
-                          serial_number, purchase_date, registration_no, registration_due,
-                          permit_info, insurance_info, insurance_due, warranty_provider,
-                          warranty_expiry_date, purchase_price, purchase_location,
-                          manual_or_doc_path, notes, parent_asset_id, body_feature, badge, created_at
-                 FROM asset_inventory 
-                 ORDER BY name
-                """)
-        assets = [dict(record) for record in records]
-        return assets
-    finally:
-        await conn.close()
+async def get_assets(request: Request, parent_id: Optional[int] = None):
+    async def load_assets():
+        conn = await acquire_connection()
+        try:
+            if parent_id is not None:
+                # Return only child assets of the specified parent
+                records = await fetch_prepared(conn, "assets_by_parent", parent_id)
+                logging.info(f"Fetched {len(records)} child assets for parent {parent_id}")
+            else:
+                # Return all assets
+                records = await fetch_prepared(conn, "assets_all")
+            return [dict(record) for record in records]
+        finally:
+            await release_connection(conn)
+    
+    return await cached_json_response(request, "assets", f"api_assets:{parent_id}", load_assets)
 
 @app.get("/api/asset/{asset_id}")
 async def get_asset(asset_id: int):
-    conn = await asyncpg.connect(DATABASE_URL)
+    conn = await acquire_connection()
     try:
-        record = await conn.fetchrow("""
-            SELECT id, name, make, model, location, status, quantity, category,
-                   serial_number, purchase_date, registration_no, registration_due,
-                   permit_info, insurance_info, insurance_due, warranty_provider,
-                   warranty_expiry_date, purchase_price, purchase_location,
-                    manual_or_doc_path, notes, parent_asset_id, body_feature, badge, created_at,
-                    year
-            FROM asset_inventory 
-            WHERE id = $1
-        """, asset_id)
+        record = await fetchrow_prepared(conn, "asset_by_id", asset_id)
         if not record:
             raise HTTPException(status_code=404, detail="Asset not found")
         
         # Get latest usage reading for this asset
-        usage_record = await conn.fetchrow("""
-            SELECT usage_type, usage_value, timestamp
-            FROM asset_usage_log 
-            WHERE asset_id = $1 
-            ORDER BY timestamp DESC 
-            LIMIT 1
-        """, asset_id)
+        usage_record = await fetchrow_prepared(conn, "asset_latest_usage", asset_id)
         
         asset_data = dict(record)
         if usage_record:
@@ -1682,12 +2065,12 @@ async def get_asset(asset_id: int):
         
         return asset_data
     finally:
-        await conn.close()
+        await release_connection(conn)
 
 @app.get("/api/asset/{asset_id}/maintenance")
 async def get_asset_maintenance_history(asset_id: int):
     """Get maintenance history for a specific asset"""
-    conn = await asyncpg.connect(DATABASE_URL)
+    conn = await acquire_connection()
     try:
         # Get completed maintenance records
         maintenance_records = await conn.fetch("""
@@ -1730,12 +2113,12 @@ async def get_asset_maintenance_history(asset_id: int):
         
         return all_records
     finally:
-        await conn.close()
+        await release_connection(conn)
 
 @app.get("/api/animal/{animal_id}/weight-history")
 async def get_animal_weight_history(animal_id: int):
     """Get weight history for a specific animal"""
-    conn = await asyncpg.connect(DATABASE_URL)
+    conn = await acquire_connection()
     try:
         records = await conn.fetch("""
             SELECT id, weight, weight_unit, measurement_date, measurement_time, notes, recorded_by, created_at
@@ -1749,12 +2132,12 @@ async def get_animal_weight_history(animal_id: int):
         logging.error(f"Error fetching weight history for animal {animal_id}: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
     finally:
-        await conn.close()
+        await release_connection(conn)
 
 @app.post("/api/animal/{animal_id}/weight")
 async def record_animal_weight(animal_id: int, weight: float, notes: str = None, recorded_by: str = "User"):
     """Record a new weight measurement for an animal"""
-    conn = await asyncpg.connect(DATABASE_URL)
+    conn = await acquire_connection()
     try:
         # Insert weight record
         await conn.execute("""
@@ -1775,12 +2158,12 @@ async def record_animal_weight(animal_id: int, weight: float, notes: str = None,
         logging.error(f"Error recording weight for animal {animal_id}: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
     finally:
-        await conn.close()
+        await release_connection(conn)
 
 @app.get("/api/livestock/{animal_id}/history")
 async def get_livestock_history(animal_id: int):
     """Get history for a specific animal"""
-    conn = await asyncpg.connect(DATABASE_URL)
+    conn = await acquire_connection()
     try:
         # Get completed animal history records
         history_records = await conn.fetch("""
@@ -1827,12 +2210,237 @@ async def get_livestock_history(animal_id: int):
         
         return all_records
     finally:
-        await conn.close()
+        await release_connection(conn)
+
+# --- Photo Storage ---
+from photo_storage import FilesystemPhotoStore, PHOTO_VARIANTS, PIL_AVAILABLE, content_hash
+
+photo_store = FilesystemPhotoStore(PHOTO_STORAGE_PATH)
+
+# Hashes of newly uploaded photos waiting for their thumbnail/medium variants
+photo_variant_queue = asyncio.Queue()
+photo_variant_task = None
+
+async def photo_variant_worker():
+    """Background worker that generates resized variants after uploads"""
+    while True:
+        photo_hash = await photo_variant_queue.get()
+        try:
+            await asyncio.to_thread(photo_store.create_variants, photo_hash)
+        except Exception as e:
+            logging.error(f"Error creating photo variants for {photo_hash}: {e}")
+        finally:
+            photo_variant_queue.task_done()
+
+def start_photo_variant_worker():
+    global photo_variant_task
+    if PIL_AVAILABLE:
+        photo_variant_task = asyncio.create_task(photo_variant_worker())
+    else:
+        logging.warning("Pillow is not installed; photos will only be served at full size")
+
+async def stop_photo_variant_worker():
+    if photo_variant_task is not None:
+        photo_variant_task.cancel()
+        try:
+            await photo_variant_task
+        except asyncio.CancelledError:
+            pass
+
+async def ensure_photo_storage_schema():
+    """Add the photo_hash column used by the file store to the photo tables"""
+    conn = await acquire_connection()
+    try:
+        for table in ("animal_photos", "asset_photos"):
+            await conn.execute(f"""
+                ALTER TABLE {table} ADD COLUMN IF NOT EXISTS photo_hash VARCHAR(64);
+                ALTER TABLE {table} ALTER COLUMN photo_data DROP NOT NULL;
+                CREATE INDEX IF NOT EXISTS idx_{table}_photo_hash ON {table}(photo_hash);
+            """)
+        logging.info(f"Photo storage verified (backend={PHOTO_STORAGE}, path={PHOTO_STORAGE_PATH})")
+    except Exception as e:
+        logging.error(f"Error preparing photo storage schema: {e}")
+    finally:
+        await release_connection(conn)
+
+async def lock_photo_hash(conn, photo_hash):
+    """Hold a per-hash advisory lock until the current transaction ends.
+
+    Saving a file plus inserting its row, and checking a file is unreferenced
+    plus deleting it, both run under this lock, so neither can interleave.
+    """
+    await conn.execute("SELECT pg_advisory_xact_lock(hashtext($1))", photo_hash)
+
+async def store_photo(conn, file_content):
+    """Return the (photo_data, photo_hash) column values for a new photo.
+
+    Call inside the transaction that inserts the row, which keeps the hash locked
+    until the row is committed.
+    """
+    if PHOTO_STORAGE != "filesystem":
+        return file_content, None
+    photo_hash = await asyncio.to_thread(content_hash, file_content)
+    await lock_photo_hash(conn, photo_hash)
+    await asyncio.to_thread(photo_store.save, file_content, photo_hash)
+    if photo_variant_task is not None:
+        photo_variant_queue.put_nowait(photo_hash)
+    return None, photo_hash
+
+async def release_photo_files(conn, photo_hashes, blob_hashes=()):
+    """Delete stored files that are no longer referenced by any photo row.
+
+    `blob_hashes` are the SHA-256 of deleted rows that kept their photo in the
+    database; only their cached variants exist on disk. Those are removed
+    outright, as they are recreated on the next request if still needed.
+    """
+    for blob_hash in set(h for h in blob_hashes if h):
+        await asyncio.to_thread(photo_store.delete_variants, blob_hash)
+    for photo_hash in sorted(set(h for h in photo_hashes if h)):
+        async with conn.transaction():
+            await lock_photo_hash(conn, photo_hash)
+            in_use = await conn.fetchval("""
+                SELECT EXISTS (SELECT 1 FROM animal_photos WHERE photo_hash = $1)
+                    OR EXISTS (SELECT 1 FROM asset_photos WHERE photo_hash = $1)
+            """, photo_hash)
+            if not in_use:
+                await asyncio.to_thread(photo_store.delete, photo_hash)
+
+# Photos never change once uploaded, so id-addressed URLs can be cached for a year
+PHOTO_CACHE_IMMUTABLE = "private, max-age=31536000, immutable"
+# Primary-photo URLs change target when photos are added or deleted
+PHOTO_CACHE_REVALIDATE = "private, no-cache"
+
+def photo_etag(record, size=None):
+    """Strong ETag from the photo id, its content hash and the requested variant
+
+    Legacy BYTEA rows use the md5 that the query computed in SQL, so the blob
+    itself is only fetched when the ETag does not match.
+    """
+    content_hash = record['photo_hash'] or record['blob_md5']
+    variant = size if size in PHOTO_VARIANTS and PIL_AVAILABLE else "original"
+    return f'"{record.get("id") or 0}-{content_hash[:32]}-{variant}"'
+
+def byte_range_response(request, data, media_type, headers):
+    """Serve BYTEA content, honouring a single `Range: bytes=` request"""
+    headers = {**headers, "Accept-Ranges": "bytes"}
+    range_header = request.headers.get("range", "")
+    if_range = request.headers.get("if-range")
+    total = len(data)
+    if not range_header.startswith("bytes=") or "," in range_header or (if_range and if_range != headers.get("ETag")):
+        return Response(content=data, media_type=media_type, headers=headers)
+    
+    first, _, last = range_header[6:].strip().partition("-")
+    try:
+        if first:
+            start = int(first)
+            end = int(last) if last else total - 1
+        else:
+            start = max(total - int(last), 0)
+            end = total - 1
+    except ValueError:
+        return Response(content=data, media_type=media_type, headers=headers)
+    # A last byte before the first is syntactically invalid, so the header is ignored (RFC 9110 14.1.1)
+    if start > end:
+        return Response(content=data, media_type=media_type, headers=headers)
+    end = min(end, total - 1)
+    
+    if start >= total or start > end:
+        return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{total}"})
+    headers["Content-Range"] = f"bytes {start}-{end}/{total}"
+    return Response(content=data[start:end + 1], status_code=206, media_type=media_type, headers=headers)
+
+async def photo_response(request, record, filename, size=None, immutable=False, load_data=None):
+    """Stream a photo from the file store, or return the legacy BYTEA content.
+
+    `size` selects a resized variant (thumb/medium); it falls back to the original
+    when Pillow is unavailable or the size is unknown. Responses carry a strong ETag,
+    a matching If-None-Match returns 304, and Range requests are honoured.
+    `load_data` fetches the BYTEA content of a legacy row, after the ETag check.
+    """
+    etag = photo_etag(record, size)
+    headers = {
+        "ETag": etag,
+        "Cache-Control": PHOTO_CACHE_IMMUTABLE if immutable else PHOTO_CACHE_REVALIDATE,
+    }
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    
+    headers["Content-Disposition"] = f"inline; filename={filename}"
+    media_type = record['photo_mime_type'] or 'image/jpeg'
+    if size in PHOTO_VARIANTS and PIL_AVAILABLE:
+        try:
+            if record['photo_hash']:
+                variant = await asyncio.to_thread(photo_store.variant, record['photo_hash'], size)
+            else:
+                # Legacy row: cache the variant under the hash of the BLOB
+                data = bytes(await load_data())
+                variant = await asyncio.to_thread(photo_store.variant, content_hash(data), size, data)
+            if variant:
+                variant_path, variant_media_type = variant
+                # The variant is re-encoded, so its name carries the variant's extension
+                headers["Content-Disposition"] = (
+                    f"inline; filename={os.path.splitext(filename)[0]}{os.path.splitext(variant_path)[1]}")
+                return FileResponse(variant_path, media_type=variant_media_type, headers=headers)
+        except Exception as e:
+            logging.error(f"Error creating {size} variant, serving original: {e}")
+    if record['photo_hash']:
+        path = photo_store.path(record['photo_hash'])
+        if not path:
+            logging.error(f"Photo file missing from store: {record['photo_hash']}")
+            raise HTTPException(status_code=404, detail="Photo not found")
+        # FileResponse handles Range/If-Range and adds Last-Modified from the file
+        return FileResponse(path, media_type=media_type, headers=headers)
+    
+    upload_time = record.get('upload_time')
+    if upload_time:
+        headers["Last-Modified"] = formatdate(upload_time.timestamp(), usegmt=True)
+    return byte_range_response(request, bytes(await load_data()), media_type, headers)
+
+@app.post("/api/migrate/photos-to-files")
+async def migrate_photos_to_files(batch_size: int = 20):
+    """Move photo BYTEA data out of the database into the file store"""
+    conn = await acquire_connection()
+    try:
+        moved = {}
+        for table in ("animal_photos", "asset_photos"):
+            moved[table] = 0
+            last_id = 0
+            # Work in small batches so only a few photos are in memory at once
+            while True:
+                rows = await conn.fetch(f"""
+                    SELECT id, photo_data FROM {table}
+                    WHERE photo_hash IS NULL AND photo_data IS NOT NULL AND id > $1
+                    ORDER BY id
+                    LIMIT $2
+                """, last_id, batch_size)
+                if not rows:
+                    break
+                for row in rows:
+                    data = bytes(row['photo_data'])
+                    async with conn.transaction():
+                        photo_hash = await asyncio.to_thread(content_hash, data)
+                        await lock_photo_hash(conn, photo_hash)
+                        await asyncio.to_thread(photo_store.save, data, photo_hash)
+                        await conn.execute(
+                            f"UPDATE {table} SET photo_hash = $1, photo_data = NULL WHERE id = $2",
+                            photo_hash, row['id']
+                        )
+                    if photo_variant_task is not None:
+                        photo_variant_queue.put_nowait(photo_hash)
+                    moved[table] += 1
+                last_id = rows[-1]['id']
+            logging.info(f"Moved {moved[table]} photos from {table} to {PHOTO_STORAGE_PATH}")
+        return {"message": "Photos moved to file storage successfully", "moved": moved}
+    except Exception as e:
+        logging.error(f"Error migrating photos to file storage: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        await release_connection(conn)
 
 @app.post("/api/animal/{animal_id}/photo")
 async def upload_animal_photo(animal_id: int, file: UploadFile = File(...)):
     """Upload and store a photo for an animal"""
-    conn = await asyncpg.connect(DATABASE_URL)
+    conn = await acquire_connection()
     try:
         # Validate file type
         if not file.content_type or not file.content_type.startswith('image/'):
@@ -1845,12 +2453,14 @@ async def upload_animal_photo(animal_id: int, file: UploadFile = File(...)):
         if len(file_content) > 5 * 1024 * 1024:
             raise HTTPException(status_code=400, detail="File size must be less than 5MB")
         
-        # Insert photo into animal_photos table
-        await conn.execute("""
-            INSERT INTO animal_photos (animal_id, photo_data, photo_mime_type, filename, file_size)
-            VALUES ($1, $2, $3, $4, $5)
-            RETURNING id
-        """, animal_id, file_content, file.content_type, file.filename, len(file_content))
+        # Insert photo into animal_photos table (content goes to the file store)
+        async with conn.transaction():
+            photo_data, photo_hash = await store_photo(conn, file_content)
+            await conn.execute("""
+                INSERT INTO animal_photos (animal_id, photo_data, photo_hash, photo_mime_type, filename, file_size)
+                VALUES ($1, $2, $3, $4, $5, $6)
+                RETURNING id
+            """, animal_id, photo_data, photo_hash, file.content_type, file.filename, len(file_content))
         
         return {"message": "Photo uploaded successfully", "filename": file.filename}
         
@@ -1860,12 +2470,12 @@ async def upload_animal_photo(animal_id: int, file: UploadFile = File(...)):
         logging.error(f"Error uploading photo for animal {animal_id}: {e}")
         raise HTTPException(status_code=500, detail="Failed to upload photo")
     finally:
-        await conn.close()
+        await release_connection(conn)
 
 @app.get("/api/animal/{animal_id}/photos")
 async def get_animal_photos(animal_id: int):
     """Retrieve all photos for an animal"""
-    conn = await asyncpg.connect(DATABASE_URL)
+    conn = await acquire_connection()
     try:
         photos = await conn.fetch("""
             SELECT id, filename, photo_mime_type, upload_time, file_size, description
@@ -1890,15 +2500,16 @@ async def get_animal_photos(animal_id: int):
         logging.error(f"Error retrieving photos for animal {animal_id}: {e}")
         raise HTTPException(status_code=500, detail="Failed to retrieve photos")
     finally:
-        await conn.close()
+        await release_connection(conn)
 
 @app.get("/api/animal/{animal_id}/photo/{photo_id}")
-async def get_animal_photo(animal_id: int, photo_id: int):
+async def get_animal_photo(request: Request, animal_id: int, photo_id: int, size: Optional[str] = None):
     """Retrieve a specific photo for an animal"""
-    conn = await asyncpg.connect(DATABASE_URL)
+    conn = await acquire_connection()
     try:
         record = await conn.fetchrow("""
-            SELECT photo_data, photo_mime_type, filename
+            SELECT id, CASE WHEN photo_hash IS NULL THEN md5(photo_data) END AS blob_md5,
+                   photo_hash, photo_mime_type, filename, upload_time
             FROM animal_photos 
             WHERE id = $1 AND animal_id = $2
         """, photo_id, animal_id)
@@ -1906,12 +2517,8 @@ async def get_animal_photo(animal_id: int, photo_id: int):
         if not record:
             raise HTTPException(status_code=404, detail="Photo not found")
         
-        from fastapi.responses import Response
-        return Response(
-            content=record['photo_data'],
-            media_type=record['photo_mime_type'],
-            headers={"Content-Disposition": f"inline; filename={record['filename']}"}
-        )
+        return await photo_response(request, record, record['filename'], size, immutable=True,
+                                    load_data=lambda: conn.fetchval("SELECT photo_data FROM animal_photos WHERE id = $1", photo_id))
         
     except HTTPException:
         raise
@@ -1919,17 +2526,18 @@ async def get_animal_photo(animal_id: int, photo_id: int):
         logging.error(f"Error retrieving photo {photo_id} for animal {animal_id}: {e}")
         raise HTTPException(status_code=500, detail="Failed to retrieve photo")
     finally:
-        await conn.close()
+        await release_connection(conn)
 
 # Keep old endpoint for backward compatibility
 @app.get("/api/animal/{animal_id}/photo")
-async def get_animal_photo_legacy(animal_id: int):
+async def get_animal_photo_legacy(request: Request, animal_id: int, size: Optional[str] = None):
     """Retrieve an animal's primary photo (legacy endpoint)"""
-    conn = await asyncpg.connect(DATABASE_URL)
+    conn = await acquire_connection()
     try:
         # First try new table, fallback to old table
         record = await conn.fetchrow("""
-            SELECT ap.photo_data, ap.photo_mime_type, ap.filename
+            SELECT ap.id, CASE WHEN ap.photo_hash IS NULL THEN md5(ap.photo_data) END AS blob_md5,
+                   ap.photo_hash, ap.photo_mime_type, ap.filename, ap.upload_time
             FROM animal_photos ap
             WHERE ap.animal_id = $1 
             ORDER BY ap.upload_time ASC
@@ -1939,7 +2547,7 @@ async def get_animal_photo_legacy(animal_id: int):
         if not record:
             # Fallback to old single photo in livestock_records
             record = await conn.fetchrow("""
-                SELECT photo_data, photo_mime_type, photo_path
+                SELECT md5(photo_data) AS blob_md5, NULL AS photo_hash, photo_mime_type, photo_path
                 FROM livestock_records 
                 WHERE id = $1 AND photo_data IS NOT NULL
             """, animal_id)
@@ -1947,12 +2555,12 @@ async def get_animal_photo_legacy(animal_id: int):
         if not record:
             raise HTTPException(status_code=404, detail="Photo not found")
         
-        from fastapi.responses import Response
-        return Response(
-            content=record['photo_data'],
-            media_type=record['photo_mime_type'] or 'image/jpeg',
-            headers={"Content-Disposition": f"inline; filename={record.get('filename', record.get('photo_path', 'photo.jpg'))}"}
-        )
+        if record.get('id') is not None:
+            load_data = lambda: conn.fetchval("SELECT photo_data FROM animal_photos WHERE id = $1", record['id'])
+        else:
+            load_data = lambda: conn.fetchval("SELECT photo_data FROM livestock_records WHERE id = $1", animal_id)
+        return await photo_response(request, record, record.get('filename', record.get('photo_path', 'photo.jpg')), size,
+                                    load_data=load_data)
         
     except HTTPException:
         raise
@@ -1960,21 +2568,23 @@ async def get_animal_photo_legacy(animal_id: int):
         logging.error(f"Error retrieving photo for animal {animal_id}: {e}")
         raise HTTPException(status_code=500, detail="Failed to retrieve photo")
     finally:
-        await conn.close()
+        await release_connection(conn)
 
 @app.delete("/api/animal/{animal_id}/photo/{photo_id}")
 async def delete_animal_photo(animal_id: int, photo_id: int):
     """Delete a specific photo for an animal"""
-    conn = await asyncpg.connect(DATABASE_URL)
+    conn = await acquire_connection()
     try:
-        result = await conn.execute("""
+        deleted = await conn.fetch("""
             DELETE FROM animal_photos 
             WHERE id = $1 AND animal_id = $2
+            RETURNING photo_hash, encode(sha256(photo_data), 'hex') AS blob_hash
         """, photo_id, animal_id)
         
-        if "DELETE 0" in result:
+        if not deleted:
             raise HTTPException(status_code=404, detail="Photo not found")
-            
+        
+        await release_photo_files(conn, [row['photo_hash'] for row in deleted], [row['blob_hash'] for row in deleted])
         return {"message": "Photo deleted successfully"}
         
     except HTTPException:
@@ -1983,29 +2593,35 @@ async def delete_animal_photo(animal_id: int, photo_id: int):
         logging.error(f"Error deleting photo {photo_id} for animal {animal_id}: {e}")
         raise HTTPException(status_code=500, detail="Failed to delete photo")
     finally:
-        await conn.close()
+        await release_connection(conn)
 
 # Keep old endpoint for backward compatibility
 @app.delete("/api/animal/{animal_id}/photo")
 async def delete_animal_photo_legacy(animal_id: int):
     """Delete all photos for an animal (legacy endpoint)"""
-    conn = await asyncpg.connect(DATABASE_URL)
+    conn = await acquire_connection()
     try:
         # Delete from new table
-        await conn.execute("""
-            DELETE FROM animal_photos WHERE animal_id = $1
+        deleted = await conn.fetch("""
+            DELETE FROM animal_photos WHERE animal_id = $1 RETURNING photo_hash, encode(sha256(photo_data), 'hex') AS blob_hash
         """, animal_id)
+        await release_photo_files(conn, [row['photo_hash'] for row in deleted], [row['blob_hash'] for row in deleted])
         
         # Clear from old table
-        result = await conn.execute("""
-            UPDATE livestock_records 
+        cleared = await conn.fetch("""
+            UPDATE livestock_records AS l
             SET photo_data = NULL, photo_mime_type = NULL, photo_path = NULL
-            WHERE id = $1
+            FROM (SELECT id, encode(sha256(photo_data), 'hex') AS blob_hash FROM livestock_records WHERE id = $1) AS old
+            WHERE l.id = old.id
+            RETURNING old.blob_hash
         """, animal_id)
         
-        if "UPDATE 0" in result:
+        if not cleared:
             raise HTTPException(status_code=404, detail="Animal not found")
-            
+        await release_photo_files(conn, [], [row['blob_hash'] for row in cleared])
+        
+        # The cached animal list still carries the old photo_path
+        invalidate_response_cache("animals")
         return {"message": "All photos deleted successfully"}
         
     except HTTPException:
@@ -2014,11 +2630,11 @@ async def delete_animal_photo_legacy(animal_id: int):
         logging.error(f"Error deleting photos for animal {animal_id}: {e}")
         raise HTTPException(status_code=500, detail="Failed to delete photos")
     finally:
-        await conn.close()
+        await release_connection(conn)
 
 @app.post("/api/asset")
 async def add_asset(asset: AssetCreate):
-    conn = await asyncpg.connect(DATABASE_URL)
+    conn = await acquire_connection()
     try:
         async with conn.transaction():
             # Convert date strings to date objects
@@ -2059,14 +2675,15 @@ async def add_asset(asset: AssetCreate):
                     VALUES ($1, NOW(), $2, $3, $4)
                 """, asset_id, asset.usage_type, asset.usage_value, asset.usage_notes)
                 
+        invalidate_response_cache("assets")
         return {"message": "Asset added successfully", "id": asset_id}
     finally:
-        await conn.close()
+        await release_connection(conn)
 
 @app.put("/api/asset/{asset_id}")
 async def update_asset(asset_id: int, asset: AssetCreate):
     logging.info(f"Updating asset {asset_id} with data: {asset}")
-    conn = await asyncpg.connect(DATABASE_URL)
+    conn = await acquire_connection()
     try:
         async with conn.transaction():
             # Convert date strings to date objects
@@ -2107,16 +2724,17 @@ async def update_asset(asset_id: int, asset: AssetCreate):
                 """, asset_id, asset.usage_type, asset.usage_value, asset.usage_notes)
                 logging.info(f"Added usage log entry for asset {asset_id}")
                 
+        invalidate_response_cache("assets")
         return {"message": "Asset updated successfully"}
     except Exception as e:
         logging.error(f"Error updating asset {asset_id}: {str(e)}")
         raise
     finally:
-        await conn.close()
+        await release_connection(conn)
 
 @app.post("/api/maintenance-schedule")
 async def create_maintenance_schedule(schedule: MaintenanceScheduleCreate):
-    conn = await asyncpg.connect(DATABASE_URL)
+    conn = await acquire_connection()
     try:
         # Convert date strings to date objects for asyncpg
         due_date_obj = None
@@ -2169,23 +2787,23 @@ async def create_maintenance_schedule(schedule: MaintenanceScheduleCreate):
         
         return {"message": "Maintenance schedule created successfully", "id": result['id']}
     finally:
-        await conn.close()
+        await release_connection(conn)
 
 @app.get("/api/maintenance-schedule/{schedule_id}")
 async def get_maintenance_schedule(schedule_id: int):
     """Get a single maintenance schedule for editing"""
-    conn = await asyncpg.connect(DATABASE_URL)
+    conn = await acquire_connection()
     try:
         record = await conn.fetchrow("SELECT * FROM maintenance_schedules WHERE id = $1", schedule_id)
         if not record:
             raise HTTPException(status_code=404, detail="Maintenance schedule not found")
         return dict(record)
     finally:
-        await conn.close()
+        await release_connection(conn)
 
 @app.put("/api/maintenance-schedule/{schedule_id}")
 async def update_maintenance_schedule(schedule_id: int, schedule: MaintenanceScheduleCreate):
-    conn = await asyncpg.connect(DATABASE_URL)
+    conn = await acquire_connection()
     try:
         # Convert date strings to date objects for asyncpg
         # due_date is now mandatory
@@ -2218,33 +2836,38 @@ async def update_maintenance_schedule(schedule_id: int, schedule: MaintenanceSch
         
         return {"message": "Maintenance schedule updated successfully"}
     finally:
-        await conn.close()
+        await release_connection(conn)
 
 @app.delete("/api/maintenance-schedule/{schedule_id}")
 async def delete_maintenance_schedule(schedule_id: int):
     """Delete a maintenance schedule"""
-    conn = await asyncpg.connect(DATABASE_URL)
+    conn = await acquire_connection()
     try:
         await conn.execute("DELETE FROM maintenance_schedules WHERE id = $1", schedule_id)
         return {"message": "Maintenance schedule deleted successfully"}
     finally:
-        await conn.close()
+        await release_connection(conn)
 
 @app.delete("/api/asset/{asset_id}")
 async def delete_asset(asset_id: int):
-    conn = await asyncpg.connect(DATABASE_URL)
+    conn = await acquire_connection()
     try:
-        await conn.execute("DELETE FROM asset_inventory WHERE id = $1", asset_id)
+        # Remove photos explicitly so their stored files can be released
+        async with conn.transaction():
+            deleted = await conn.fetch("DELETE FROM asset_photos WHERE asset_id = $1 RETURNING photo_hash, encode(sha256(photo_data), 'hex') AS blob_hash", asset_id)
+            await conn.execute("DELETE FROM asset_inventory WHERE id = $1", asset_id)
+        await release_photo_files(conn, [row['photo_hash'] for row in deleted], [row['blob_hash'] for row in deleted])
+        invalidate_response_cache("assets")
         return {"message": "Asset deleted successfully"}
     finally:
-        await conn.close()
+        await release_connection(conn)
 
 # --- Asset Photo Endpoints ---
 
 @app.post("/api/asset/{asset_id}/photo")
 async def upload_asset_photo(asset_id: int, file: UploadFile = File(...)):
     """Upload and store a photo for an asset (identical to animal system)"""
-    conn = await asyncpg.connect(DATABASE_URL)
+    conn = await acquire_connection()
     try:
         # Check if asset exists
         asset = await conn.fetchrow("SELECT id FROM asset_inventory WHERE id = $1", asset_id)
@@ -2262,12 +2885,14 @@ async def upload_asset_photo(asset_id: int, file: UploadFile = File(...)):
         if len(file_content) > 5 * 1024 * 1024:
             raise HTTPException(status_code=400, detail="File size must be less than 5MB")
         
-        # Insert photo into asset_photos table
-        await conn.execute("""
-            INSERT INTO asset_photos (asset_id, photo_data, photo_mime_type, filename, file_size)
-            VALUES ($1, $2, $3, $4, $5)
-            RETURNING id
-        """, asset_id, file_content, file.content_type, file.filename, len(file_content))
+        # Insert photo into asset_photos table (content goes to the file store)
+        async with conn.transaction():
+            photo_data, photo_hash = await store_photo(conn, file_content)
+            await conn.execute("""
+                INSERT INTO asset_photos (asset_id, photo_data, photo_hash, photo_mime_type, filename, file_size)
+                VALUES ($1, $2, $3, $4, $5, $6)
+                RETURNING id
+            """, asset_id, photo_data, photo_hash, file.content_type, file.filename, len(file_content))
         
         return {"message": "Photo uploaded successfully", "filename": file.filename}
         
@@ -2277,12 +2902,12 @@ async def upload_asset_photo(asset_id: int, file: UploadFile = File(...)):
         logging.error(f"Error uploading photo for asset {asset_id}: {e}")
         raise HTTPException(status_code=500, detail="Failed to upload photo")
     finally:
-        await conn.close()
+        await release_connection(conn)
 
 @app.get("/api/asset/{asset_id}/photos")
 async def get_asset_photos(asset_id: int):
     """Retrieve all photos for an asset (identical to animal system)"""
-    conn = await asyncpg.connect(DATABASE_URL)
+    conn = await acquire_connection()
     try:
         photos = await conn.fetch("""
             SELECT id, filename, photo_mime_type, upload_time, file_size, description
@@ -2307,15 +2932,16 @@ async def get_asset_photos(asset_id: int):
         logging.error(f"Error retrieving photos for asset {asset_id}: {e}")
         raise HTTPException(status_code=500, detail="Failed to retrieve photos")
     finally:
-        await conn.close()
+        await release_connection(conn)
 
 @app.get("/api/asset/{asset_id}/photo/{photo_id}")
-async def get_asset_photo(asset_id: int, photo_id: int):
+async def get_asset_photo(request: Request, asset_id: int, photo_id: int, size: Optional[str] = None):
     """Retrieve a specific photo for an asset (identical to animal system)"""
-    conn = await asyncpg.connect(DATABASE_URL)
+    conn = await acquire_connection()
     try:
         record = await conn.fetchrow("""
-            SELECT photo_data, photo_mime_type, filename
+            SELECT id, CASE WHEN photo_hash IS NULL THEN md5(photo_data) END AS blob_md5,
+                   photo_hash, photo_mime_type, filename, upload_time
             FROM asset_photos 
             WHERE id = $1 AND asset_id = $2
         """, photo_id, asset_id)
@@ -2323,12 +2949,8 @@ async def get_asset_photo(asset_id: int, photo_id: int):
         if not record:
             raise HTTPException(status_code=404, detail="Photo not found")
         
-        from fastapi.responses import Response
-        return Response(
-            content=record['photo_data'],
-            media_type=record['photo_mime_type'],
-            headers={"Content-Disposition": f"inline; filename={record['filename']}"}
-        )
+        return await photo_response(request, record, record['filename'], size, immutable=True,
+                                    load_data=lambda: conn.fetchval("SELECT photo_data FROM asset_photos WHERE id = $1", photo_id))
         
     except HTTPException:
         raise
@@ -2336,12 +2958,12 @@ async def get_asset_photo(asset_id: int, photo_id: int):
         logging.error(f"Error retrieving photo {photo_id} for asset {asset_id}: {e}")
         raise HTTPException(status_code=500, detail="Failed to retrieve photo")
     finally:
-        await conn.close()
+        await release_connection(conn)
 
 @app.delete("/api/asset/{asset_id}/photo/{photo_id}")
 async def delete_asset_photo(asset_id: int, photo_id: int):
     """Delete a specific photo for an asset (identical to animal system)"""
-    conn = await asyncpg.connect(DATABASE_URL)
+    conn = await acquire_connection()
     try:
         # Check if photo exists and belongs to asset
         photo = await conn.fetchrow(
@@ -2352,10 +2974,11 @@ async def delete_asset_photo(asset_id: int, photo_id: int):
             raise HTTPException(status_code=404, detail="Photo not found")
         
         # Delete photo
-        await conn.execute(
-            "DELETE FROM asset_photos WHERE id = $1 AND asset_id = $2", 
+        deleted = await conn.fetch(
+            "DELETE FROM asset_photos WHERE id = $1 AND asset_id = $2 RETURNING photo_hash, encode(sha256(photo_data), 'hex') AS blob_hash", 
             photo_id, asset_id
         )
+        await release_photo_files(conn, [row['photo_hash'] for row in deleted], [row['blob_hash'] for row in deleted])
         
         return {"message": "Photo deleted successfully"}
         
@@ -2365,16 +2988,17 @@ async def delete_asset_photo(asset_id: int, photo_id: int):
         logging.error(f"Error deleting photo {photo_id} for asset {asset_id}: {e}")
         raise HTTPException(status_code=500, detail="Failed to delete photo")
     finally:
-        await conn.close()
+        await release_connection(conn)
 
 # Keep old endpoint for backward compatibility
 @app.get("/api/asset/{asset_id}/photo")
-async def get_asset_photo_legacy(asset_id: int):
+async def get_asset_photo_legacy(request: Request, asset_id: int, size: Optional[str] = None):
     """Retrieve an asset's primary photo (legacy endpoint - identical to animal system)"""
-    conn = await asyncpg.connect(DATABASE_URL)
+    conn = await acquire_connection()
     try:
         record = await conn.fetchrow("""
-            SELECT ap.id, ap.photo_data, ap.photo_mime_type, ap.filename
+            SELECT ap.id, CASE WHEN ap.photo_hash IS NULL THEN md5(ap.photo_data) END AS blob_md5,
+                   ap.photo_hash, ap.photo_mime_type, ap.filename, ap.upload_time
             FROM asset_photos ap
             WHERE ap.asset_id = $1
             ORDER BY ap.upload_time ASC
@@ -2384,12 +3008,8 @@ async def get_asset_photo_legacy(asset_id: int):
         if not record:
             raise HTTPException(status_code=404, detail="No photo found for this asset")
         
-        from fastapi.responses import Response
-        return Response(
-            content=record['photo_data'],
-            media_type=record['photo_mime_type'],
-            headers={"Content-Disposition": f"inline; filename={record['filename']}"}
-        )
+        return await photo_response(request, record, record['filename'], size,
+                                    load_data=lambda: conn.fetchval("SELECT photo_data FROM asset_photos WHERE id = $1", record['id']))
         
     except HTTPException:
         raise
@@ -2397,12 +3017,12 @@ async def get_asset_photo_legacy(asset_id: int):
         logging.error(f"Error retrieving legacy photo for asset {asset_id}: {e}")
         raise HTTPException(status_code=500, detail="Failed to retrieve photo")
     finally:
-        await conn.close()
+        await release_connection(conn)
 
 @app.delete("/api/asset/{asset_id}/photo")
 async def delete_all_asset_photos(asset_id: int):
     """Delete all photos for an asset (legacy endpoint - identical to animal system)"""
-    conn = await asyncpg.connect(DATABASE_URL)
+    conn = await acquire_connection()
     try:
         # Check if asset exists
         asset = await conn.fetchrow("SELECT id FROM asset_inventory WHERE id = $1", asset_id)
@@ -2410,7 +3030,8 @@ async def delete_all_asset_photos(asset_id: int):
             raise HTTPException(status_code=404, detail="Asset not found")
         
         # Delete all photos
-        await conn.execute("DELETE FROM asset_photos WHERE asset_id = $1", asset_id)
+        deleted = await conn.fetch("DELETE FROM asset_photos WHERE asset_id = $1 RETURNING photo_hash, encode(sha256(photo_data), 'hex') AS blob_hash", asset_id)
+        await release_photo_files(conn, [row['photo_hash'] for row in deleted], [row['blob_hash'] for row in deleted])
         
         return {"message": "All photos deleted successfully"}
         
@@ -2420,7 +3041,7 @@ async def delete_all_asset_photos(asset_id: int):
         logging.error(f"Error deleting all photos for asset {asset_id}: {e}")
         raise HTTPException(status_code=500, detail="Failed to delete photos")
     finally:
-        await conn.close()
+        await release_connection(conn)
 
 # --- Chemical Inventory Endpoints ---
 
@@ -2440,7 +3061,7 @@ class Chemical(BaseModel):
 
 async def create_chemical_table():
     """Create chemical_inventory table if it doesn't exist"""
-    conn = await asyncpg.connect(DATABASE_URL)
+    conn = await acquire_connection()
     try:
         await conn.execute("""
             CREATE TABLE IF NOT EXISTS chemical_inventory (
@@ -2465,12 +3086,12 @@ async def create_chemical_table():
     except Exception as e:
         logging.error(f"Error creating chemical table: {e}")
     finally:
-        await conn.close()
+        await release_connection(conn)
 
 @app.get("/api/chemicals")
 async def get_chemicals(chemical_type: Optional[str] = None):
     """Get all chemicals, optionally filtered by type"""
-    conn = await asyncpg.connect(DATABASE_URL)
+    conn = await acquire_connection()
     try:
         if chemical_type:
             records = await conn.fetch("""
@@ -2499,12 +3120,12 @@ async def get_chemicals(chemical_type: Optional[str] = None):
         logging.error(f"Error fetching chemicals: {e}")
         raise HTTPException(status_code=500, detail=f"Error fetching chemicals: {str(e)}")
     finally:
-        await conn.close()
+        await release_connection(conn)
 
 @app.get("/api/chemical/{chemical_id}")
 async def get_chemical(chemical_id: int):
     """Get a single chemical by ID"""
-    conn = await asyncpg.connect(DATABASE_URL)
+    conn = await acquire_connection()
     try:
         record = await conn.fetchrow("""
             SELECT id, name, chemical_type, purpose, supplier, purchase_date,
@@ -2526,12 +3147,12 @@ async def get_chemical(chemical_id: int):
         logging.error(f"Error fetching chemical {chemical_id}: {e}")
         raise HTTPException(status_code=500, detail=f"Error fetching chemical: {str(e)}")
     finally:
-        await conn.close()
+        await release_connection(conn)
 
 @app.post("/api/chemicals")
 async def create_chemical(chemical: Chemical):
     """Create a new chemical entry"""
-    conn = await asyncpg.connect(DATABASE_URL)
+    conn = await acquire_connection()
     try:
         purchase_date = None
         if chemical.purchase_date:
@@ -2559,12 +3180,12 @@ async def create_chemical(chemical: Chemical):
         logging.error(f"Error creating chemical: {e}")
         raise HTTPException(status_code=500, detail=f"Error creating chemical: {str(e)}")
     finally:
-        await conn.close()
+        await release_connection(conn)
 
 @app.put("/api/chemical/{chemical_id}")
 async def update_chemical(chemical_id: int, chemical: Chemical):
     """Update an existing chemical entry"""
-    conn = await asyncpg.connect(DATABASE_URL)
+    conn = await acquire_connection()
     try:
         purchase_date = None
         if chemical.purchase_date:
@@ -2594,12 +3215,12 @@ async def update_chemical(chemical_id: int, chemical: Chemical):
         logging.error(f"Error updating chemical: {e}")
         raise HTTPException(status_code=500, detail=f"Error updating chemical: {str(e)}")
     finally:
-        await conn.close()
+        await release_connection(conn)
 
 @app.delete("/api/chemical/{chemical_id}")
 async def delete_chemical(chemical_id: int):
     """Delete a chemical entry"""
-    conn = await asyncpg.connect(DATABASE_URL)
+    conn = await acquire_connection()
     try:
         result = await conn.execute("DELETE FROM chemical_inventory WHERE id = $1", chemical_id)
         if result == "DELETE 0":
@@ -2609,7 +3230,7 @@ async def delete_chemical(chemical_id: int):
         logging.error(f"Error deleting chemical: {e}")
         raise HTTPException(status_code=500, detail=f"Error deleting chemical: {str(e)}")
     finally:
-        await conn.close()
+        await release_connection(conn)
 
 # --- Calendar Endpoints ---
 
@@ -2622,324 +3243,269 @@ class CalendarEvent(BaseModel):
     related_id: Optional[int] = None
     related_name: Optional[str] = None
 
+# All calendar sources normalised into one row shape, filtered and sorted in the database.
+# $1/$2 = date range, $3 = entry_type filter (NULL for all), $4 = category filter (NULL for all)
+CALENDAR_FEED_QUERY = """
+    SELECT * FROM (
+        SELECT 'livestock_birth'::text AS source, 1 AS source_rank, NULL::int AS id,
+               'Birth: ' || lr.name AS title, lr.birth_date AS event_date,
+               NULL::text AS event_time, NULL::float8 AS duration,
+               'informational'::text AS entry_type, 'livestock'::text AS category,
+               COALESCE(lr.gender, 'Unknown') || ' - ' || COALESCE(lr.health_status, 'Unknown status') AS description,
+               lr.id AS related_id, lr.name::text AS related_name,
+               NULL::int AS maintenance_id, NULL::text AS status
+        FROM livestock_records lr
+        WHERE lr.birth_date BETWEEN $1::date AND $2::date
+          AND EXTRACT(YEAR FROM lr.birth_date) BETWEEN 1900 AND EXTRACT(YEAR FROM CURRENT_DATE) + 1
+
+        UNION ALL
+        SELECT 'livestock_death', 2, NULL,
+               'Deceased: ' || lr.name, lr.dod,
+               NULL, NULL,
+               'informational', 'livestock',
+               COALESCE(lr.gender, 'Unknown') || ' - ' || COALESCE(lr.health_status, 'Unknown status'),
+               lr.id, lr.name,
+               NULL, NULL
+        FROM livestock_records lr
+        WHERE lr.dod BETWEEN $1::date AND $2::date
+          AND EXTRACT(YEAR FROM lr.dod) BETWEEN 1900 AND EXTRACT(YEAR FROM CURRENT_DATE) + 1
+
+        UNION ALL
+        SELECT 'asset_purchase', 3, NULL,
+               'Purchased: ' || ai.name, ai.purchase_date,
+               NULL, NULL,
+               'informational', 'asset',
+               COALESCE(ai.category, 'Unknown category') || ' - ' || COALESCE(ai.status, 'Unknown status'),
+               ai.id, ai.name,
+               NULL, NULL
+        FROM asset_inventory ai
+        WHERE ai.purchase_date BETWEEN $1::date AND $2::date
+
+        UNION ALL
+        SELECT 'asset_registration', 4, NULL,
+               'Registration Due: ' || ai.name, ai.registration_due,
+               NULL, NULL,
+               'action', 'asset',
+               'Registration renewal required for ' || COALESCE(ai.category, 'asset'),
+               ai.id, ai.name,
+               NULL, NULL
+        FROM asset_inventory ai
+        WHERE ai.registration_due BETWEEN $1::date AND $2::date
+          AND EXTRACT(YEAR FROM ai.registration_due) BETWEEN 1900 AND 2100
+
+        UNION ALL
+        SELECT 'asset_insurance', 5, NULL,
+               'Insurance Due: ' || ai.name, ai.insurance_due,
+               NULL, NULL,
+               'action', 'asset',
+               'Insurance renewal required for ' || COALESCE(ai.category, 'asset'),
+               ai.id, ai.name,
+               NULL, NULL
+        FROM asset_inventory ai
+        WHERE ai.insurance_due BETWEEN $1::date AND $2::date
+          AND EXTRACT(YEAR FROM ai.insurance_due) BETWEEN 1900 AND 2100
+
+        UNION ALL
+        SELECT 'asset_warranty', 6, NULL,
+               'Warranty Expiry: ' || ai.name, ai.warranty_expiry_date,
+               NULL, NULL,
+               'action', 'asset',
+               'Warranty expiring for ' || COALESCE(ai.category, 'asset'),
+               ai.id, ai.name,
+               NULL, NULL
+        FROM asset_inventory ai
+        WHERE ai.warranty_expiry_date BETWEEN $1::date AND $2::date
+          AND EXTRACT(YEAR FROM ai.warranty_expiry_date) BETWEEN 1900 AND 2100
+
+        UNION ALL
+        SELECT 'maintenance_due', 7, NULL,
+               'Maintenance Due: ' || ai.name, ms.due_date,
+               NULL, NULL,
+               'action', 'asset',
+               ms.task_description,
+               ms.asset_id, ai.name,
+               ms.id, ms.status
+        FROM maintenance_schedules ms
+        JOIN asset_inventory ai ON ms.asset_id = ai.id
+        WHERE ms.due_date BETWEEN $1::date AND $2::date
+          AND ms.status IS DISTINCT FROM 'completed'
+
+        UNION ALL
+        SELECT 'maintenance_completed', 8, NULL,
+               'Maintenance Completed: ' || ai.name, ms.completed_date,
+               NULL, NULL,
+               'informational', 'asset',
+               ms.task_description,
+               ms.asset_id, ai.name,
+               ms.id, ms.status
+        FROM maintenance_schedules ms
+        JOIN asset_inventory ai ON ms.asset_id = ai.id
+        WHERE ms.completed_date BETWEEN $1::date AND $2::date
+
+        UNION ALL
+        SELECT 'chemical_expiry', 9, NULL,
+               'Chemical Expiry: ' || ci.name, ci.expiry_date,
+               NULL, NULL,
+               'action', 'chemical',
+               COALESCE(ci.chemical_type, 'other') || ' - ' || COALESCE(ci.location, 'Unknown location')
+                   || ' (' || COALESCE(ci.quantity::text, '0') || ' ' || COALESCE(ci.unit, 'units') || ')',
+               ci.id, ci.name,
+               NULL, NULL
+        FROM chemical_inventory ci
+        WHERE ci.expiry_date BETWEEN $1::date AND $2::date
+
+        UNION ALL
+        SELECT 'calendar_entry', 10, ce.id,
+               ce.title, ce.entry_date,
+               to_char(ce.event_time, 'HH24:MI:SS'), COALESCE(NULLIF(ce.duration_hours, 0), 1.0)::float8,
+               ce.entry_type, ce.category,
+               COALESCE(ce.description, ''),
+               ce.related_id, COALESCE(ce.related_name, 'Unknown'),
+               NULL, NULL
+        FROM calendar_entries ce
+        WHERE ce.entry_date BETWEEN $1::date AND $2::date
+    ) feed
+    WHERE ($3::text IS NULL OR feed.entry_type = $3::text)
+      AND ($4::text IS NULL OR feed.category = $4::text)
+    ORDER BY feed.event_date, feed.source_rank
+"""
+
+PREPARED_QUERIES["calendar_feed"] = CALENDAR_FEED_QUERY
+
+def get_calendar_date_range(filter_type, today):
+    """Returns the (start, end) dates covered by a calendar filter type."""
+    if filter_type == "day":
+        return today, today
+    elif filter_type == "week":
+        return today - timedelta(days=today.weekday()), today + timedelta(days=6-today.weekday())
+    elif filter_type == "fortnight":
+        week_num = today.isocalendar()[1]
+        if week_num % 2 == 0:
+            return today - timedelta(days=today.weekday() + 7), today + timedelta(days=6-today.weekday())
+        return today - timedelta(days=today.weekday()), today + timedelta(days=13-today.weekday())
+    elif filter_type == "quarter":
+        quarter = (today.month - 1) // 3 + 1
+        start_month = (quarter - 1) * 3 + 1
+        start = today.replace(month=start_month, day=1)
+        if quarter == 4:
+            end = today.replace(year=today.year + 1, month=1, day=1) - timedelta(days=1)
+        else:
+            end = today.replace(month=start_month + 3, day=1) - timedelta(days=1)
+        return start, end
+    elif filter_type == "year":
+        return today.replace(month=1, day=1), today.replace(month=12, day=31)
+    # Default to the current month
+    next_month = today.replace(day=28) + timedelta(days=4)
+    return today.replace(day=1), next_month.replace(day=1) - timedelta(days=1)
+
+class CalendarTrace:
+    """Collects per-request calendar timings and per-source row counters when debugging is enabled.
+
+    All sources come from one UNION query, so rows scanned per source are not
+    visible; each source reports the rows it emitted and the time spent building them.
+    """
+
+    def __init__(self, enabled):
+        self.enabled = enabled
+        self.timings = {}
+        self.sources = {}
+        self._stage = None
+        self._started = None
+
+    def start(self, stage):
+        if self.enabled:
+            self._stage = stage
+            self._started = time.perf_counter()
+
+    def stop(self):
+        if self.enabled and self._stage:
+            self.timings[self._stage] = (time.perf_counter() - self._started) * 1000
+            self._stage = None
+
+    def build(self, source, convert, row):
+        """Returns convert(row), counting the row and its build time against `source`."""
+        if not self.enabled:
+            return convert(row)
+        started = time.perf_counter()
+        result = convert(row)
+        stats = self.sources.setdefault(source, {"rows": 0, "build_ms": 0.0})
+        stats["rows"] += 1
+        stats["build_ms"] += (time.perf_counter() - started) * 1000
+        return result
+
+    def server_timing(self):
+        """Formats the stage and per-source build timings as a Server-Timing header value."""
+        entries = [f"{stage};dur={ms:.1f}" for stage, ms in self.timings.items()]
+        entries += [f'build-{source};dur={stats["build_ms"]:.1f};desc="{stats["rows"]} rows"'
+                    for source, stats in self.sources.items()]
+        return ", ".join(entries)
+
+    def log(self, **params):
+        if self.enabled:
+            logging.info("Calendar trace: " + json.dumps({
+                "params": params,
+                "timings_ms": {stage: round(ms, 2) for stage, ms in self.timings.items()},
+                "rows_emitted": sum(stats["rows"] for stats in self.sources.values()),
+                "sources": {source: {"rows": stats["rows"], "build_ms": round(stats["build_ms"], 2)}
+                            for source, stats in self.sources.items()}
+            }, default=str))
+
+def calendar_row_to_event(row):
+    """Converts a calendar_feed row into the event dict returned by /api/calendar."""
+    event = {
+        "title": row['title'],
+        "date": row['event_date'].isoformat(),
+        "entry_type": row['entry_type'],
+        "category": row['category'],
+        "description": row['description'],
+        "related_id": row['related_id'],
+        "related_name": row['related_name']
+    }
+    if row['source'] == 'calendar_entry':
+        event["id"] = row['id']
+        event["time"] = row['event_time']
+        event["duration"] = row['duration']
+    elif row['maintenance_id'] is not None:
+        event["maintenance_id"] = row['maintenance_id']
+        event["status"] = row['status']
+    return event
+
 @app.get("/api/calendar")
 async def get_calendar_events(
+    response: Response,
     start_date: Optional[str] = None,
     end_date: Optional[str] = None,
     filter_type: Optional[str] = "month",  # year, quarter, month, fortnight, week, day
     entry_type: Optional[str] = None,  # informational, action, or None for all
-    category: Optional[str] = None  # livestock, asset, or None for all
+    category: Optional[str] = None,  # livestock, asset, or None for all
+    debug: bool = False  # include timings/counters in the log and a Server-Timing header
 ):
     """Get calendar events from both livestock and asset registers"""
-    print(f"Calendar API called with: start_date={start_date}, end_date={end_date}, filter_type={filter_type}")
-    conn = await asyncpg.connect(DATABASE_URL)
-    try:
-        events = []
-        
-        # Calculate date range based on filter type
-        today = datetime.now().date()
-        
-        if not start_date or not end_date:
-            if filter_type == "day":
-                start_date = today.isoformat()
-                end_date = today.isoformat()
-            elif filter_type == "week":
-                start_date = (today - timedelta(days=today.weekday())).isoformat()
-                end_date = (today + timedelta(days=6-today.weekday())).isoformat()
-            elif filter_type == "fortnight":
-                week_num = today.isocalendar()[1]
-                if week_num % 2 == 0:
-                    start_date = (today - timedelta(days=today.weekday() + 7)).isoformat()
-                    end_date = (today + timedelta(days=6-today.weekday())).isoformat()
-                else:
-                    start_date = (today - timedelta(days=today.weekday())).isoformat()
-                    end_date = (today + timedelta(days=13-today.weekday())).isoformat()
-            elif filter_type == "month":
-                start_date = today.replace(day=1).isoformat()
-                next_month = today.replace(day=28) + timedelta(days=4)
-                end_date = next_month.replace(day=1) - timedelta(days=1)
-                end_date = end_date.isoformat()
-            elif filter_type == "quarter":
-                quarter = (today.month - 1) // 3 + 1
-                start_month = (quarter - 1) * 3 + 1
-                start_date = today.replace(month=start_month, day=1).isoformat()
-                if quarter == 4:
-                    end_date = today.replace(year=today.year + 1, month=1, day=1) - timedelta(days=1)
-                else:
-                    end_date = today.replace(month=start_month + 3, day=1) - timedelta(days=1)
-                end_date = end_date.isoformat()
-            elif filter_type == "year":
-                start_date = today.replace(month=1, day=1).isoformat()
-                end_date = today.replace(month=12, day=31).isoformat()
-        
-        # Livestock events
-        livestock_query = """
-            SELECT 
-                id, name, birth_date, dod, health_status, gender,
-                'livestock' as category,
-                CASE 
-                    WHEN dod IS NOT NULL THEN 'informational'
-                    WHEN birth_date IS NOT NULL THEN 'informational'
-                    ELSE 'informational'
-                END as entry_type
-            FROM livestock_records 
-            WHERE (birth_date BETWEEN $1 AND $2 
-                   OR dod BETWEEN $1 AND $2)
-        """
-        
+    trace = CalendarTrace(CALENDAR_DEBUG or debug)
+    # Calculate date range based on filter type
+    if start_date and end_date:
         start_date_obj = datetime.strptime(start_date, '%Y-%m-%d').date()
         end_date_obj = datetime.strptime(end_date, '%Y-%m-%d').date()
-        print(f"Parsed dates: start_date_obj={start_date_obj}, end_date_obj={end_date_obj}")
-        
-        livestock_records = await conn.fetch(livestock_query, start_date_obj, end_date_obj)
-        
-        for record in livestock_records:
-            # Birth date event
-            if record['birth_date']:
-                # Validate date is reasonable (between 1900 and current year + 1)
-                current_year = datetime.now().year
-                if record['birth_date'].year >= 1900 and record['birth_date'].year <= current_year + 1:
-                    birth_date_str = record['birth_date'].isoformat()
-                    print(f"Processing livestock birth: {record['name']}, birth_date={record['birth_date']}, birth_date_str={birth_date_str}")
-                    if start_date <= birth_date_str <= end_date:
-                        print(f"Adding birth event for {record['name']} on {birth_date_str}")
-                        events.append({
-                            "title": f"Birth: {record['name']}",
-                            "date": birth_date_str,
-                            "entry_type": "informational",
-                            "category": "livestock",
-                            "description": f"{record['gender']} - {record.get('health_status', 'Unknown status')}",
-                            "related_id": record['id'],
-                            "related_name": record['name']
-                        })
-                    else:
-                        print(f"Skipping birth event for {record['name']} - date {birth_date_str} not in range {start_date} to {end_date}")
-                else:
-                    print(f"Skipping invalid birth date for {record['name']}: {record['birth_date']} (year out of range)")
-            
-            # Death date event
-            if record['dod']:
-                # Validate date is reasonable (between 1900 and current year + 1)
-                current_year = datetime.now().year
-                if record['dod'].year >= 1900 and record['dod'].year <= current_year + 1:
-                    dod_date_str = record['dod'].isoformat()
-                    print(f"Processing livestock death: {record['name']}, dod={record['dod']}, dod_date_str={dod_date_str}")
-                    if start_date <= dod_date_str <= end_date:
-                        print(f"Adding death event for {record['name']} on {dod_date_str}")
-                        events.append({
-                            "title": f"Deceased: {record['name']}",
-                            "date": dod_date_str,
-                            "entry_type": "informational",
-                            "category": "livestock",
-                            "description": f"{record['gender']} - {record.get('health_status', 'Unknown status')}",
-                            "related_id": record['id'],
-                            "related_name": record['name']
-                        })
-                    else:
-                        print(f"Skipping death event for {record['name']} - date {dod_date_str} not in range {start_date} to {end_date}")
-                else:
-                    print(f"Skipping invalid death date for {record['name']}: {record['dod']} (year out of range)")
-        
-        # Asset events
-        asset_query = """
-            SELECT 
-                id, name, purchase_date, registration_due, insurance_due, 
-                warranty_expiry_date, status, category,
-                'asset' as category,
-                CASE 
-                    WHEN registration_due IS NOT NULL THEN 'action'
-                    WHEN insurance_due IS NOT NULL THEN 'action'
-                    WHEN warranty_expiry_date IS NOT NULL THEN 'action'
-                    ELSE 'informational'
-                END as entry_type
-            FROM asset_inventory 
-            WHERE (purchase_date BETWEEN $1 AND $2 
-                   OR registration_due BETWEEN $1 AND $2
-                   OR insurance_due BETWEEN $1 AND $2
-                   OR warranty_expiry_date BETWEEN $1 AND $2)
-        """
-        
-        asset_records = await conn.fetch(asset_query, datetime.strptime(start_date, '%Y-%m-%d').date(), datetime.strptime(end_date, '%Y-%m-%d').date())
-        
-        for record in asset_records:
-            # Purchase date event
-            if record['purchase_date']:
-                purchase_date_str = record['purchase_date'].isoformat()
-                if start_date <= purchase_date_str <= end_date:
-                    events.append({
-                        "title": f"Purchased: {record['name']}",
-                        "date": purchase_date_str,
-                        "entry_type": "informational",
-                        "category": "asset",
-                        "description": f"{record.get('category', 'Unknown category')} - {record.get('status', 'Unknown status')}",
-                        "related_id": record['id'],
-                        "related_name": record['name']
-                    })
-            
-            # Registration due event
-            if record['registration_due']:
-                # Validate date is reasonable (between 1900 and 2100)
-                if record['registration_due'].year >= 1900 and record['registration_due'].year <= 2100:
-                    reg_date_str = record['registration_due'].isoformat()
-                    print(f"Processing asset registration: {record['name']}, registration_due={record['registration_due']}, reg_date_str={reg_date_str}")
-                    if start_date <= reg_date_str <= end_date:
-                        print(f"Adding registration event for {record['name']} on {reg_date_str}")
-                        events.append({
-                            "title": f"Registration Due: {record['name']}",
-                            "date": reg_date_str,
-                            "entry_type": "action",
-                            "category": "asset",
-                            "description": f"Registration renewal required for {record.get('category', 'asset')}",
-                            "related_id": record['id'],
-                            "related_name": record['name']
-                        })
-                    else:
-                        print(f"Skipping registration event for {record['name']} - date {reg_date_str} not in range {start_date} to {end_date}")
-                else:
-                    print(f"Skipping invalid registration date for {record['name']}: {record['registration_due']} (year out of range)")
-            
-            # Insurance due event
-            if record['insurance_due']:
-                # Validate date is reasonable (between 1900 and 2100)
-                if record['insurance_due'].year >= 1900 and record['insurance_due'].year <= 2100:
-                    insurance_date_str = record['insurance_due'].isoformat()
-                    if start_date <= insurance_date_str <= end_date:
-                        events.append({
-                            "title": f"Insurance Due: {record['name']}",
-                            "date": insurance_date_str,
-                            "entry_type": "action",
-                            "category": "asset",
-                            "description": f"Insurance renewal required for {record.get('category', 'asset')}",
-                            "related_id": record['id'],
-                            "related_name": record['name']
-                        })
-                else:
-                    print(f"Skipping invalid insurance date for {record['name']}: {record['insurance_due']} (year out of range)")
-            
-            # Warranty expiry event
-            if record['warranty_expiry_date']:
-                # Validate date is reasonable (between 1900 and 2100)
-                if record['warranty_expiry_date'].year >= 1900 and record['warranty_expiry_date'].year <= 2100:
-                    warranty_date_str = record['warranty_expiry_date'].isoformat()
-                    if start_date <= warranty_date_str <= end_date:
-                        events.append({
-                            "title": f"Warranty Expiry: {record['name']}",
-                            "date": warranty_date_str,
-                            "entry_type": "action",
-                            "category": "asset",
-                            "description": f"Warranty expiring for {record.get('category', 'asset')}",
-                            "related_id": record['id'],
-                            "related_name": record['name']
-                        })
-                else:
-                    print(f"Skipping invalid warranty date for {record['name']}: {record['warranty_expiry_date']} (year out of range)")
-        
-        # Maintenance events
-        maintenance_query = """
-            SELECT 
-                ms.id, ms.asset_id, ms.task_description, ms.due_date, 
-                ms.completed_date, ms.status, ai.name as asset_name,
-                'asset' as category,
-                CASE 
-                    WHEN ms.status = 'pending' THEN 'action'
-                    WHEN ms.status = 'overdue' THEN 'action'
-                    ELSE 'informational'
-                END as entry_type
-            FROM maintenance_schedules ms
-            JOIN asset_inventory ai ON ms.asset_id = ai.id
-            WHERE (ms.due_date BETWEEN $1 AND $2 
-                   OR ms.completed_date BETWEEN $1 AND $2)
-        """
-        
-        maintenance_records = await conn.fetch(maintenance_query, datetime.strptime(start_date, '%Y-%m-%d').date(), datetime.strptime(end_date, '%Y-%m-%d').date())
-        
-        for record in maintenance_records:
-            # Due date event - only show if maintenance is not completed
-            if record['due_date'] and start_date <= record['due_date'].isoformat() <= end_date and record['status'] != 'completed':
-                events.append({
-                    "title": f"Maintenance Due: {record['asset_name']}",
-                    "date": record['due_date'].isoformat(),
-                    "entry_type": "action",
-                    "category": "asset",
-                    "description": record['task_description'],
-                    "related_id": record['asset_id'],
-                    "related_name": record['asset_name'],
-                    "maintenance_id": record['id'],
-                    "status": record['status']
-                })
-            
-            # Completed date event
-            if record['completed_date'] and start_date <= record['completed_date'].isoformat() <= end_date:
-                events.append({
-                    "title": f"Maintenance Completed: {record['asset_name']}",
-                    "date": record['completed_date'].isoformat(),
-                    "entry_type": "informational",
-                    "category": "asset",
-                    "description": record['task_description'],
-                    "related_id": record['asset_id'],
-                    "related_name": record['asset_name'],
-                    "maintenance_id": record['id'],
-                    "status": record['status']
-                    })
-        
-        # Chemical expiry events
-        chemical_query = """
-            SELECT 
-                id, name, chemical_type, expiry_date, location, quantity, unit
-            FROM chemical_inventory 
-            WHERE expiry_date BETWEEN $1 AND $2
-        """
-        
-        chemical_records = await conn.fetch(chemical_query, datetime.strptime(start_date, '%Y-%m-%d').date(), datetime.strptime(end_date, '%Y-%m-%d').date())
-        
-        for record in chemical_records:
-            if record['expiry_date']:
-                expiry_date_str = record['expiry_date'].isoformat()
-                events.append({
-                    "title": f"Chemical Expiry: {record['name']}",
-                    "date": expiry_date_str,
-                    "entry_type": "action",
-                    "category": "chemical",
-                    "description": f"{record['chemical_type']} - {record['location']} ({record['quantity']} {record['unit'] or 'units'})",
-                    "related_id": record['id'],
-                    "related_name": record['name']
-                })
-        
-        # Calendar events (user-created events)
-        calendar_events_query = """
-            SELECT 
-                id, entry_date, event_time, duration_hours, title, description, entry_type, 
-                category, related_id, related_name
-            FROM calendar_entries 
-            WHERE entry_date BETWEEN $1 AND $2
-        """
-        
-        calendar_records = await conn.fetch(calendar_events_query, datetime.strptime(start_date, '%Y-%m-%d').date(), datetime.strptime(end_date, '%Y-%m-%d').date())
-        
-        for record in calendar_records:
-            events.append({
-                "id": record['id'],
-                "title": record['title'],
-                "date": record['entry_date'].isoformat(),
-                "time": record['event_time'].isoformat() if record['event_time'] else None,
-                "duration": float(record['duration_hours']) if record['duration_hours'] else 1.0,
-                "entry_type": record['entry_type'],
-                "category": record['category'],
-                "description": record['description'] or '',
-                "related_id": record['related_id'],
-                "related_name": record['related_name'] or 'Unknown'
-            })
-        
-        # Apply filters
-        if entry_type:
-            events = [e for e in events if e['entry_type'] == entry_type]
-        
-        if category:
-            events = [e for e in events if e['category'] == category]
-        
-        # Sort by date
-        events.sort(key=lambda x: x['date'])
-        
-        return events
+    else:
+        start_date_obj, end_date_obj = get_calendar_date_range(filter_type, datetime.now().date())
+    
+    trace.start("acquire")
+    conn = await acquire_connection()
+    trace.stop()
+    try:
+        # Empty filters mean "all", as before
+        trace.start("query")
+        records = await fetch_prepared(conn, "calendar_feed", start_date_obj, end_date_obj, entry_type or None, category or None)
+        trace.stop()
     finally:
-        await conn.close()
+        await release_connection(conn)
+    
+    trace.start("build")
+    events = [trace.build(record['source'], calendar_row_to_event, record) for record in records]
+    trace.stop()
+    
+    if trace.enabled:
+        trace.log(start_date=start_date_obj, end_date=end_date_obj, filter_type=filter_type,
+                  entry_type=entry_type, category=category)
+        response.headers["Server-Timing"] = trace.server_timing()
+    return events
@@ -0,0 +1,142 @@
+# Photo Storage Service
+# Content-addressed file storage for animal and asset photos
+
+import hashlib
+import io
+import os
+import re
+import tempfile
+from typing import Optional, Tuple
+
+# Pillow is optional: without it photos are always served at full size
+try:
+    from PIL import Image, ImageOps, features
+    PIL_AVAILABLE = True
+except ImportError:
+    PIL_AVAILABLE = False
+
+HASH_PATTERN = re.compile(r'^[0-9a-f]{64}$')
+
+# Resized variants served via ?size=, as the longest edge in pixels
+PHOTO_VARIANTS = {
+    'thumb': 320,
+    'medium': 1024,
+}
+
+def content_hash(data: bytes) -> str:
+    """The SHA-256 hex digest that names a photo in the store"""
+    return hashlib.sha256(data).hexdigest()
+
+def _variant_format() -> Tuple[str, str, str]:
+    """Pick WebP when Pillow was built with it, JPEG otherwise"""
+    if PIL_AVAILABLE and features.check('webp'):
+        return 'WEBP', 'webp', 'image/webp'
+    return 'JPEG', 'jpg', 'image/jpeg'
+
+class FilesystemPhotoStore:
+    """Stores photos as files named by the SHA-256 of their content.
+
+    Identical photos are stored once; rows in animal_photos/asset_photos reference
+    the file through their photo_hash column.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def _path_for(self, photo_hash: str) -> str:
+        if not HASH_PATTERN.match(photo_hash or ''):
+            raise ValueError(f"Invalid photo hash: {photo_hash!r}")
+        # Two-character fan-out keeps directories small on large herds
+        return os.path.join(self.root, photo_hash[:2], photo_hash)
+
+    def _write_atomic(self, path: str, data: bytes) -> None:
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        # Write to a temp file first so readers never see a partial photo
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.upload-')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+    def save(self, data: bytes, photo_hash: Optional[str] = None) -> str:
+        """Write photo bytes to the store and return their hash (pass it if already computed)"""
+        photo_hash = photo_hash or content_hash(data)
+        path = self._path_for(photo_hash)
+        if not os.path.exists(path):
+            self._write_atomic(path, data)
+        return photo_hash
+
+    def path(self, photo_hash: str) -> Optional[str]:
+        """Return the file path for a stored photo, or None if it is missing"""
+        path = self._path_for(photo_hash)
+        return path if os.path.exists(path) else None
+
+    def delete(self, photo_hash: str) -> None:
+        """Remove a stored photo and its variants (callers check that no rows still reference it)"""
+        self._remove([self._path_for(photo_hash)])
+        self.delete_variants(photo_hash)
+
+    def delete_variants(self, photo_hash: str) -> None:
+        """Remove the cached variants of a photo, which are recreated on the next request"""
+        self._remove([self._variant_path_for(photo_hash, size) for size in PHOTO_VARIANTS])
+
+    @staticmethod
+    def _remove(paths) -> None:
+        for path in paths:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def _variant_path_for(self, photo_hash: str, size: str) -> str:
+        if not HASH_PATTERN.match(photo_hash or ''):
+            raise ValueError(f"Invalid photo hash: {photo_hash!r}")
+        _, extension, _ = _variant_format()
+        return os.path.join(self.root, 'variants', size, photo_hash[:2], f"{photo_hash}.{extension}")
+
+    def variant(self, photo_hash: str, size: str, data: Optional[bytes] = None) -> Optional[Tuple[str, str]]:
+        """Return (path, media_type) of a resized variant, creating it on first use.
+
+        `data` is the original photo for rows still stored in the database; otherwise
+        the original is read from the store. Returns None if variants are unavailable.
+        """
+        if not PIL_AVAILABLE or size not in PHOTO_VARIANTS:
+            return None
+        _, _, media_type = _variant_format()
+        path = self._variant_path_for(photo_hash, size)
+        if os.path.exists(path):
+            return path, media_type
+
+        if data is None:
+            original = self.path(photo_hash)
+            if not original:
+                return None
+            with open(original, 'rb') as f:
+                data = f.read()
+        self._write_atomic(path, self._resize(data, PHOTO_VARIANTS[size]))
+        return path, media_type
+
+    def create_variants(self, photo_hash: str) -> None:
+        """Pre-generate every variant of a stored photo (run by the background worker)"""
+        for size in PHOTO_VARIANTS:
+            self.variant(photo_hash, size)
+
+    @staticmethod
+    def _resize(data: bytes, max_edge: int) -> bytes:
+        pil_format, _, _ = _variant_format()
+        with Image.open(io.BytesIO(data)) as image:
+            # Respect camera orientation before the EXIF data is dropped
+            image = ImageOps.exif_transpose(image)
+            if pil_format == 'JPEG' and image.mode not in ('RGB', 'L'):
+                image = image.convert('RGB')
+            image.thumbnail((max_edge, max_edge))
+            output = io.BytesIO()
+            image.save(output, pil_format, quality=80)
+            return output.getvalue()
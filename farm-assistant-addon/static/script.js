@@ -1922,7 +1922,7 @@ document.addEventListener("DOMContentLoaded", async () => {
                         const photos = await photosResponse.json();
                         if (photos.length > 0) {
                             const firstPhoto = photos[0];
-                            photoCell = `<img src="api/asset/${asset.id}/photo/${firstPhoto.id}" alt="${firstPhoto.filename}" class="asset-photo-thumbnail" onclick="openImageOverlay('api/asset/${asset.id}/photo/${firstPhoto.id}', '${firstPhoto.filename}')" style="width: 40px; height: 40px; object-fit: cover; border-radius: 4px; cursor: pointer;">`;
+                            photoCell = `<img src="api/asset/${asset.id}/photo/${firstPhoto.id}?size=thumb" alt="${firstPhoto.filename}" class="asset-photo-thumbnail" onclick="openImageOverlay('api/asset/${asset.id}/photo/${firstPhoto.id}', '${firstPhoto.filename}')" style="width: 40px; height: 40px; object-fit: cover; border-radius: 4px; cursor: pointer;">`;
                         } else {
                             photoCell = '<div style="width: 40px; height: 40px; background-color: #f8f9fa; border: 1px solid #dee2e6; border-radius: 4px; display: flex; align-items: center; justify-content: center; color: #6c757d; font-size: 12px;">No Photo</div>';
                         }
@@ -5360,7 +5360,7 @@ async function loadAnimalPhotos(animalId) {
                     const photoItem = document.createElement('div');
                     photoItem.className = 'photo-item';
                     photoItem.innerHTML = `
-                        <img src="api/animal/${animalId}/photo/${photo.id}" alt="${photo.filename}" onclick="openImageOverlay('api/animal/${animalId}/photo/${photo.id}', '${photo.filename}')">
+                        <img src="api/animal/${animalId}/photo/${photo.id}?size=thumb" alt="${photo.filename}" onclick="openImageOverlay('api/animal/${animalId}/photo/${photo.id}', '${photo.filename}')">
                         <div class="photo-actions">
                             <button class="photo-action-btn delete" onclick="deleteExistingPhoto(${animalId}, ${photo.id}, '${photo.filename}')">
                                 <i class="fa-solid fa-trash"></i>
@@ -5403,7 +5403,7 @@ async function loadAnimalPhotosForDetails(animalId) {
                     photoItem.className = 'photo-item';
                     photoItem.style.cssText = 'display: inline-block; margin: 5px; text-align: center;';
                     photoItem.innerHTML = `
-                        <img src="api/animal/${animalId}/photo/${photo.id}" alt="${photo.filename}" 
+                        <img src="api/animal/${animalId}/photo/${photo.id}?size=thumb" alt="${photo.filename}" 
                              style="width: 150px; height: 150px; object-fit: cover; border-radius: 5px; border: 1px solid #ddd; cursor: pointer;"
                              onclick="openImageOverlay('api/animal/${animalId}/photo/${photo.id}', '${photo.filename}')">
                         <div style="font-size: 12px; color: #666; margin-top: 3px;">${photo.filename}</div>
@@ -5498,7 +5498,7 @@ async function loadAssetPhotos(assetId) {
                     const photoDiv = document.createElement('div');
                     photoDiv.style.cssText = 'display: inline-block; margin: 5px; position: relative;';
                     photoDiv.innerHTML = `
-                        <img src="api/asset/${assetId}/photo/${photo.id}" alt="${photo.filename}" 
+                        <img src="api/asset/${assetId}/photo/${photo.id}?size=thumb" alt="${photo.filename}" 
                              style="max-width: 200px; max-height: 150px; border-radius: 4px; cursor: pointer; object-fit: cover; margin: 2px;" 
                              onclick="openImageOverlay('api/asset/${assetId}/photo/${photo.id}', '${photo.filename}')">
                         <div style="margin-top: 5px; font-size: 12px; color: #666;">${photo.filename}</div>
@@ -5531,7 +5531,7 @@ async function loadAssetPhotosForEdit(assetId) {
                 for (const photo of photos) {
                     photosHtml += `
                         <div style="display: inline-block; margin: 5px; position: relative;">
-                            <img src="api/asset/${assetId}/photo/${photo.id}" alt="${photo.filename}" 
+                            <img src="api/asset/${assetId}/photo/${photo.id}?size=thumb" alt="${photo.filename}" 
                                  style="max-width: 150px; max-height: 100px; border-radius: 4px; cursor: pointer; object-fit: cover; margin: 2px;" 
                                  onclick="openImageOverlay('api/asset/${assetId}/photo/${photo.id}', '${photo.filename}')">
                             <div style="margin-top: 2px; font-size: 10px; color: #666;">${photo.filename}</div>
@@ -6247,12 +6247,16 @@ function showStatus(message, type = 'success') {
 }
 
 // Backup progress modal functions
-function showBackupProgressModal() {
+function showBackupProgressModal(title = 'Creating Backup', message = 'Preparing backup...') {
     const modal = document.getElementById('backup-progress-modal');
     if (modal) {
+        const titleElement = document.getElementById('backup-progress-title');
+        if (titleElement) {
+            titleElement.textContent = title;
+        }
         modal.classList.add('show');
         // Reset progress
-        updateBackupProgress(0, 'Preparing backup...');
+        updateBackupProgress(0, message);
     }
 }
 
@@ -6362,8 +6366,23 @@ async function handleDirectRestore(file) {
         return;
     }
     
+    // Poll the server for row counts while the restore request is running
+    let progressTimer = null;
+    
     try {
-        showStatus('Restoring backup...', 'processing');
+        showBackupProgressModal('Restoring Backup', 'Uploading backup...');
+        progressTimer = setInterval(async () => {
+            try {
+                const progressResponse = await fetch('api/restore/progress');
+                const progress = await progressResponse.json();
+                if (progress.status === 'running') {
+                    const percent = progress.total_rows ? Math.round(progress.rows / progress.total_rows * 100) : 0;
+                    updateBackupProgress(percent, `${progress.message} (${progress.rows}/${progress.total_rows} records)`);
+                }
+            } catch (error) {
+                console.error('Restore progress error:', error);
+            }
+        }, 500);
         
         const formData = new FormData();
         formData.append('backup_file', file);
@@ -6379,6 +6398,9 @@ async function handleDirectRestore(file) {
         }
         
         const result = await response.json();
+        clearInterval(progressTimer);
+        updateBackupProgress(100, result.message);
+        hideBackupProgressModal();
         showStatus(result.message, 'success');
         
         // Refresh the page after successful restore to show updated data
@@ -6387,6 +6409,8 @@ async function handleDirectRestore(file) {
         }, 2000);
         
     } catch (error) {
+        clearInterval(progressTimer);
+        hideBackupProgressModal();
         console.error('Restore error:', error);
         showStatus(`Restore failed: ${error.message}`, 'error');
     }
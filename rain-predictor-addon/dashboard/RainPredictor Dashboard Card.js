@@ -1,7 +1,26 @@
 import React, { useState, useEffect } from 'react';
 import { MapPin, Cloud, Wind, Compass, Clock, Droplets } from 'lucide-react';
 
-const RainRadarCard = () => {
+// Map the add-on's ui_data (as served by /api/data and /api/stream) onto the card state
+const toRainData = (data) => {
+  const time = Number(data.time_to_rain);
+  const known = Number.isFinite(time) && time < 999;
+  return {
+    timeToRain: Number.isFinite(time) ? time : '--',
+    distance: known ? data.distance : '--',
+    speed: known ? data.speed : '--',
+    // The add-on reports -1 when there is no direction or bearing
+    direction: known && Number(data.direction) >= 0 ? Number(data.direction) : '--',
+    bearing: known && Number(data.bearing) >= 0 ? Number(data.bearing) : '--',
+    status: time === 0 ? 'raining' : known ? 'approaching' : 'clear'
+  };
+};
+
+// streamUrl is the add-on web UI's server-sent events endpoint, e.g.
+// http://homeassistant.local:8099/api/stream. It is required: a relative URL would
+// resolve against Home Assistant itself. The add-on must list the dashboard's
+// origin in its dashboard.allowed_origin option.
+const RainRadarCard = ({ streamUrl }) => {
   const [rainData, setRainData] = useState({
     timeToRain: '--',
     distance: '--',
@@ -10,26 +29,27 @@ const RainRadarCard = () => {
     bearing: '--',
     status: 'monitoring'
   });
+  const [live, setLive] = useState(false);
 
-  // Mock data simulation - replace with actual Home Assistant entity data
+  // Subscribe to pushed analysis results; EventSource reconnects on its own
   useEffect(() => {
-    // Simulating data updates every 3 seconds
-    const interval = setInterval(() => {
-      // In real implementation, fetch from Home Assistant API
-      // For demo, we'll use mock data
-      const mockTime = Math.floor(Math.random() * 120);
-      setRainData({
-        timeToRain: mockTime < 100 ? mockTime : 999,
-        distance: mockTime < 100 ? (mockTime * 0.5).toFixed(1) : '--',
-        speed: mockTime < 100 ? (35 + Math.random() * 15).toFixed(1) : '--',
-        direction: mockTime < 100 ? (90 + Math.random() * 20).toFixed(0) : '--',
-        bearing: mockTime < 100 ? (95 + Math.random() * 10).toFixed(0) : '--',
-        status: mockTime === 0 ? 'raining' : mockTime < 100 ? 'approaching' : 'clear'
-      });
-    }, 3000);
-
-    return () => clearInterval(interval);
-  }, []);
+    if (!streamUrl) {
+      console.error('Rain Predictor card: set streamUrl to the add-on web UI /api/stream URL');
+      return undefined;
+    }
+    const source = new EventSource(streamUrl);
+    source.onopen = () => setLive(true);
+    source.onerror = () => setLive(false);
+    source.onmessage = (event) => {
+      try {
+        setRainData(toRainData(JSON.parse(event.data)));
+      } catch (error) {
+        console.error('Rain Predictor stream error:', error);
+      }
+    };
+
+    return () => source.close();
+  }, [streamUrl]);
 
   const getStatusColor = () => {
     switch (rainData.status) {
@@ -72,8 +92,8 @@ const RainRadarCard = () => {
           <h1 className="text-2xl font-bold text-white">Rain Predictor</h1>
         </div>
         <div className="flex items-center gap-2">
-          <div className={`w-3 h-3 rounded-full ${getStatusColor()} animate-pulse`}></div>
-          <span className="text-sm text-gray-300">Live</span>
+          <div className={`w-3 h-3 rounded-full ${live ? getStatusColor() : 'bg-gray-500'} ${live ? 'animate-pulse' : ''}`}></div>
+          <span className="text-sm text-gray-300">{live ? 'Live' : streamUrl ? 'Connecting' : 'No stream URL'}</span>
         </div>
       </div>
 
@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+# /rain-predictor-addon/geodesy.py
+"""
+Great-circle helpers on a spherical Earth.
+
+Every function accepts scalars or NumPy arrays and broadcasts like NumPy
+arithmetic, so a whole frame of cells is handled in one call. Angles are in
+degrees, distances in km and bearings clockwise from north in [0, 360).
+"""
+
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0
+
+
+def haversine(lat1, lon1, lat2, lon2):
+    """Great-circle distance in km between points 1 and 2"""
+    lat1, lon1, lat2, lon2 = map(np.radians, (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def initial_bearing(lat1, lon1, lat2, lon2):
+    """Initial bearing from point 1 towards point 2"""
+    lat1, lon1, lat2, lon2 = map(np.radians, (lat1, lon1, lat2, lon2))
+    dlon = lon2 - lon1
+    y = np.sin(dlon) * np.cos(lat2)
+    x = np.cos(lat1) * np.sin(lat2) - np.sin(lat1) * np.cos(lat2) * np.cos(dlon)
+    return (np.degrees(np.arctan2(y, x)) + 360.0) % 360.0
+
+
+def destination_point(lat, lon, distance_km, bearing_deg):
+    """Point reached after travelling distance_km along bearing_deg; returns (lat, lon)"""
+    lat, lon, bearing = map(np.radians, (lat, lon, bearing_deg))
+    angular = np.asarray(distance_km, dtype=np.float64) / EARTH_RADIUS_KM
+    lat2 = np.arcsin(np.sin(lat) * np.cos(angular) + np.cos(lat) * np.sin(angular) * np.cos(bearing))
+    lon2 = lon + np.arctan2(np.sin(bearing) * np.sin(angular) * np.cos(lat),
+                            np.cos(angular) - np.sin(lat) * np.sin(lat2))
+    return np.degrees(lat2), (np.degrees(lon2) + 540.0) % 360.0 - 180.0
+
+
+def pairwise_distances(lats1, lons1, lats2, lons2):
+    """Distance matrix in km, shape (len(lats1), len(lats2))"""
+    lats1, lons1 = np.asarray(lats1, dtype=np.float64)[:, None], np.asarray(lons1, dtype=np.float64)[:, None]
+    lats2, lons2 = np.asarray(lats2, dtype=np.float64)[None, :], np.asarray(lons2, dtype=np.float64)[None, :]
+    return haversine(lats1, lons1, lats2, lons2)
+
+
+def angle_difference(a_deg, b_deg):
+    """Smallest absolute difference between two headings, in [0, 180]"""
+    return np.abs((np.asarray(a_deg) - np.asarray(b_deg) + 180.0) % 360.0 - 180.0)
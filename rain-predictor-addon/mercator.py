@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+# /rain-predictor-addon/mercator.py
+"""
+Web Mercator (slippy map) tile helpers shared by the predictor and the web UI.
+
+RainViewer serves radar as standard XYZ tiles. A TileMosaic is the block of
+tiles that covers a lat/lon box, stitched into one array. Its pixel <-> lat/lon
+transform is exact, so cells land where the radar saw them.
+"""
+
+import math
+
+import numpy as np
+
+TILE_SIZE = 256
+# Web Mercator is undefined at the poles; tiles stop at this latitude
+MAX_LATITUDE = 85.05112878
+# Equatorial metres per pixel at zoom 0 for 256 px tiles
+METERS_PER_PIXEL_Z0 = 156543.03392
+
+
+def lonlat_to_tilexy(lon, lat, z):
+    """Tile (x, y) containing a point at zoom z"""
+    n = 2 ** z
+    lat = max(-MAX_LATITUDE, min(MAX_LATITUDE, lat))
+    xtile = int((lon + 180.0) / 360.0 * n)
+    ytile = int((1.0 - math.asinh(math.tan(math.radians(lat))) / math.pi) / 2.0 * n)
+    return max(0, min(n - 1, xtile)), max(0, min(n - 1, ytile))
+
+
+def tilexy_bounds(west, south, east, north, z):
+    """Inclusive tile ranges (x_min, x_max, y_min, y_max) covering a lat/lon box"""
+    x1, y2 = lonlat_to_tilexy(west, south, z)
+    x2, y1 = lonlat_to_tilexy(east, north, z)
+    x_min, x_max = sorted([x1, x2])
+    y_min, y_max = sorted([y1, y2])
+    return x_min, x_max, y_min, y_max
+
+
+def lonlat_to_pixel(lon, lat, z, tile_size=TILE_SIZE):
+    """Fractional global pixel (x, y) of points at zoom z; accepts arrays"""
+    n = (2 ** z) * tile_size
+    lat = np.clip(np.asarray(lat, dtype=np.float64), -MAX_LATITUDE, MAX_LATITUDE)
+    x = (np.asarray(lon, dtype=np.float64) + 180.0) / 360.0 * n
+    y = (1.0 - np.arcsinh(np.tan(np.radians(lat))) / np.pi) / 2.0 * n
+    return x, y
+
+
+def pixel_to_lonlat(x, y, z, tile_size=TILE_SIZE):
+    """Inverse of lonlat_to_pixel; returns (lon, lat)"""
+    n = (2 ** z) * tile_size
+    lon = np.asarray(x, dtype=np.float64) / n * 360.0 - 180.0
+    lat = np.degrees(np.arctan(np.sinh(np.pi * (1.0 - 2.0 * np.asarray(y, dtype=np.float64) / n))))
+    return lon, lat
+
+
+def meters_per_pixel(lat, z, tile_size=TILE_SIZE):
+    """Ground resolution at a latitude and zoom"""
+    return METERS_PER_PIXEL_Z0 * (TILE_SIZE / tile_size) * np.cos(np.radians(lat)) / (2 ** z)
+
+
+class TileMosaic:
+    """A rectangular block of tiles at one zoom, stitched row-major into a single image"""
+
+    def __init__(self, zoom, x_min, x_max, y_min, y_max, tile_size=TILE_SIZE):
+        self.zoom = zoom
+        self.x_min, self.x_max = x_min, x_max
+        self.y_min, self.y_max = y_min, y_max
+        self.tile_size = tile_size
+
+    @classmethod
+    def covering(cls, west, south, east, north, max_zoom, max_tiles, tile_size=TILE_SIZE):
+        """Mosaic for a box at the highest zoom (up to max_zoom) that needs at most max_tiles tiles"""
+        zoom = max(0, int(max_zoom))
+        while True:
+            mosaic = cls(zoom, *tilexy_bounds(west, south, east, north, zoom), tile_size=tile_size)
+            if zoom == 0 or len(mosaic.tiles) <= max_tiles:
+                return mosaic
+            zoom -= 1
+
+    @property
+    def tiles(self):
+        """Tile (x, y) pairs in stitching order"""
+        return [(x, y) for y in range(self.y_min, self.y_max + 1) for x in range(self.x_min, self.x_max + 1)]
+
+    @property
+    def shape(self):
+        return ((self.y_max - self.y_min + 1) * self.tile_size, (self.x_max - self.x_min + 1) * self.tile_size)
+
+    @property
+    def key(self):
+        """Identifies the tile block, for cache keys"""
+        return f"{self.zoom}_{self.x_min}-{self.x_max}_{self.y_min}-{self.y_max}_{self.tile_size}"
+
+    def stitch(self, tile_arrays):
+        """Join tile arrays given in `tiles` order into one image"""
+        cols = self.x_max - self.x_min + 1
+        rows = [np.concatenate(tile_arrays[i:i + cols], axis=1) for i in range(0, len(tile_arrays), cols)]
+        return np.concatenate(rows, axis=0)
+
+    def pixel_to_latlon(self, rows, cols):
+        """Lat/lon of (fractional) image pixel indices; pixel centres are at integer indices"""
+        lon, lat = pixel_to_lonlat(np.asarray(cols, dtype=np.float64) + 0.5 + self.x_min * self.tile_size,
+                                   np.asarray(rows, dtype=np.float64) + 0.5 + self.y_min * self.tile_size,
+                                   self.zoom, self.tile_size)
+        return lat, lon
+
+    def latlon_to_pixel(self, lats, lons):
+        """Fractional image (row, col) indices of lat/lon points"""
+        x, y = lonlat_to_pixel(lons, lats, self.zoom, self.tile_size)
+        return y - 0.5 - self.y_min * self.tile_size, x - 0.5 - self.x_min * self.tile_size
+
+    def window(self, west, south, east, north):
+        """The part of the mosaic inside a lat/lon box, or the whole mosaic if they do not overlap"""
+        rows, cols = self.latlon_to_pixel(np.array([north, south]), np.array([west, east]))
+        height, width = self.shape
+        row0, row1 = max(0, int(np.floor(rows.min()))), min(height, int(np.ceil(rows.max())) + 1)
+        col0, col1 = max(0, int(np.floor(cols.min()))), min(width, int(np.ceil(cols.max())) + 1)
+        if row0 >= row1 or col0 >= col1:
+            return MosaicWindow(self, 0, height, 0, width)
+        return MosaicWindow(self, row0, row1, col0, col1)
+
+
+class MosaicWindow:
+    """A pixel window of a TileMosaic, with transforms relative to the window's own pixels"""
+
+    def __init__(self, mosaic, row0, row1, col0, col1):
+        self.mosaic = mosaic
+        self.row0, self.row1 = row0, row1
+        self.col0, self.col1 = col0, col1
+
+    @property
+    def shape(self):
+        return (self.row1 - self.row0, self.col1 - self.col0)
+
+    @property
+    def key(self):
+        return f"{self.mosaic.key}_r{self.row0}-{self.row1}_c{self.col0}-{self.col1}"
+
+    def crop(self, image):
+        """Cut this window out of a stitched mosaic image"""
+        return image[self.row0:self.row1, self.col0:self.col1]
+
+    def pixel_to_latlon(self, rows, cols):
+        return self.mosaic.pixel_to_latlon(np.asarray(rows, dtype=np.float64) + self.row0,
+                                           np.asarray(cols, dtype=np.float64) + self.col0)
+
+    def latlon_to_pixel(self, lats, lons):
+        rows, cols = self.mosaic.latlon_to_pixel(lats, lons)
+        return rows - self.row0, cols - self.col0
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+# /rain-predictor-addon/motion_field.py
+"""
+Dense radar motion field from block-wise phase correlation.
+
+A pair of radar frames is cut into square blocks and every block pair is
+phase-correlated in one batched FFT. The result is a grid of velocities in
+pixels per hour. Fields are cached per frame pair, so each prediction cycle
+computes only the pairs that involve a new frame. Converting pixels to
+distance is left to the caller, because the predictor and the web UI
+georeference their images differently.
+"""
+
+from collections import OrderedDict
+
+import numpy as np
+from scipy import ndimage
+
+DEFAULT_BLOCK_SIZE = 64
+# A block needs this fraction of rain pixels in both frames to carry a velocity
+MIN_BLOCK_COVERAGE = 0.02
+# Normalised correlation peak below which a block's shift is treated as noise
+MIN_PEAK = 0.05
+
+
+def _blocks(image, block_size, rows, cols):
+    """View an image as (rows, cols, block_size, block_size) blocks"""
+    cropped = image[:rows * block_size, :cols * block_size]
+    return cropped.reshape(rows, block_size, cols, block_size).swapaxes(1, 2)
+
+
+def _block_shifts(prev_blocks, curr_blocks):
+    """Displacement (dy, dx) and peak height of curr relative to prev for every block"""
+    block_size = prev_blocks.shape[-1]
+    window = np.outer(np.hanning(block_size), np.hanning(block_size)).astype(np.float32)
+    A = np.fft.rfft2(prev_blocks * window, axes=(-2, -1))
+    B = np.fft.rfft2(curr_blocks * window, axes=(-2, -1))
+    R = np.conj(A) * B
+    R /= np.maximum(1e-6, np.abs(R))
+    r = np.fft.irfft2(R, s=(block_size, block_size), axes=(-2, -1))
+
+    flat = r.reshape(r.shape[0], r.shape[1], -1)
+    peak_idx = flat.argmax(axis=-1)
+    peak = flat.max(axis=-1)
+    iy, ix = np.unravel_index(peak_idx, (block_size, block_size))
+
+    # Parabolic sub-pixel refinement along each axis
+    I, J = np.indices(iy.shape)
+    up, down = r[I, J, (iy - 1) % block_size, ix], r[I, J, (iy + 1) % block_size, ix]
+    left, right = r[I, J, iy, (ix - 1) % block_size], r[I, J, iy, (ix + 1) % block_size]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        sub_y = np.nan_to_num(0.5 * (up - down) / (up - 2 * peak + down))
+        sub_x = np.nan_to_num(0.5 * (left - right) / (left - 2 * peak + right))
+
+    dy = np.where(iy > block_size // 2, iy - block_size, iy) + np.clip(sub_y, -0.5, 0.5)
+    dx = np.where(ix > block_size // 2, ix - block_size, ix) + np.clip(sub_x, -0.5, 0.5)
+    return dy, dx, peak
+
+
+def phase_correlation(prev, curr):
+    """Global displacement (dy, dx, peak) of curr relative to prev; +dy is down, +dx is right"""
+    prev = np.asarray(prev, dtype=np.float32)
+    curr = np.asarray(curr, dtype=np.float32)
+    # Non-square images: correlate the largest centred square
+    size = min(prev.shape)
+    y0, x0 = (prev.shape[0] - size) // 2, (prev.shape[1] - size) // 2
+    crop = (slice(y0, y0 + size), slice(x0, x0 + size))
+    dy, dx, peak = _block_shifts(prev[crop].reshape(1, 1, size, size), curr[crop].reshape(1, 1, size, size))
+    return float(dy[0, 0]), float(dx[0, 0]), float(peak[0, 0])
+
+
+class MotionField:
+    """Per-block velocity in pixels per hour (+vy is down the image, +vx is right)"""
+
+    def __init__(self, vy, vx, peak, valid, block_size, shape):
+        self.vy = vy
+        self.vx = vx
+        self.peak = peak
+        self.valid = valid
+        self.block_size = block_size
+        self.shape = shape
+
+    @property
+    def coverage(self):
+        """Fraction of blocks with a usable velocity"""
+        return float(self.valid.mean()) if self.valid.size else 0.0
+
+    def mean(self):
+        """Peak-weighted mean velocity (vy, vx) over valid blocks, or None if there are none"""
+        if not self.valid.any():
+            return None
+        weights = np.where(self.valid, np.maximum(self.peak, 1e-6), 0.0)
+        return float(np.average(self.vy, weights=weights)), float(np.average(self.vx, weights=weights))
+
+    def at(self, y, x):
+        """Velocity (vy, vx) arrays at pixel positions, using the mean where a block has no velocity"""
+        y = np.asarray(y, dtype=np.float64)
+        x = np.asarray(x, dtype=np.float64)
+        rows, cols = self.vy.shape
+        row = np.clip((y // self.block_size).astype(np.int64), 0, rows - 1)
+        col = np.clip((x // self.block_size).astype(np.int64), 0, cols - 1)
+        mean = self.mean()
+        fallback_vy, fallback_vx = mean if mean else (np.nan, np.nan)
+        valid = self.valid[row, col]
+        return (np.where(valid, self.vy[row, col], fallback_vy),
+                np.where(valid, self.vx[row, col], fallback_vx))
+
+    def dense(self):
+        """Per-pixel velocity (vy, vx), bilinearly interpolated between block centres
+
+        Blocks without a velocity take the mean first. Returns None when no block
+        has a velocity.
+        """
+        mean = self.mean()
+        if mean is None:
+            return None
+        h, w = self.shape
+        rows, cols = self.vy.shape
+        # Pixel coordinates expressed in block units, block centres at integers
+        y = (np.arange(h, dtype=np.float64) + 0.5) / self.block_size - 0.5
+        x = (np.arange(w, dtype=np.float64) + 0.5) / self.block_size - 0.5
+        coords = np.stack(np.meshgrid(np.clip(y, 0, rows - 1), np.clip(x, 0, cols - 1), indexing='ij'))
+        vy = ndimage.map_coordinates(np.where(self.valid, self.vy, mean[0]), coords, order=1, mode='nearest')
+        vx = ndimage.map_coordinates(np.where(self.valid, self.vx, mean[1]), coords, order=1, mode='nearest')
+        return vy, vx
+
+    @classmethod
+    def average(cls, fields):
+        """Combine fields of the same grid (e.g. consecutive frame pairs) block by block"""
+        fields = [f for f in fields if f is not None]
+        if not fields:
+            return None
+        weights = np.stack([np.where(f.valid, np.maximum(f.peak, 1e-6), 0.0) for f in fields])
+        total = weights.sum(axis=0)
+        safe = np.where(total > 0, total, 1.0)
+        vy = (np.stack([f.vy for f in fields]) * weights).sum(axis=0) / safe
+        vx = (np.stack([f.vx for f in fields]) * weights).sum(axis=0) / safe
+        peak = np.stack([f.peak for f in fields]).max(axis=0)
+        return cls(vy, vx, peak, total > 0, fields[0].block_size, fields[0].shape)
+
+
+def compute_motion_field(prev, curr, seconds, block_size=DEFAULT_BLOCK_SIZE):
+    """Block-wise motion field between two frames taken `seconds` apart
+
+    prev/curr are 2D arrays of equal shape, typically rain masks (0/1) or
+    intensities. Blocks fall back to the whole image when it is smaller than
+    `block_size`.
+    """
+    prev = np.asarray(prev, dtype=np.float32)
+    curr = np.asarray(curr, dtype=np.float32)
+    h, w = prev.shape
+    block_size = int(min(block_size, h, w))
+    rows, cols = h // block_size, w // block_size
+
+    prev_blocks = _blocks(prev, block_size, rows, cols)
+    curr_blocks = _blocks(curr, block_size, rows, cols)
+    dy, dx, peak = _block_shifts(prev_blocks, curr_blocks)
+
+    coverage = np.minimum((prev_blocks > 0).mean(axis=(-2, -1)), (curr_blocks > 0).mean(axis=(-2, -1)))
+    valid = (coverage >= MIN_BLOCK_COVERAGE) & (peak >= MIN_PEAK) & (seconds > 0)
+    per_hour = 3600.0 / seconds if seconds > 0 else 0.0
+    return MotionField(dy * per_hour, dx * per_hour, peak, valid, block_size, (h, w))
+
+
+class MotionFieldCache:
+    """LRU of motion fields keyed by frame pair (plus whatever identifies the image grid)"""
+
+    def __init__(self, max_entries=16):
+        self.max_entries = max_entries
+        self.fields = OrderedDict()
+
+    def __contains__(self, key):
+        return key in self.fields
+
+    def get(self, key):
+        field = self.fields.get(key)
+        if field is not None:
+            self.fields.move_to_end(key)
+        return field
+
+    def put(self, key, field):
+        self.fields[key] = field
+        self.fields.move_to_end(key)
+        while len(self.fields) > self.max_entries:
+            self.fields.popitem(last=False)
+        return field
+
+    def get_or_compute(self, key, prev, curr, seconds, block_size=DEFAULT_BLOCK_SIZE):
+        field = self.get(key)
+        if field is None:
+            field = self.put(key, compute_motion_field(prev, curr, seconds, block_size))
+        return field
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+# /rain-predictor-addon/nowcast.py
+"""
+Extrapolation nowcast: advect the latest radar frame along the motion field.
+
+Semi-Lagrangian backward advection traces every output pixel back along the
+velocity field to its departure point, then samples the latest frame there.
+Steps are produced one at a time, so memory stays at a few (H, W) arrays
+whatever the horizon. The first step at which a pixel is rainy gives its
+"minutes until rain".
+"""
+
+import numpy as np
+from scipy import ndimage
+
+DEFAULT_STEP_MINUTES = 5
+DEFAULT_HORIZON_MINUTES = 120
+
+
+def departure_points(vy, vx, step_hours, steps):
+    """Yield the (2, H, W) array of (y, x) departure points for steps 0 to `steps`
+
+    vy/vx are per-pixel velocities in pixels per hour. Step k is the point that
+    reaches each pixel after k steps; the velocity is sampled at the previous
+    departure point (iterated backward Euler).
+    """
+    points = np.indices(vy.shape, dtype=np.float64)
+    yield points
+    for _ in range(steps):
+        step_vy = ndimage.map_coordinates(vy, points, order=1, mode='nearest')
+        step_vx = ndimage.map_coordinates(vx, points, order=1, mode='nearest')
+        points = np.stack((points[0] - step_vy * step_hours, points[1] - step_vx * step_hours))
+        yield points
+
+
+def extrapolate(frame, vy, vx, step_minutes=DEFAULT_STEP_MINUTES, horizon_minutes=DEFAULT_HORIZON_MINUTES):
+    """Yield the (H, W) forecast of `frame` advected forward for each step, step 0 being the frame itself
+
+    Rain cannot arrive from outside the image, so departure points off the edge
+    sample 0.
+    """
+    steps = max(1, int(horizon_minutes // step_minutes))
+    frame = np.asarray(frame, dtype=np.float32)
+    for points in departure_points(vy, vx, step_minutes / 60.0, steps):
+        yield ndimage.map_coordinates(frame, points, order=1, mode='constant', cval=0.0)
+
+
+def arrival_minutes(rain_mask, vy, vx, step_minutes=DEFAULT_STEP_MINUTES, horizon_minutes=DEFAULT_HORIZON_MINUTES):
+    """Per-pixel minutes until rain (0 where it is raining now, NaN if not within the horizon)"""
+    minutes = np.full(np.shape(rain_mask), np.nan, dtype=np.float32)
+    for k, forecast in enumerate(extrapolate(rain_mask, vy, vx, step_minutes, horizon_minutes)):
+        # Keep the first arrival only; later steps fill pixels still without rain
+        minutes[np.isnan(minutes) & (forecast >= 0.5)] = k * float(step_minutes)
+    return minutes
+
+
+def coarsen_minutes(minutes, factor):
+    """Earliest arrival over factor x factor blocks, for sending a compact grid to the UI"""
+    h, w = minutes.shape
+    rows, cols = h // factor, w // factor
+    blocks = minutes[:rows * factor, :cols * factor].reshape(rows, factor, cols, factor)
+    earliest = np.where(np.isnan(blocks), np.inf, blocks).min(axis=(1, 3))
+    return np.where(np.isinf(earliest), np.nan, earliest)
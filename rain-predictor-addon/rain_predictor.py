@@ -13,12 +13,70 @@ import numpy as np
 from datetime import datetime, timedelta
 from PIL import Image, ImageDraw
 import io
+from scipy import ndimage
 from scipy.ndimage import label
+from scipy.spatial import cKDTree
 import math
-from math import radians, cos, sin, asin, sqrt, atan2, degrees
 import signal
-
-VERSION = "1.1.63"
+import threading
+import geodesy
+from motion_field import MotionField, MotionFieldCache, compute_motion_field
+import nowcast
+from mercator import TileMosaic
+from state_channel import StateServer
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+
+# websocket-client is optional: without it entity updates always use the REST API
+try:
+    import websocket
+    WEBSOCKET_AVAILABLE = True
+except ImportError:
+    WEBSOCKET_AVAILABLE = False
+
+VERSION = "1.1.79"
+
+# RainViewer color scheme requested for every radar tile
+RADAR_FRAME_COLOR = 2
+# Upper bound on tiles per frame mosaic; the zoom is lowered until the analysis box fits
+MAX_MOSAIC_TILES = 16
+# Connected regions smaller than this many pixels are treated as speckle
+MIN_CELL_SIZE = 5
+
+# Max distance a cell may move between consecutive frames and still be matched
+TRACK_MATCH_DISTANCE_KM = 100
+# Nearest candidates examined per track when matching against a frame
+TRACK_MATCH_CANDIDATES = 8
+# Motion field: block size in frame pixels and how many recent frame pairs are averaged
+MOTION_BLOCK_SIZE = 32
+MOTION_FIELD_PAIRS = 3
+# Nowcast arrival grid sent to the UI is coarsened to at most this many cells per side
+NOWCAST_UI_CELLS = 48
+# Smallest change worth re-publishing for each entity value; smaller changes are skipped
+PUBLISH_THRESHOLDS = {
+    'time': 1,
+    'distance': 0.5,
+    'speed': 0.5,
+    'direction': 2,
+    'bearing': 2,
+    'rain_cell_latitude': 0.001,
+    'rain_cell_longitude': 0.001
+}
+# Unchanged values are still re-sent this often, in case the entity was changed in HA
+PUBLISH_REFRESH_SECONDS = 1800
+PUBLISH_WORKERS = 4
+# Failed entity updates are retried after 5 s, doubling up to 2 minutes
+PUBLISH_RETRY_BASE_SECONDS = 5
+PUBLISH_RETRY_MAX_SECONDS = 120
+# RainViewer frames become available shortly after their nominal time
+FRAME_PUBLISH_DELAY_SECONDS = 60
+# RainViewer's spacing between past frames, used until two frames have been seen
+DEFAULT_FRAME_STEP_SECONDS = 600
+# A threat arriving within this many minutes makes the scheduler poll at its fastest
+IMMINENT_THREAT_MINUTES = 60
+# View bounds from the Web UI older than this are ignored
+VIEW_BOUNDS_MAX_AGE_SECONDS = 30
 
 class AddonConfig:
     """Load and manage addon configuration"""
@@ -96,6 +154,193 @@ class HomeAssistantAPI:
             logging.error(f"Error calling service {service} for {entity_id}: {e}")
             return False
 
+class HomeAssistantWebSocket:
+    """Persistent connection to the Home Assistant WebSocket API for batched service calls"""
+    
+    def __init__(self, url="ws://supervisor/core/websocket"):
+        self.url = url
+        self.token = os.environ.get('SUPERVISOR_TOKEN')
+        self.connection = None
+        self.next_id = 1
+    
+    def _connect(self):
+        connection = websocket.create_connection(self.url, timeout=10)
+        greeting = json.loads(connection.recv())
+        if greeting.get('type') == 'auth_required':
+            connection.send(json.dumps({'type': 'auth', 'access_token': self.token}))
+            reply = json.loads(connection.recv())
+            if reply.get('type') != 'auth_ok':
+                connection.close()
+                raise ConnectionError(f"WebSocket authentication failed: {reply.get('message', reply.get('type'))}")
+        self.connection = connection
+        logging.info("Connected to the Home Assistant WebSocket API")
+    
+    def close(self):
+        if self.connection is not None:
+            try:
+                self.connection.close()
+            except Exception:
+                pass
+            self.connection = None
+    
+    def call_services(self, calls):
+        """Send (service, entity_id, value) calls in one pipelined batch; returns {entity_id: success}"""
+        for attempt in range(2):
+            try:
+                if self.connection is None:
+                    self._connect()
+                pending = {}
+                for service, entity_id, value in calls:
+                    domain, service_name = service.split('/', 1)
+                    message_id = self.next_id
+                    self.next_id += 1
+                    pending[message_id] = entity_id
+                    self.connection.send(json.dumps({
+                        'id': message_id,
+                        'type': 'call_service',
+                        'domain': domain,
+                        'service': service_name,
+                        'service_data': {'value': value},
+                        'target': {'entity_id': entity_id}
+                    }))
+                
+                results = {}
+                while pending:
+                    reply = json.loads(self.connection.recv())
+                    entity_id = pending.pop(reply.get('id'), None)
+                    if entity_id is None:
+                        continue
+                    results[entity_id] = bool(reply.get('success'))
+                    if not reply.get('success'):
+                        logging.error(f"WebSocket call for {entity_id} failed: {reply.get('error')}")
+                return results
+            except Exception as e:
+                # A dropped connection is reopened once before giving up on this batch
+                logging.warning(f"WebSocket batch failed (attempt {attempt + 1}): {e}")
+                self.close()
+        return {entity_id: False for _, entity_id, _ in calls}
+
+class EntityPublisher:
+    """Publishes values to Home Assistant entities, skipping those that have not meaningfully changed
+    
+    The last successfully published value of every entity is remembered. Updates
+    smaller than PUBLISH_THRESHOLDS are dropped unless the entity has not been sent
+    for PUBLISH_REFRESH_SECONDS. The rest go out concurrently over REST, or in
+    one batch over a persistent WebSocket connection.
+    """
+    
+    def __init__(self, ha_api, mode='rest'):
+        self.ha_api = ha_api
+        self.published = {}
+        self.websocket = None
+        if mode == 'websocket':
+            if WEBSOCKET_AVAILABLE:
+                self.websocket = HomeAssistantWebSocket()
+            else:
+                logging.warning("websocket-client is not installed, publishing over the REST API")
+    
+    def _changed(self, entity_id, kind, value):
+        last = self.published.get(entity_id)
+        if last is None or time.time() - last[1] > PUBLISH_REFRESH_SECONDS:
+            return True
+        previous = last[0]
+        if kind in ('direction', 'bearing') and previous >= 0 and value >= 0:
+            difference = abs((value - previous + 180) % 360 - 180)
+        else:
+            difference = abs(value - previous)
+        return difference >= PUBLISH_THRESHOLDS.get(kind, 0)
+    
+    def publish(self, updates):
+        """Publish {entity_id: (kind, value)} and return the updates that failed"""
+        pending = [(entity_id, kind, value) for entity_id, (kind, value) in updates.items()
+                   if self._changed(entity_id, kind, value)]
+        skipped = len(updates) - len(pending)
+        if not pending:
+            logging.info(f"All {skipped} entity value(s) unchanged, nothing published")
+            return {}
+        
+        started = time.monotonic()
+        calls = [("input_number/set_value", entity_id, value) for entity_id, _, value in pending]
+        if self.websocket is not None:
+            results = self.websocket.call_services(calls)
+        else:
+            with ThreadPoolExecutor(max_workers=min(PUBLISH_WORKERS, len(calls)),
+                                    thread_name_prefix='ha-publish') as pool:
+                successes = list(pool.map(lambda call: self.ha_api.call_service(*call), calls))
+            results = {entity_id: ok for (_, entity_id, _), ok in zip(calls, successes)}
+        
+        now = time.time()
+        for entity_id, _, value in pending:
+            if results.get(entity_id):
+                self.published[entity_id] = (value, now)
+        sent = sum(1 for ok in results.values() if ok)
+        logging.info(f"Published {sent}/{len(pending)} changed entity value(s), skipped {skipped} unchanged "
+                     f"in {time.monotonic() - started:.2f}s")
+        return {entity_id: (kind, value) for entity_id, kind, value in pending if not results.get(entity_id)}
+
+class ResultPublisher:
+    """Background consumer that writes each cycle's results to the cache file and Home Assistant
+    
+    The prediction loop hands results over with submit() and moves on, so a slow
+    supervisor never delays the next radar cycle. Only the newest result matters:
+    one still waiting when another arrives is replaced. Entity updates that fail
+    are retried with exponential backoff until they succeed or are superseded.
+    """
+    
+    def __init__(self, entity_publisher, write_cache):
+        self.entity_publisher = entity_publisher
+        self.write_cache = write_cache
+        self.condition = threading.Condition()
+        self.pending = None
+        self.stopping = False
+        self.thread = threading.Thread(target=self._run, name='result-publisher', daemon=True)
+    
+    def submit(self, cache_data, updates):
+        with self.condition:
+            if self.pending is not None:
+                logging.warning("Previous result not yet published, replacing it with the newer one")
+            self.pending = (cache_data, updates)
+            if not self.thread.is_alive() and not self.stopping:
+                self.thread.start()
+            self.condition.notify()
+    
+    def stop(self, timeout=15):
+        """Publish whatever is still waiting, then end the thread"""
+        with self.condition:
+            self.stopping = True
+            self.condition.notify()
+        if self.thread.is_alive():
+            self.thread.join(timeout)
+    
+    def _publish(self, updates):
+        try:
+            return self.entity_publisher.publish(updates)
+        except Exception as e:
+            logging.error(f"Error updating entities: {e}")
+            return updates
+    
+    def _run(self):
+        failed, delay = {}, PUBLISH_RETRY_BASE_SECONDS
+        while True:
+            with self.condition:
+                if self.pending is None and not self.stopping:
+                    self.condition.wait(delay if failed else None)
+                result, self.pending = self.pending, None
+                stopping = self.stopping
+            
+            if result is not None:
+                cache_data, updates = result
+                if cache_data is not None:
+                    self.write_cache(cache_data)
+                failed, delay = self._publish(updates), PUBLISH_RETRY_BASE_SECONDS
+            elif failed and not stopping:
+                logging.info(f"Retrying {len(failed)} failed entity update(s)")
+                failed = self._publish(failed)
+                delay = min(delay * 2, PUBLISH_RETRY_MAX_SECONDS)
+            
+            if stopping:
+                return
+
 class RainCell:
     """Represents a tracked rain cell"""
     
@@ -138,14 +383,8 @@ class RainCell:
             logging.warning(f"Invalid time difference: {time_diff:.4f}h for cell track")
             return None, None
         
-        # Use predictor methods if available, otherwise use local methods
-        if predictor:
-            distance_km = predictor.haversine(lat1, lon1, lat2, lon2)
-            bearing = predictor.calculate_bearing(lat1, lon1, lat2, lon2)
-        else:
-            # Fallback to local calculation methods
-            distance_km = self._haversine_fallback(lat1, lon1, lat2, lon2)
-            bearing = self._calculate_bearing_fallback(lat1, lon1, lat2, lon2)
+        distance_km = float(geodesy.haversine(lat1, lon1, lat2, lon2))
+        bearing = float(geodesy.initial_bearing(lat1, lon1, lat2, lon2))
         
         speed_kph = distance_km / time_diff
         
@@ -165,42 +404,126 @@ class RainCell:
         
         return speed_kph, bearing
     
-    def _haversine_fallback(self, lat1, lon1, lat2, lon2):
-        """Fallback haversine calculation"""
-        R = 6371
-        lat1_rad, lon1_rad, lat2_rad, lon2_rad = map(radians, [lat1, lon1, lat2, lon2])
-        dlon = lon2_rad - lon1_rad
-        dlat = lat2_rad - lat1_rad
-        a = sin(dlat / 2)**2 + cos(lat1_rad) * cos(lat2_rad) * sin(dlon / 2)**2
-        c = 2 * asin(sqrt(a))
-        return R * c
+    def _project_position(self, lat, lon, distance_km, bearing_deg):
+        """Project new position given distance and bearing from current position"""
+        lat2, lon2 = geodesy.destination_point(lat, lon, distance_km, bearing_deg)
+        return float(lat2), float(lon2)
+
+class PredictionLocation:
+    """A named place rain is predicted for, with its own Home Assistant entities"""
     
-    def _calculate_bearing_fallback(self, lat1, lon1, lat2, lon2):
-        """Fallback bearing calculation"""
-        lat1_rad, lon1_rad, lat2_rad, lon2_rad = map(radians, [lat1, lon1, lat2, lon2])
-        dlon = lon2_rad - lon1_rad
-        y = sin(dlon) * cos(lat2_rad)
-        x = cos(lat1_rad) * sin(lat2_rad) - sin(lat1_rad) * cos(lat2_rad) * cos(dlon)
-        bearing = atan2(y, x)
-        return (degrees(bearing) + 360) % 360
+    ENTITY_KEYS = ('time', 'distance', 'speed', 'direction', 'bearing', 'rain_cell_latitude', 'rain_cell_longitude')
     
-
+    def __init__(self, name, latitude, longitude, entities):
+        self.name = name
+        self.latitude = float(latitude)
+        self.longitude = float(longitude)
+        self.entities = {key: (entities or {}).get(key) for key in self.ENTITY_KEYS}
+
+class RadarFrameCache:
+    """Cache of radar tiles keyed by (timestamp, tile, zoom, color)
     
-    def _project_position(self, lat, lon, distance_km, bearing_deg):
-        """Project new position given distance and bearing from current position"""
-        lat_rad, lon_rad = radians(lat), radians(lon)
-        bearing_rad = radians(bearing_deg)
-        
-        # Earth radius in km
-        R = 6371.0
-        
-        # Calculate destination point
-        lat2_rad = asin(sin(lat_rad) * cos(distance_km / R) + 
-                        cos(lat_rad) * sin(distance_km / R) * cos(bearing_rad))
-        lon2_rad = lon_rad + atan2(sin(bearing_rad) * sin(distance_km / R) * cos(lat_rad),
-                                   cos(distance_km / R) - sin(lat_rad) * sin(lat2_rad))
-        
-        return degrees(lat2_rad), degrees(lon2_rad)
+    Published RainViewer tiles never change, so the PNGs are kept on disk
+    (surviving restarts) and decoded tiles in an in-memory LRU. Cells are stored
+    under a whole-frame mosaic key, per analysis key, because they also depend on
+    the extraction settings.
+    """
+    
+    def __init__(self, cache_dir, max_entries=32, max_age_hours=3):
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        self.max_age_seconds = max_age_hours * 3600
+        self.memory = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+        except OSError as e:
+            logging.warning(f"Radar cache directory unavailable, using memory only: {e}")
+    
+    @staticmethod
+    def key(timestamp, tile, zoom, color):
+        x, y = tile
+        return f"{timestamp}_{zoom}_{x}_{y}_{color}"
+    
+    def _path(self, key, suffix):
+        return os.path.join(self.cache_dir, f"{key}.{suffix}")
+    
+    def _entry(self, key):
+        entry = self.memory.get(key)
+        if entry is None:
+            entry = {'array': None, 'cells': None}
+            self.memory[key] = entry
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.max_entries:
+            self.memory.popitem(last=False)
+        return entry
+    
+    def _write(self, path, data):
+        try:
+            temp_path = path + ".tmp"
+            with open(temp_path, 'wb') as f:
+                f.write(data)
+            os.replace(temp_path, path)
+        except OSError as e:
+            logging.debug(f"Radar cache write skipped: {e}")
+    
+    def get_array(self, key):
+        """Return the decoded grayscale frame, or None if it has never been downloaded"""
+        entry = self._entry(key)
+        if entry['array'] is None:
+            try:
+                with open(self._path(key, 'png'), 'rb') as f:
+                    entry['array'] = np.array(Image.open(io.BytesIO(f.read())).convert('L'))
+            except (OSError, ValueError):
+                return None
+        return entry['array']
+    
+    def put_image(self, key, data):
+        """Store a downloaded frame and return its decoded grayscale array"""
+        array = np.array(Image.open(io.BytesIO(data)).convert('L'))
+        self._entry(key)['array'] = array
+        self._write(self._path(key, 'png'), data)
+        return array
+    
+    def _load_cells(self, key):
+        entry = self._entry(key)
+        if entry['cells'] is None:
+            try:
+                with open(self._path(key, 'cells.json'), 'r') as f:
+                    entry['cells'] = json.load(f)
+            except (OSError, ValueError):
+                entry['cells'] = {}
+        return entry['cells']
+    
+    def get_cells(self, key, analysis_key):
+        """Return cells previously extracted from this frame with the same analysis settings"""
+        cells = self._load_cells(key).get(analysis_key)
+        if cells is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return cells
+    
+    def put_cells(self, key, analysis_key, cells):
+        stored = self._load_cells(key)
+        stored[analysis_key] = [{k: int(v) if k == 'size' else float(v) for k, v in cell.items()} for cell in cells]
+        self._write(self._path(key, 'cells.json'), json.dumps(stored).encode())
+    
+    def prune(self):
+        """Delete frames older than RainViewer's past window from disk"""
+        cutoff = time.time() - self.max_age_seconds
+        removed = 0
+        try:
+            for name in os.listdir(self.cache_dir):
+                path = os.path.join(self.cache_dir, name)
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+                    removed += 1
+        except OSError as e:
+            logging.debug(f"Radar cache prune skipped: {e}")
+        if removed:
+            logging.debug(f"Pruned {removed} expired radar cache file(s)")
 
 class RainPredictor:
     """Main rain prediction logic"""
@@ -209,15 +532,44 @@ class RainPredictor:
         logging.info(f"Loaded config: {config}")
         self.config = config
         self.ha_api = ha_api
+        self.publisher = EntityPublisher(ha_api, config.get('publishing.mode', 'rest'))
+        self.result_publisher = ResultPublisher(self.publisher, self._share_analysis)
+        # The Web UI receives results and sends view bounds over a local socket
+        self.state_server = StateServer(on_message=self._on_channel_message)
+        self.pushed_view = None
         self.running = False
+        self.stop_event = threading.Event()
+        self.latest_frame_time = None
+        self.frame_step = DEFAULT_FRAME_STEP_SECONDS
+        self.analyzed_frame_time = None
+        self.threat_level = 'watch'
+        # Last analysed predictions and when they were made, for the countdown between frames
+        self.last_predictions = []
+        self.predicted_at = None
         self.tracked_cells = {}
         self.next_cell_id = 1
         self.latest_analysis_path = "/data/latest_analysis.json"
+        # Room for every tile of every past frame plus the per-frame cell entries
+        self.frame_cache = RadarFrameCache(os.path.join(os.environ.get("DATA_PATH", "/data"), "radar_cache"),
+                                           max_entries=MAX_MOSAIC_TILES * 16)
         self.last_detected_cells = []
+        self.motion_fields = MotionFieldCache(max_entries=16)
+        self.motion_field = None
+        self.motion_field_key = ()
+        self.mosaic = None
+        self.roi = None
+        self.nowcast = None
         # Extract configuration values
         self.latitude = config.get('latitude', -24.98)
         self.longitude = config.get('longitude', 151.86)
         self.run_interval = config.get('run_interval_minutes', 3) * 60
+        # Adaptive scheduling: poll the metadata, analyse only new frames, pace by threat level
+        self.adaptive = config.get('scheduling.adaptive', True)
+        self.poll_intervals = {
+            'imminent': config.get('scheduling.min_interval_minutes', 1) * 60,
+            'watch': self.run_interval,
+            'clear': config.get('scheduling.idle_interval_minutes', 15) * 60
+        }
         self.api_url = config.get('api_url', 'https://api.rainviewer.com/public/weather-maps.json')
         
         # Entity IDs
@@ -231,6 +583,7 @@ class RainPredictor:
             'rain_cell_longitude': config.get('entities.rain_cell_longitude')
         }
         logging.debug(f"RainPredictor initialized with time entity: {self.entities['time']}")
+        self.locations = self._load_locations(config)
 
         self._setup_logging()
         # Default values
@@ -245,12 +598,21 @@ class RainPredictor:
         self.image_zoom = config.get('image_settings.zoom', 8)
         self.image_color = config.get('image_settings.color_scheme', 3)
         self.image_opts = config.get('image_settings.options', '0_0')
+        self.tile_size = 512 if self.image_size == 512 else 256
+        self.download_workers = max(1, int(config.get('image_settings.download_workers', 4)))
+        
+        # Shared HTTP session so frame downloads reuse keep-alive connections
+        self.http = requests.Session()
+        adapter = HTTPAdapter(pool_connections=self.download_workers, pool_maxsize=self.download_workers)
+        self.http.mount('https://', adapter)
+        self.http.mount('http://', adapter)
         
         # Analysis settings
         self.threshold = config.get('analysis_settings.rain_threshold', 50)  # Lowered from 75 to detect lighter rain
         self.lat_range = config.get('analysis_settings.lat_range_deg', 5.0)
         self.lon_range = config.get('analysis_settings.lon_range_deg', 5.0)
         self.arrival_angle_threshold = config.get('analysis_settings.arrival_angle_threshold_deg', 90)  # Increased from 45° to be less restrictive
+        self.nowcast_horizon = config.get('analysis_settings.nowcast_horizon_minutes', nowcast.DEFAULT_HORIZON_MINUTES)
 
         # Debug settings
         self.debug_dir = config.get('debug.debug_dir', '/share/rain_predictor_debug')
@@ -273,6 +635,38 @@ class RainPredictor:
         logging.info(f"Rain Predictor {VERSION} initialized")
         self._log_config()
     
+    def _load_locations(self, config):
+        """The main location followed by any extra `locations` from the config
+        
+        All locations share one set of radar frames and tracked cells per cycle.
+        """
+        locations = [PredictionLocation('home', self.latitude, self.longitude, self.entities)]
+        names = {'home'}
+        for index, item in enumerate(config.get('locations', []) or []):
+            try:
+                name = str(item.get('name') or f"location_{index + 1}")
+                if name in names:
+                    logging.warning(f"Duplicate location name '{name}', skipping")
+                    continue
+                # The addon schema allows only two levels of nesting, so entities are flat `<key>_entity` options
+                entities = {key: item.get(f"{key}_entity") for key in PredictionLocation.ENTITY_KEYS}
+                locations.append(PredictionLocation(name, item['latitude'], item['longitude'], entities))
+                names.add(name)
+            except (KeyError, TypeError, ValueError, AttributeError) as e:
+                logging.warning(f"Invalid location entry {index + 1}: {e}")
+        return locations
+    
+    def _location_distances(self, lats, lons):
+        """Distance matrix in km from each point to each location, shape (points, locations)"""
+        location_lats, location_lons = self._location_coordinates()
+        return geodesy.pairwise_distances(lats, lons, location_lats, location_lons)
+    
+    def _location_coordinates(self):
+        """Latitude and longitude arrays of all locations, in self.locations order"""
+        lats = np.array([location.latitude for location in self.locations], dtype=np.float64)
+        lons = np.array([location.longitude for location in self.locations], dtype=np.float64)
+        return lats, lons
+    
     def _setup_logging(self):
         """Setup logging based on configuration"""
         log_level = self.config.get('debug.log_level', 'INFO')
@@ -293,37 +687,17 @@ class RainPredictor:
         logging.info(f"View bounds set: center=({center.get('lat', 0):.4f}, {center.get('lng', 0):.4f}), zoom={zoom}")
         logging.info(f"View bounds set: size={view_size_km.get('width', 0):.1f}km x {view_size_km.get('height', 0):.1f}km")
     
-    def _load_view_bounds_from_file(self):
-        """Load current view bounds from shared file"""
-        try:
-            with open('/tmp/view_bounds.json', 'r') as f:
-                view_data = json.load(f)
-            
-            # Check if data is recent (within last 30 seconds)
-            if time.time() - view_data.get('timestamp', 0) < 30:
-                self.set_view_bounds(
-                    view_data.get('bounds', {}),
-                    view_data.get('center', {}),
-                    view_data.get('zoom', 8),
-                    view_data.get('view_size_km', {})
-                )
-                return True
-            else:
-                logging.debug("View bounds data is stale, ignoring")
-                return False
-                
-        except FileNotFoundError:
-            logging.debug("No view bounds file found")
-            return False
-        except Exception as e:
-            logging.debug(f"Error loading view bounds: {e}")
-            return False
-    
     def _log_config(self):
         """Log current configuration"""
         logging.info("=" * 60)
         logging.info(f"Location: ({self.latitude}, {self.longitude})")
+        for location in self.locations[1:]:
+            logging.info(f"Extra location '{location.name}': ({location.latitude}, {location.longitude}), "
+                         f"time entity: {location.entities['time']}")
         logging.info(f"Run interval: {self.run_interval/60} minutes")
+        if self.adaptive:
+            logging.info(f"Adaptive scheduling: {self.poll_intervals['imminent']/60:g} min when rain is imminent, "
+                         f"{self.poll_intervals['clear']/60:g} min when no cells are in range")
         logging.info(f"Time entity: {self.entities['time']}")
         logging.info(f"Image: Size={self.image_size}, Zoom={self.image_zoom}")
         logging.info(f"Threshold: {self.threshold}")
@@ -336,30 +710,11 @@ class RainPredictor:
     
     def haversine(self, lat1, lon1, lat2, lon2):
         """Calculate great-circle distance between two points"""
-        R = 6371
-        try:
-            lat1_rad, lon1_rad, lat2_rad, lon2_rad = map(radians, [lat1, lon1, lat2, lon2])
-            dlon = lon2_rad - lon1_rad
-            dlat = lat2_rad - lat1_rad
-            a = sin(dlat / 2)**2 + cos(lat1_rad) * cos(lat2_rad) * sin(dlon / 2)**2
-            c = 2 * asin(sqrt(a))
-            return max(0, R * c)
-        except ValueError as e:
-            logging.error(f"Haversine error: {e}")
-            return float('inf')
+        return float(geodesy.haversine(lat1, lon1, lat2, lon2))
     
     def calculate_bearing(self, lat1, lon1, lat2, lon2):
         """Calculate initial bearing from point 1 to point 2"""
-        try:
-            lat1_rad, lon1_rad, lat2_rad, lon2_rad = map(radians, [lat1, lon1, lat2, lon2])
-            dlon = lon2_rad - lon1_rad
-            y = sin(dlon) * cos(lat2_rad)
-            x = cos(lat1_rad) * sin(lat2_rad) - sin(lat1_rad) * cos(lat2_rad) * cos(dlon)
-            bearing = atan2(y, x)
-            return (degrees(bearing) + 360) % 360
-        except ValueError as e:
-            logging.error(f"Bearing calculation error: {e}")
-            return None
+        return float(geodesy.initial_bearing(lat1, lon1, lat2, lon2))
     
     def degrees_to_cardinal(self, degrees):
         """Convert degrees to cardinal direction"""
@@ -434,16 +789,21 @@ class RainPredictor:
         except Exception as e:
             logging.error(f"Error saving debug image: {e}")
     
+    def _on_channel_message(self, kind, data):
+        """Handle a message from the Web UI (called on the state channel's thread)"""
+        if kind == 'view_bounds' and isinstance(data, dict):
+            self.pushed_view = data
+
     def _read_view_bounds(self):
-        """Read current view bounds from frontend shared file"""
+        """Apply the Web UI's current view bounds, as pushed over the state channel or else from the shared file"""
         try:
-            import json
-            with open('/tmp/view_bounds.json', 'r') as f:
-                view_data = json.load(f)
+            view_data = self.pushed_view
+            if not view_data or time.time() - view_data.get('timestamp', 0) >= VIEW_BOUNDS_MAX_AGE_SECONDS:
+                # Only written by the Web UI while the state channel is down
+                with open('/tmp/view_bounds.json', 'r') as f:
+                    view_data = json.load(f)
             
-            # Check if data is recent (within last 30 seconds)
-            import time
-            if time.time() - view_data.get('timestamp', 0) < 30:
+            if time.time() - view_data.get('timestamp', 0) < VIEW_BOUNDS_MAX_AGE_SECONDS:
                 self.view_center = view_data.get('center', {})
                 self.view_size_km = view_data.get('view_size_km', {})
                 self.view_bounds = view_data.get('bounds', {})
@@ -466,7 +826,7 @@ class RainPredictor:
             return False
     
     def analyze_radar_data(self, past_frames, api_data):
-        """Analyze radar data and predict rain arrival"""
+        """Analyze radar data and predict rain arrival, returning one prediction per location"""
         logging.info("=" * 60)
         logging.info(f"ANALYZING {len(past_frames)} FRAMES")
         logging.info("=" * 60)
@@ -474,36 +834,33 @@ class RainPredictor:
         # Read dynamic view bounds from frontend
         self._read_view_bounds()
         
-        # Load current view bounds for focused analysis
-        self._load_view_bounds_from_file()
-        
-        prediction = {
+        predictions = [{
             'time_to_rain': None,
             'speed_kph': None,
             'distance_km': None,
             'direction_deg': None,
             'bearing_to_cell_deg': None
-        }
+        } for _ in self.locations]
         
         if not past_frames:
             logging.warning("❌ No frames to analyze")
-            return prediction
+            return predictions
             
         if len(past_frames) < 2:
             logging.warning(f"❌ Only {len(past_frames)} frame(s) - need at least 2 for tracking")
-            return prediction
+            return predictions
         
         # Check if rain is currently at location
         latest_frame = sorted(past_frames, key=lambda f: f.get('time', 0))[-1]
         if self._check_current_rain(latest_frame, api_data):
             logging.info("🌧️  RAIN DETECTED AT CURRENT LOCATION!")
-            return {
+            return [{
                 'time_to_rain': 0,
                 'speed_kph': 0,
                 'distance_km': 0,
                 'direction_deg': self.defaults['no_direction'],
                 'bearing_to_cell_deg': self.defaults['no_bearing']
-            }
+            } for _ in self.locations]
         
         # Process all frames and track cells
         try:
@@ -547,39 +904,125 @@ class RainPredictor:
                 else:
                     logging.info(f"  Velocity: Not enough data yet")
             
-            # Find threatening cell
-            threat = self._find_threatening_cell()
+            # Find threatening cells for every location at once
+            threats = self._find_threatening_cells()
+            nowcast_minutes = self._nowcast_minutes_at_locations()
             
-            if threat:
-                logging.info(f"\n⚠️  THREAT DETECTED: {threat}")
-                prediction.update(threat)
-            else:
-                logging.info("\n✅ No threatening cells detected")
+            for location, prediction, threat, minutes in zip(self.locations, predictions, threats, nowcast_minutes):
+                if threat:
+                    logging.info(f"\n⚠️  THREAT DETECTED for {location.name}: {threat}")
+                    prediction.update(threat)
+                else:
+                    logging.info(f"\n✅ No threatening cells detected for {location.name}")
+                
+                # The nowcast advects the whole frame, so it gives the arrival time when it sees rain coming
+                if minutes is not None:
+                    logging.info(f"Nowcast arrival at {location.name}: {minutes:.0f} min")
+                    prediction['time_to_rain'] = round(minutes)
         
         except Exception as e:
             logging.error(f"❌ Error in radar analysis: {e}", exc_info=True)
         
-        return prediction
+        return predictions
     
     def _check_current_rain(self, frame, api_data):
         """Check if rain is currently at location"""
         return False
     
 
-    def _extract_cells_from_frame(self, frame, api_data):
-        """Extract rain cells from a single radar frame"""
+    def _tile_url(self, timestamp, tile, mosaic, api_data):
+        """Build the radar tile URL for one tile of a frame mosaic"""
+        host = api_data.get('host', 'https://tilecache.rainviewer.com').replace('https://', '')
+        x, y = tile
+        return (f"https://{host}/v2/radar/{timestamp}/{mosaic.tile_size}/"
+                f"{mosaic.zoom}/{x}/{y}/{RADAR_FRAME_COLOR}/1_1.png")
+
+    def _download_tile(self, url):
+        """Download one radar tile, returning None on failure"""
+        try:
+            response = self.http.get(url, timeout=5)
+            response.raise_for_status()
+            return response.content
+        except requests.exceptions.RequestException as e:
+            logging.error(f"Error downloading tile {url}: {e}")
+            return None
+
+    def _download_tiles(self, urls):
+        """Download tiles concurrently, returned in the same order as urls"""
+        if not urls:
+            return []
+        workers = min(self.download_workers, len(urls))
+        started = time.monotonic()
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='radar-download') as pool:
+            images = list(pool.map(self._download_tile, urls))
+        logging.info(f"Downloaded {sum(1 for i in images if i)}/{len(urls)} tiles "
+                     f"in {time.monotonic() - started:.2f}s using {workers} worker(s)")
+        return images
+
+    def _tracking_bounds(self):
+        """(west, south, east, north) of the tracking radius around every location"""
+        lats, lons = self._location_coordinates()
+        lat_pad = self.max_track_dist / 111.0
+        # Pad longitude for the location furthest from the equator, where degrees are shortest
+        lon_pad = self.max_track_dist / (111.0 * max(0.01, math.cos(math.radians(float(np.abs(lats).max())))))
+        return lons.min() - lon_pad, lats.min() - lat_pad, lons.max() + lon_pad, lats.max() + lat_pad
+
+    def _analysis_mosaic(self):
+        """Tile mosaic covering the analysis box at the configured zoom (lowered to fit MAX_MOSAIC_TILES)
+        
+        The box is the analysis area joined with the tracking radius of every
+        location, so a location outside the home area or the viewed map still
+        has radar under it.
+        """
+        center_lat, center_lon, lat_range, lon_range = self._analysis_area()
+        west, south, east, north = self._tracking_bounds()
+        return TileMosaic.covering(min(west, center_lon - lon_range / 2.0), min(south, center_lat - lat_range / 2.0),
+                                   max(east, center_lon + lon_range / 2.0), max(north, center_lat + lat_range / 2.0),
+                                   self.image_zoom, MAX_MOSAIC_TILES, self.tile_size)
+
+    def _tile_cache_key(self, frame, tile, mosaic):
+        return RadarFrameCache.key(frame['time'], tile, mosaic.zoom, f"{RADAR_FRAME_COLOR}_{mosaic.tile_size}")
+
+    def _analysis_roi(self, mosaic):
+        """Window of the mosaic that segmentation runs on, the same for every frame of a cycle
+        
+        The Web UI's view bounds clipped to the tracking radius around the
+        locations, or the tracking radius alone when there is no view (or it lies
+        outside); cells outside it can never be matched to a location.
+        """
+        west, south, east, north = self._tracking_bounds()
+        bounds = self.view_bounds or {}
+        if all(side in bounds for side in ('north', 'south', 'east', 'west')):
+            clipped = (max(west, bounds['west']), max(south, bounds['south']),
+                       min(east, bounds['east']), min(north, bounds['north']))
+            if clipped[0] < clipped[2] and clipped[1] < clipped[3]:
+                west, south, east, north = clipped
+        return mosaic.window(west, south, east, north)
+
+    def _frame_cache_key(self, frame, roi):
+        """Key for a cropped frame mosaic (cells and motion fields are stored under it)"""
+        return f"{frame['time']}_{roi.key}_{RADAR_FRAME_COLOR}"
+
+    def _frame_mosaic_array(self, frame, mosaic):
+        """Stitch a frame from cached tiles, or None if any tile is missing"""
+        tiles = [self.frame_cache.get_array(self._tile_cache_key(frame, tile, mosaic)) for tile in mosaic.tiles]
+        if any(tile is None for tile in tiles):
+            return None
+        return mosaic.stitch(tiles)
+
+    def _frame_array(self, frame):
+        """A frame's mosaic cropped to this cycle's region of interest, or None if a tile is missing"""
+        array = self._frame_mosaic_array(frame, self.mosaic)
+        return self.roi.crop(array) if array is not None else None
+
+    def _analysis_key(self):
+        """Identify the settings that cell extraction depends on besides the image"""
+        # The mosaic is georeferenced exactly, so only the threshold matters
+        return f"{self.threshold}"
+
+    def _extract_cells_from_array(self, img_array):
+        """Extract rain cells from a decoded grayscale radar frame"""
         try:
-            timestamp = frame['time']
-            host = api_data.get('host', 'https://tilecache.rainviewer.com').replace('https://', '')
-            img_url = f"https://{host}/v2/radar/{timestamp}/256/0/0/0/2/1_1.png"
-            
-            response = requests.get(img_url, timeout=5)
-            img = Image.open(io.BytesIO(response.content))
-            
-            # Convert to grayscale and threshold
-            img_gray = img.convert('L')
-            img_array = np.array(img_gray)
-            
             # Apply threshold to identify rain areas
             thresholded = (img_array > self.threshold).astype(np.uint8) * 255
             
@@ -602,16 +1045,51 @@ class RainPredictor:
             
             logging.info(f"Analyzing ALL {len(past_frames)} frames for movement detection")
             
-            # Read dynamic view bounds from frontend
-            self._read_view_bounds()
+            # Every frame is a mosaic of the tiles covering the analysis box
+            mosaic = self._analysis_mosaic()
+            self.mosaic = mosaic
+            logging.info(f"Radar mosaic: zoom {mosaic.zoom}, {len(mosaic.tiles)} tile(s), {mosaic.shape[1]}x{mosaic.shape[0]} px")
+            
+            # Segmentation only needs the region of interest; every frame gets the same crop
+            self.roi = self._analysis_roi(mosaic)
+            roi_fraction = (self.roi.shape[0] * self.roi.shape[1]) / (mosaic.shape[0] * mosaic.shape[1])
+            logging.info(f"Region of interest: {self.roi.shape[1]}x{self.roi.shape[0]} px ({roi_fraction:.0%} of the mosaic)")
+            
+            # Tiles are immutable, so only tiles new since the last cycle are downloaded
+            analysis_key = self._analysis_key()
+            cache_keys = [self._frame_cache_key(frame, self.roi) for frame in past_frames]
+            cached_cells = [self.frame_cache.get_cells(key, analysis_key) for key in cache_keys]
+            arrays = [None if cells is not None else self._frame_array(frame)
+                      for frame, cells in zip(past_frames, cached_cells)]
+            to_download = [(i, tile) for i, (cells, array) in enumerate(zip(cached_cells, arrays))
+                           if cells is None and array is None for tile in mosaic.tiles
+                           if self.frame_cache.get_array(self._tile_cache_key(past_frames[i], tile, mosaic)) is None]
+            
+            # Network-bound, so fetch every missing tile of every frame in one parallel batch
+            downloaded = self._download_tiles([self._tile_url(past_frames[i]['time'], tile, mosaic, api_data)
+                                               for i, tile in to_download])
+            for (i, tile), image_data in zip(to_download, downloaded):
+                if image_data is not None:
+                    try:
+                        self.frame_cache.put_image(self._tile_cache_key(past_frames[i], tile, mosaic), image_data)
+                    except Exception as e:
+                        logging.error(f"Error decoding tile {tile} of frame {past_frames[i]['time']}: {e}")
+            for i in sorted({i for i, _ in to_download}):
+                arrays[i] = self._frame_array(past_frames[i])
+            
+            logging.info(f"Frame cache: {sum(1 for c in cached_cells if c is not None)} frame(s) with cached cells, "
+                         f"{len(to_download)} tile(s) downloaded")
             
             # Extract cells from each frame
             frame_cells = []
-            host = api_data.get('host', 'https://tilecache.rainviewer.com').replace('https://', '')
             
             for frame_idx, frame in enumerate(past_frames):
                 try:
-                    cells = self._extract_cells_from_frame(frame, api_data)
+                    cells = cached_cells[frame_idx]
+                    if cells is None:
+                        cells = self._extract_cells_from_array(arrays[frame_idx]) if arrays[frame_idx] is not None else []
+                        if arrays[frame_idx] is not None:
+                            self.frame_cache.put_cells(cache_keys[frame_idx], analysis_key, cells)
                     
                     if frame_idx == len(past_frames) - 1:
                         self.last_detected_cells = cells
@@ -627,6 +1105,10 @@ class RainPredictor:
                 except Exception as e:
                     logging.error(f"Error processing frame {frame_idx}: {e}")
                     continue
+            self.frame_cache.prune()
+            self._update_motion_field(past_frames, cache_keys, arrays)
+            self._run_nowcast(past_frames[-1], cache_keys[-1], arrays[-1])
+            
             # Analyze movement patterns across frames
             moving_cells = self._analyze_movement_patterns(frame_cells)
             logging.info(f"Movement analysis found {len(moving_cells)} cells with consistent movement")
@@ -637,11 +1119,124 @@ class RainPredictor:
             logging.error(f"Error extracting cells from all frames: {e}", exc_info=True)
             return []
     
-    def _convert_cells_to_coordinates(self, img_array, labeled_image, num_labels):
-        """Convert pixel cells to lat/lon coordinates"""
-        cells = []
-        img_height, img_width = img_array.shape
+    def _update_motion_field(self, past_frames, cache_keys, arrays):
+        """Average the motion fields of the most recent frame pairs into self.motion_field
+        
+        Fields are cached per frame pair, so a cycle computes at most the pairs that
+        involve newly published frames.
+        """
+        fields = []
+        pair_keys = []
+        for i in range(max(1, len(past_frames) - MOTION_FIELD_PAIRS), len(past_frames)):
+            pair_key = (cache_keys[i - 1], cache_keys[i], self.threshold)
+            field = self.motion_fields.get(pair_key)
+            if field is None:
+                for j in (i - 1, i):
+                    if arrays[j] is None:
+                        arrays[j] = self._frame_array(past_frames[j])
+                if arrays[i - 1] is None or arrays[i] is None:
+                    continue
+                seconds = past_frames[i]['time'] - past_frames[i - 1]['time']
+                field = self.motion_fields.put(pair_key, compute_motion_field(
+                    arrays[i - 1] > self.threshold, arrays[i] > self.threshold, seconds, MOTION_BLOCK_SIZE))
+            fields.append(field)
+            pair_keys.append(pair_key)
+        
+        self.motion_field = MotionField.average(fields)
+        self.motion_field_key = tuple(pair_keys)
+        if self.motion_field is not None:
+            logging.info(f"Motion field from {len(fields)} frame pair(s): "
+                         f"{self.motion_field.coverage:.0%} of blocks carry a velocity")
+    
+    def _flow_velocities(self, lats, lons):
+        """Speed (kph), direction (deg) and a validity mask from the motion field at each point
+        
+        Returns None when there is no motion field yet.
+        """
+        field = self.motion_field
+        if field is None:
+            return None
+        lats = np.asarray(lats, dtype=np.float64)
+        lons = np.asarray(lons, dtype=np.float64)
+        y, x = self.roi.latlon_to_pixel(lats, lons)
+        vy, vx = field.at(y, x)
+        valid = np.isfinite(vy) & np.isfinite(vx)
+        # Where the cells would be after an hour of moving with the field
+        end_lat, end_lon = self.roi.pixel_to_latlon(y + np.nan_to_num(vy), x + np.nan_to_num(vx))
+        speed = geodesy.haversine(lats, lons, end_lat, end_lon)
+        direction = geodesy.initial_bearing(lats, lons, end_lat, end_lon)
+        return speed, direction, valid
+    
+    def _run_nowcast(self, frame, cache_key, img_array):
+        """Advect the latest frame along the motion field into a minutes-until-rain raster
         
+        Sets self.nowcast to None when there is no motion field or frame to advect.
+        """
+        nowcast_key = (cache_key, self.threshold, self.nowcast_horizon, self.motion_field_key)
+        if self.nowcast is not None and self.nowcast['key'] == nowcast_key:
+            return
+        self.nowcast = None
+        dense = self.motion_field.dense() if self.motion_field is not None else None
+        if dense is None:
+            return
+        if img_array is None:
+            img_array = self._frame_array(frame)
+        if img_array is None:
+            return
+        
+        started = time.monotonic()
+        vy, vx = dense
+        minutes = nowcast.arrival_minutes((img_array > self.threshold).astype(np.float32), vy, vx,
+                                          nowcast.DEFAULT_STEP_MINUTES, self.nowcast_horizon)
+        self.nowcast = {
+            'key': nowcast_key,
+            'mosaic': self.roi,
+            'frame_time': frame['time'],
+            'minutes': minutes,
+            'step_minutes': nowcast.DEFAULT_STEP_MINUTES,
+            'horizon_minutes': self.nowcast_horizon
+        }
+        logging.info(f"Nowcast: {np.isfinite(minutes).mean():.0%} of the frame sees rain within "
+                     f"{self.nowcast_horizon} min ({time.monotonic() - started:.2f}s)")
+    
+    def _nowcast_minutes_at_locations(self):
+        """Minutes until rain from the nowcast at every location (None where none is expected)"""
+        if self.nowcast is None:
+            return [None] * len(self.locations)
+        minutes = self.nowcast['minutes']
+        location_lats, location_lons = self._location_coordinates()
+        y, x = self.nowcast['mosaic'].latlon_to_pixel(location_lats, location_lons)
+        rows, cols = np.rint(y).astype(np.int64), np.rint(x).astype(np.int64)
+        inside = (rows >= 0) & (rows < minutes.shape[0]) & (cols >= 0) & (cols < minutes.shape[1])
+        values = np.full(len(self.locations), np.nan)
+        values[inside] = minutes[rows[inside], cols[inside]]
+        # The raster counts from the radar frame's time, which is already in the past
+        elapsed = (time.time() - self.nowcast['frame_time']) / 60.0
+        return [None if np.isnan(v) else max(0.0, float(v) - elapsed) for v in values]
+    
+    def _nowcast_ui_grid(self):
+        """Coarse arrival grid for the Web UI: row/column edge lat/lons and minutes (None = no rain)"""
+        if self.nowcast is None:
+            return None
+        mosaic = self.nowcast['mosaic']
+        img_height, img_width = self.nowcast['minutes'].shape
+        factor = max(1, math.ceil(max(img_height, img_width) / NOWCAST_UI_CELLS))
+        minutes = nowcast.coarsen_minutes(self.nowcast['minutes'], factor)
+        rows, cols = minutes.shape
+        # Mercator rows are not evenly spaced in latitude, so send every edge
+        lat_edges, _ = mosaic.pixel_to_latlon(np.arange(rows + 1) * factor - 0.5, np.zeros(rows + 1))
+        _, lon_edges = mosaic.pixel_to_latlon(np.zeros(cols + 1), np.arange(cols + 1) * factor - 0.5)
+        return {
+            'frame_time': self.nowcast['frame_time'],
+            'step_minutes': self.nowcast['step_minutes'],
+            'horizon_minutes': self.nowcast['horizon_minutes'],
+            'lat_edges': [round(v, 5) for v in lat_edges.tolist()],
+            'lon_edges': [round(v, 5) for v in lon_edges.tolist()],
+            'minutes': [[None if np.isnan(v) else int(v) for v in row] for row in minutes.tolist()]
+        }
+    
+    def _analysis_area(self):
+        """Return (center_lat, center_lon, lat_range, lon_range) of the area a radar frame covers"""
         # Use dynamic analysis area based on user view bounds
         if hasattr(self, 'view_center') and self.view_center and hasattr(self, 'view_size_km') and self.view_size_km:
             # Calculate range from actual view bounds
@@ -679,33 +1274,45 @@ class RainPredictor:
             else:
                 logging.info(f"Using configured analysis range: {lat_range:.1f}° x {lon_range:.1f}°")
         
-        lat_inc = lat_range / img_height
-        lon_inc = lon_range / img_width
-        center_y = (img_height - 1) / 2.0
-        center_x = (img_width - 1) / 2.0
+        return center_lat, center_lon, lat_range, lon_range
+    
+    def _label_statistics(self, img_array, labeled_image, num_labels, min_size=MIN_CELL_SIZE):
+        """Per-label pixel statistics computed in one pass over the image
         
-        # Center is already calculated above based on view bounds
+        Returns arrays (label, size, centroid_y, centroid_x, intensity) for labels of at
+        least `min_size` pixels, or None when there are none.
+        """
+        if num_labels == 0:
+            return None
         
-        for i in range(1, num_labels + 1):
-            y_coords, x_coords = np.where(labeled_image == i)
-            cell_size = len(y_coords)
-            
-            if cell_size < 5:
-                continue
-            
-            centroid_x, centroid_y = np.mean(x_coords), np.mean(y_coords)
-            # FIXED: Correct coordinate conversion
-            lat_offset = (centroid_y - center_y) * lat_inc
-            lon_offset = (centroid_x - center_x) * lon_inc
-            
-            est_lat = np.clip(center_lat + lat_offset, -90, 90)
-            est_lon = np.clip(center_lon + lon_offset, -180, 180)
-            
-            intensity = np.mean(img_array[y_coords, x_coords])
-            
+        sizes = np.bincount(labeled_image.ravel(), minlength=num_labels + 1)[1:]
+        labels = np.arange(1, num_labels + 1)[sizes >= min_size]
+        if labels.size == 0:
+            return None
+        
+        centroids = np.asarray(ndimage.center_of_mass(np.ones_like(labeled_image), labeled_image, labels), dtype=np.float64)
+        return {
+            'label': labels,
+            'size': sizes[labels - 1],
+            'centroid_y': centroids[:, 0],
+            'centroid_x': centroids[:, 1],
+            'intensity': np.asarray(ndimage.mean(img_array, labeled_image, labels), dtype=np.float64)
+        }
+    
+    def _convert_cells_to_coordinates(self, img_array, labeled_image, num_labels):
+        """Convert pixel cells of the cropped frame to lat/lon through the mosaic's Web Mercator transform"""
+        cells = []
+        stats = self._label_statistics(img_array, labeled_image, num_labels)
+        if stats is None:
+            return cells
+        
+        est_lat, est_lon = self.roi.pixel_to_latlon(stats['centroid_y'], stats['centroid_x'])
+        
+        for lat, lon, intensity, cell_size in zip(est_lat.tolist(), est_lon.tolist(),
+                                                  stats['intensity'].tolist(), stats['size'].tolist()):
             cells.append({
-                'lat': est_lat,
-                'lon': est_lon,
+                'lat': lat,
+                'lon': lon,
                 'intensity': intensity,
                 'size': cell_size
             })
@@ -724,33 +1331,66 @@ class RainPredictor:
         latest_frame = frame_cells[-1]['cells']
         logging.info(f"Latest frame has {len(latest_frame)} cells to track")
         
-        for cell_idx, latest_cell in enumerate(latest_frame):
-            # Track this cell back through previous frames
-            positions = self._track_cell_backwards(latest_cell, frame_cells, cell_idx)
+        # Track every latest cell back through previous frames in one pass per frame
+        tracks = self._track_cells_backwards(frame_cells)
+        
+        moving = [cell_idx for cell_idx, positions in enumerate(tracks) if len(positions) >= 2]
+        cells_with_movement = len(moving)
+        if moving:
+            movement = self._calculate_movement_vectors([tracks[cell_idx] for cell_idx in moving])
+            current_lat = np.array([latest_frame[cell_idx]['lat'] for cell_idx in moving], dtype=np.float64)
+            current_lon = np.array([latest_frame[cell_idx]['lon'] for cell_idx in moving], dtype=np.float64)
+            distance_to_user = self._location_distances(current_lat, current_lon).min(axis=1)
             
-            if len(positions) >= 2:  # Need at least 2 positions for movement detection
+            for j, cell_idx in enumerate(moving):
+                if not movement['valid'][j]:
+                    continue
+                latest_cell = latest_frame[cell_idx]
+                positions = tracks[cell_idx]
+                # Store ALL moving cells with their data
+                all_moving_cells.append({
+                    'cell_id': cell_idx,
+                    'current_lat': latest_cell['lat'],
+                    'current_lon': latest_cell['lon'],
+                    'initial_lat': positions[0]['lat'],  # First frame position
+                    'initial_lon': positions[0]['lon'],  # First frame position
+                    'speed': float(movement['speed'][j]),
+                    'direction': float(movement['direction'][j]),
+                    'intensity': latest_cell['intensity'],
+                    'size': latest_cell['size'],
+                    'positions': positions,
+                    'distance_to_user': float(distance_to_user[j]),
+                    'motion_source': 'track'
+                })
+        
+        # Cells that could not be tracked back take their velocity from the motion field
+        untracked = [cell_idx for cell_idx, positions in enumerate(tracks) if len(positions) < 2]
+        flow = self._flow_velocities([latest_frame[i]['lat'] for i in untracked],
+                                     [latest_frame[i]['lon'] for i in untracked]) if untracked else None
+        if flow is not None:
+            speeds, directions, valid = flow
+            current_lat = np.array([latest_frame[cell_idx]['lat'] for cell_idx in untracked], dtype=np.float64)
+            current_lon = np.array([latest_frame[cell_idx]['lon'] for cell_idx in untracked], dtype=np.float64)
+            distance_to_user = self._location_distances(current_lat, current_lon).min(axis=1)
+            for j, cell_idx in enumerate(untracked):
+                if not valid[j]:
+                    continue
+                latest_cell = latest_frame[cell_idx]
+                all_moving_cells.append({
+                    'cell_id': cell_idx,
+                    'current_lat': latest_cell['lat'],
+                    'current_lon': latest_cell['lon'],
+                    'initial_lat': latest_cell['lat'],
+                    'initial_lon': latest_cell['lon'],
+                    'speed': float(speeds[j]),
+                    'direction': float(directions[j]),
+                    'intensity': latest_cell['intensity'],
+                    'size': latest_cell['size'],
+                    'positions': tracks[cell_idx],
+                    'distance_to_user': float(distance_to_user[j]),
+                    'motion_source': 'flow'
+                })
                 cells_with_movement += 1
-                # Calculate movement vector
-                movement = self._calculate_movement_vector(positions)
-                
-                if movement:
-                    # Store ALL moving cells with their data
-                    all_moving_cells.append({
-                        'cell_id': cell_idx,
-                        'current_lat': latest_cell['lat'],
-                        'current_lon': latest_cell['lon'],
-                        'initial_lat': positions[0]['lat'],  # First frame position
-                        'initial_lon': positions[0]['lon'],  # First frame position
-                        'speed': movement['speed'],
-                        'direction': movement['direction'],
-                        'intensity': latest_cell['intensity'],
-                        'size': latest_cell['size'],
-                        'positions': positions,
-                        'distance_to_user': self.haversine(
-                            latest_cell['lat'], latest_cell['lon'],
-                            self.latitude, self.longitude
-                        )
-                    })
         
         logging.info(f"Movement analysis: {cells_with_movement}/{len(latest_frame)} cells have movement")
         
@@ -796,129 +1436,141 @@ class RainPredictor:
         """Filter cells that are on intercept course with user location"""
         threat_cells = []
         direction_tolerance = 45  # Degrees tolerance from general direction
-        
-        for cell in moving_cells:
-            # Check if cell direction matches general pattern
-            direction_diff = abs((cell['direction'] - general_direction + 180) % 360 - 180)
-            
-            if direction_diff <= direction_tolerance:
-                # Check if this cell will intercept user location
-                if self._will_intercept_user(cell):
-                    # Calculate bearing from user to cell
-                    bearing_from_user = self.calculate_bearing(
-                        self.latitude, self.longitude,
-                        cell['current_lat'], cell['current_lon']
-                    )
-                    cell['bearing_from_user'] = bearing_from_user
-                    
-                    threat_cells.append(cell)
-                    logging.info(f"Threat cell {cell['cell_id']}: dir={cell['direction']:.1f}°, "
-                               f"dist={cell['distance_to_user']:.1f}km, "
-                               f"speed={cell['speed']:.1f}kph, "
-                               f"bearing={bearing_from_user:.1f}°")
-                else:
-                    logging.debug(f"Cell {cell['cell_id']}: matches direction but no intercept")
+        if not moving_cells:
+            return threat_cells
+        
+        directions = np.array([cell['direction'] for cell in moving_cells], dtype=np.float64)
+        lats = np.array([cell['current_lat'] for cell in moving_cells], dtype=np.float64)
+        lons = np.array([cell['current_lon'] for cell in moving_cells], dtype=np.float64)
+        location_lats, location_lons = self._location_coordinates()
+        
+        # Check if cell direction matches general pattern
+        direction_diff = geodesy.angle_difference(directions, general_direction)
+        # Cell will intercept a location if moving generally toward it (within 90 degrees); (cells, locations)
+        bearing_to_user = geodesy.initial_bearing(lats[:, None], lons[:, None], location_lats[None, :], location_lons[None, :])
+        intercepts = (geodesy.angle_difference(directions[:, None], bearing_to_user) <= 90).any(axis=1)
+        # Bearing is reported from the nearest location
+        nearest = self._location_distances(lats, lons).argmin(axis=1)
+        bearing_from_user = geodesy.initial_bearing(location_lats[nearest], location_lons[nearest], lats, lons)
+        
+        for i, cell in enumerate(moving_cells):
+            if direction_diff[i] > direction_tolerance:
+                logging.debug(f"Cell {cell['cell_id']}: direction {direction_diff[i]:.1f}° from general")
+            elif not intercepts[i]:
+                logging.debug(f"Cell {cell['cell_id']}: matches direction but no intercept")
             else:
-                logging.debug(f"Cell {cell['cell_id']}: direction {direction_diff:.1f}° from general")
+                cell['bearing_from_user'] = float(bearing_from_user[i])
+                threat_cells.append(cell)
+                logging.info(f"Threat cell {cell['cell_id']}: dir={cell['direction']:.1f}°, "
+                           f"dist={cell['distance_to_user']:.1f}km, "
+                           f"speed={cell['speed']:.1f}kph, "
+                           f"bearing={cell['bearing_from_user']:.1f}°")
         
         logging.info(f"Found {len(threat_cells)} threat cells on intercept course")
         return threat_cells
     
-    def _will_intercept_user(self, cell):
-        """Check if rain cell is on course to intercept user location"""
-        # Calculate bearing from cell to user
-        bearing_to_user = self.calculate_bearing(
-            cell['current_lat'], cell['current_lon'],
-            self.latitude, self.longitude
-        )
-        
-        # Calculate angle difference between cell movement and bearing to user
-        angle_diff = abs((cell['direction'] - bearing_to_user + 180) % 360 - 180)
-        
-        # Cell is threat if moving generally toward user (within 90 degrees)
-        return angle_diff <= 90
+    def _project_km(self, lats, lons):
+        """Project lat/lon arrays to equirectangular km around the user's location for spatial indexing"""
+        scale = geodesy.EARTH_RADIUS_KM * math.pi / 180.0
+        x = (np.asarray(lons, dtype=np.float64) - self.longitude) * scale * math.cos(math.radians(self.latitude))
+        y = (np.asarray(lats, dtype=np.float64) - self.latitude) * scale
+        return np.column_stack((x, y))
     
-    def _track_cell_backwards(self, target_cell, frame_cells, cell_idx):
-        """Track a single cell backwards through frames"""
-        positions = []
-        max_distance_km = 100  # Max distance to consider same cell between frames (more permissive)
-        
-        # Start with current position
-        positions.append({
-            'lat': target_cell['lat'],
-            'lon': target_cell['lon'],
-            'timestamp': frame_cells[-1]['timestamp']
-        })
-        
-        # Work backwards through frames
-        current_lat = target_cell['lat']
-        current_lon = target_cell['lon']
-        
-        logging.debug(f"Tracking cell {cell_idx} backwards from {current_lat:.4f}, {current_lon:.4f}")
+    def _track_cells_backwards(self, frame_cells):
+        """Track every cell of the latest frame backwards through the earlier frames
+        
+        Each earlier frame gets one KD-tree. Candidates are refined with the exact
+        haversine distance and assigned greedily, nearest first, so two tracks never
+        claim the same cell. Returns one position list per latest-frame cell.
+        """
+        max_distance_km = TRACK_MATCH_DISTANCE_KM
+        latest_timestamp = frame_cells[-1]['timestamp']
+        latest = frame_cells[-1]['cells']
+        tracks = [[{'lat': cell['lat'], 'lon': cell['lon'], 'timestamp': latest_timestamp}] for cell in latest]
+        if not latest:
+            return tracks
+        
+        current_lat = np.array([cell['lat'] for cell in latest], dtype=np.float64)
+        current_lon = np.array([cell['lon'] for cell in latest], dtype=np.float64)
+        active = np.arange(len(latest))
         
         for frame_idx in range(len(frame_cells) - 2, -1, -1):
+            if active.size == 0:
+                break
             frame = frame_cells[frame_idx]
-            best_match = None
-            best_distance = float('inf')
+            cells = frame['cells']
+            if not cells:
+                logging.debug(f"  Frame {frame_idx}: no cells, {active.size} track(s) lost")
+                break
+            
+            lats = np.array([cell['lat'] for cell in cells], dtype=np.float64)
+            lons = np.array([cell['lon'] for cell in cells], dtype=np.float64)
+            tree = cKDTree(self._project_km(lats, lons))
+            k = min(TRACK_MATCH_CANDIDATES, len(cells))
+            # The projection is approximate away from the user, so search a little wider than the limit
+            _, idx = tree.query(self._project_km(current_lat[active], current_lon[active]), k=k,
+                                distance_upper_bound=max_distance_km * 1.2)
+            idx = np.asarray(idx).reshape(active.size, k)
             
-            # Find closest cell in this frame
-            for cell in frame['cells']:
-                distance = self.haversine(current_lat, current_lon, cell['lat'], cell['lon'])
-                if distance < max_distance_km and distance < best_distance:
-                    best_distance = distance
-                    best_match = cell
+            rows, cols = np.nonzero(idx < len(cells))
+            track_ids = active[rows]
+            candidate_ids = idx[rows, cols]
+            distances = geodesy.haversine(current_lat[track_ids], current_lon[track_ids], lats[candidate_ids], lons[candidate_ids])
+            within = distances < max_distance_km
+            track_ids, candidate_ids, distances = track_ids[within], candidate_ids[within], distances[within]
             
-            if best_match:
-                positions.append({
-                    'lat': best_match['lat'],
-                    'lon': best_match['lon'],
+            matches = {}
+            claimed = set()
+            for order in np.argsort(distances, kind='stable'):
+                track_id, candidate_id = int(track_ids[order]), int(candidate_ids[order])
+                if track_id in matches or candidate_id in claimed:
+                    continue
+                matches[track_id] = candidate_id
+                claimed.add(candidate_id)
+            
+            for track_id, candidate_id in matches.items():
+                tracks[track_id].append({
+                    'lat': float(lats[candidate_id]),
+                    'lon': float(lons[candidate_id]),
                     'timestamp': frame['timestamp']
                 })
-                current_lat = best_match['lat']
-                current_lon = best_match['lon']
-                logging.debug(f"  Frame {frame_idx}: matched at {best_distance:.1f}km")
-            else:
-                logging.debug(f"  Frame {frame_idx}: no match (lost track) - checked {len(frame['cells'])} cells")
-                break  # Lost track
+                current_lat[track_id] = lats[candidate_id]
+                current_lon[track_id] = lons[candidate_id]
+            
+            logging.debug(f"  Frame {frame_idx}: matched {len(matches)}/{active.size} track(s) "
+                          f"against {len(cells)} cells")
+            # Tracks without a match have lost their cell
+            active = np.array(sorted(matches), dtype=np.int64)
         
-        logging.debug(f"Cell {cell_idx}: tracked {len(positions)} positions total")
-        return positions
+        return tracks
     
-    def _calculate_movement_vector(self, positions):
-        """Calculate speed and direction from cell positions"""
-        if len(positions) < 2:
-            return None
-        
-        # Sort positions by timestamp to ensure chronological order
-        positions_sorted = sorted(positions, key=lambda p: p['timestamp'])
-        first_pos = positions_sorted[0]
-        last_pos = positions_sorted[-1]
-        
-        # Calculate time difference in hours
-        time_diff = (last_pos['timestamp'] - first_pos['timestamp']) / 3600.0
-        if time_diff <= 0:
-            return None
-        
-        # Calculate distance
-        distance_km = self.haversine(
-            first_pos['lat'], first_pos['lon'],
-            last_pos['lat'], last_pos['lon']
-        )
-        
-        # Calculate speed
-        speed_kph = distance_km / time_diff
-        
-        # Calculate direction (where cell is moving TO)
-        direction = self.calculate_bearing(
-            first_pos['lat'], first_pos['lon'],
-            last_pos['lat'], last_pos['lon']
-        )
+    def _calculate_movement_vectors(self, tracks):
+        """Calculate speed and direction from first to last position of each track
+        
+        Returns arrays of speed (kph), direction (deg), distance (km), time_hours and a
+        `valid` mask that is False where the track spans no time.
+        """
+        first_lat, first_lon, first_t, last_lat, last_lon, last_t = (np.empty(len(tracks)) for _ in range(6))
+        for i, positions in enumerate(tracks):
+            # Tracks are built newest first, so order chronologically
+            first = min(positions, key=lambda p: p['timestamp'])
+            last = max(positions, key=lambda p: p['timestamp'])
+            first_lat[i], first_lon[i], first_t[i] = first['lat'], first['lon'], first['timestamp']
+            last_lat[i], last_lon[i], last_t[i] = last['lat'], last['lon'], last['timestamp']
+        
+        time_hours = (last_t - first_t) / 3600.0
+        valid = time_hours > 0
+        distance_km = geodesy.haversine(first_lat, first_lon, last_lat, last_lon)
+        speed_kph = np.divide(distance_km, time_hours, out=np.zeros_like(distance_km), where=valid)
+        # Direction is where the cell is moving TO
+        direction = geodesy.initial_bearing(first_lat, first_lon, last_lat, last_lon)
         
         return {
             'speed': speed_kph,
             'direction': direction,
             'distance': distance_km,
-            'time_hours': time_diff
+            'time_hours': time_hours,
+            'valid': valid
         }
     
     def _is_moving_toward_user(self, movement, cell):
@@ -1286,116 +1938,104 @@ class RainPredictor:
             logging.error(f"Error validating API response: {e}")
             return False
 
-    def _update_entities(self, values):
-        """Update Home Assistant entities with prediction values"""
-        logging.info(f"Entities time value in _update_entities: {self.entities['time']}")
-        if not self.entities['time']:
+    def _entity_updates(self, values, entities=None):
+        """Map prediction values onto {entity_id: (kind, value)} for one location's entities"""
+        entities = entities or self.entities
+        if not entities.get('time'):
             logging.warning("No time entity configured, skipping entity updates")
-            return
+            return {}
+        
+        updates = {}
+        for kind in PredictionLocation.ENTITY_KEYS:
+            entity_id = entities.get(kind)
+            # Rain cell coordinates are only sent when there is a cell
+            if entity_id and values.get(kind) is not None:
+                updates[entity_id] = (kind, values[kind])
+        return updates
 
+    def _update_entities(self, values, entities=None):
+        """Update Home Assistant entities with prediction values (the main location's entities by default)"""
         try:
-            # Update time to rain
-            if self.entities['time']:
-                self.ha_api.call_service("input_number/set_value",
-                                       self.entities['time'], values['time'])
-
-            # Update distance
-            if self.entities.get('distance'):
-                self.ha_api.call_service("input_number/set_value",
-                                       self.entities['distance'], values['distance'])
-
-            # Update speed
-            if self.entities.get('speed'):
-                self.ha_api.call_service("input_number/set_value",
-                                       self.entities['speed'], values['speed'])
-
-            # Update direction
-            if self.entities.get('direction'):
-                self.ha_api.call_service("input_number/set_value",
-                                       self.entities['direction'], values['direction'])
-
-            # Update bearing
-            if self.entities.get('bearing'):
-                self.ha_api.call_service("input_number/set_value",
-                                       self.entities['bearing'], values['bearing'])
-
-            # Update rain cell latitude
-            if self.entities.get('rain_cell_latitude') and values.get('rain_cell_latitude') is not None:
-                self.ha_api.call_service("input_number/set_value",
-                                       self.entities['rain_cell_latitude'], values['rain_cell_latitude'])
-
-            # Update rain cell longitude
-            if self.entities.get('rain_cell_longitude') and values.get('rain_cell_longitude') is not None:
-                self.ha_api.call_service("input_number/set_value",
-                                       self.entities['rain_cell_longitude'], values['rain_cell_longitude'])
-
-            logging.info("Successfully updated Home Assistant entities")
-
+            self.publisher.publish(self._entity_updates(values, entities))
         except Exception as e:
             logging.error(f"Error updating entities: {e}")
 
-    def _find_threatening_cell(self):
-        """Find the closest rain cell that is moving toward user location"""
-        logging.info(f"\n🌧️ FINDING CLOSEST APPROACHING CELL - {len(self.tracked_cells)} tracked cells")
+    def _find_threatening_cells(self):
+        """Find, for every location, the closest rain cell moving toward it
         
-        approaching_cells = []
+        Candidate velocities are gathered once; distances and approach angles are
+        then computed as (cells, locations) matrices. Returns one threat dict (or
+        None) per location, in self.locations order.
+        """
+        logging.info(f"\n🌧️ FINDING CLOSEST APPROACHING CELL - {len(self.tracked_cells)} tracked cells, "
+                     f"{len(self.locations)} location(s)")
+        
+        candidates = []
+        flow_cells = []
         
         for cell_id, cell in self.tracked_cells.items():
-            if len(cell.positions) < 2:
-                continue
-            
             current_lat, current_lon, _ = cell.positions[-1]
             speed_kph, direction_deg = cell.get_velocity(self)
             
-            if speed_kph is None or direction_deg is None or speed_kph < 1:
+            if speed_kph is None or direction_deg is None:
+                # No usable track yet, so fall back to the motion field at the cell
+                flow_cells.append((cell_id, cell, current_lat, current_lon))
                 continue
-            
-            distance_km = self.haversine(current_lat, current_lon, self.latitude, self.longitude)
-            bearing_to_user = self.calculate_bearing(current_lat, current_lon, self.latitude, self.longitude)
-            bearing_from_user = self.calculate_bearing(self.latitude, self.longitude, current_lat, current_lon)
-            
-            if bearing_to_user is None:
+            if speed_kph < 1:
                 continue
-            
-            angle_diff = abs((direction_deg - bearing_to_user + 180) % 360 - 180)
-            is_approaching = angle_diff <= 90
-            
-            logging.info(f"  Cell #{cell_id}: {distance_km:.1f}km, {speed_kph:.1f}kph, dir={direction_deg:.0f}°, angle_diff={angle_diff:.0f}°, approaching={is_approaching}")
-            
-            if is_approaching:
-                approaching_cells.append({
-                    'cell_id': cell_id,
-                    'cell': cell,
-                    'lat': current_lat,
-                    'lon': current_lon,
-                    'speed': speed_kph,
-                    'direction': direction_deg,
-                    'distance_to_user': distance_km,
-                    'bearing_from_user': bearing_from_user,
-                    'angle_diff': angle_diff
-                })
-        
-        if not approaching_cells:
-            logging.info("  No approaching cells found")
-            return None
-        
-        approaching_cells.sort(key=lambda x: x['distance_to_user'])
-        best_cell = approaching_cells[0]
+            candidates.append((cell_id, cell, current_lat, current_lon, speed_kph, direction_deg))
         
-        logging.info(f"  Selected: Cell #{best_cell['cell_id']} at {best_cell['lat']:.4f}, {best_cell['lon']:.4f}")
-        logging.info(f"  Distance: {best_cell['distance_to_user']:.1f}km, ETA: {best_cell['distance_to_user'] / best_cell['speed'] * 60:.0f} min")
+        flow = self._flow_velocities([c[2] for c in flow_cells], [c[3] for c in flow_cells]) if flow_cells else None
+        if flow is not None:
+            speeds, directions, valid = flow
+            for i, (cell_id, cell, current_lat, current_lon) in enumerate(flow_cells):
+                if valid[i] and speeds[i] >= 1:
+                    candidates.append((cell_id, cell, current_lat, current_lon, float(speeds[i]), float(directions[i])))
         
-        time_to_arrival_minutes = best_cell['distance_to_user'] / best_cell['speed'] * 60
+        if not candidates:
+            logging.info("  No approaching cells found")
+            return [None] * len(self.locations)
+        
+        lats = np.array([c[2] for c in candidates], dtype=np.float64)
+        lons = np.array([c[3] for c in candidates], dtype=np.float64)
+        speeds = np.array([c[4] for c in candidates], dtype=np.float64)
+        directions = np.array([c[5] for c in candidates], dtype=np.float64)
+        location_lats, location_lons = self._location_coordinates()
+        
+        # (cells, locations) matrices
+        distances = self._location_distances(lats, lons)
+        bearing_to_user = geodesy.initial_bearing(lats[:, None], lons[:, None], location_lats[None, :], location_lons[None, :])
+        bearing_from_user = geodesy.initial_bearing(location_lats[None, :], location_lons[None, :], lats[:, None], lons[:, None])
+        approaching = geodesy.angle_difference(directions[:, None], bearing_to_user) <= 90
+        best = np.where(approaching, distances, np.inf).argmin(axis=0)
+        
+        threats = []
+        for j, location in enumerate(self.locations):
+            i = int(best[j])
+            if not approaching[i, j]:
+                logging.info(f"  {location.name}: no approaching cells ({len(candidates)} candidate(s))")
+                threats.append(None)
+                continue
+            
+            cell_id, _, current_lat, current_lon, speed_kph, direction_deg = candidates[i]
+            distance_km = float(distances[i, j])
+            time_to_arrival_minutes = distance_km / speed_kph * 60
+            logging.info(f"  {location.name}: Cell #{cell_id} at {current_lat:.4f}, {current_lon:.4f}, "
+                         f"{distance_km:.1f}km, {speed_kph:.1f}kph, dir={direction_deg:.0f}°, "
+                         f"ETA: {time_to_arrival_minutes:.0f} min "
+                         f"({int(approaching[:, j].sum())}/{len(candidates)} approaching)")
+            
+            threats.append({
+                'time_to_rain': round(time_to_arrival_minutes),
+                'distance_km': round(distance_km, 1),
+                'speed_kph': round(speed_kph, 1),
+                'direction_deg': round(direction_deg, 1),
+                'bearing_to_cell_deg': round(float(bearing_from_user[i, j]), 1),
+                'rain_cell_latitude': round(current_lat, 4),
+                'rain_cell_longitude': round(current_lon, 4)
+            })
         
-        return {
-            'time_to_rain': round(time_to_arrival_minutes),
-            'distance_km': round(best_cell['distance_to_user'], 1),
-            'speed_kph': round(best_cell['speed'], 1),
-            'direction_deg': round(best_cell['direction'], 1),
-            'bearing_to_cell_deg': round(best_cell['bearing_from_user'], 1),
-            'rain_cell_latitude': round(best_cell['lat'], 4),
-            'rain_cell_longitude': round(best_cell['lon'], 4)
-        }
+        return threats
     
     def _calculate_threat_probability(self, distance_km, speed_kph, angle_diff, intensity, track_length):
         """Calculate probability (0-100%) of rain reaching location"""
@@ -1436,8 +2076,13 @@ class RainPredictor:
         return min(100, probability)
     
 
-    def _save_analysis_to_cache(self, values, prediction):
-        """Save analysis results to cache file for Web UI"""
+    def _analysis_cache_data(self, values, prediction, location_values=None):
+        """Snapshot of the analysis results for the Web UI cache file
+        
+        `values`/`prediction` are for the main location; `location_values` holds the
+        entity values of every location in self.locations order. Built on the
+        prediction thread, because the next cycle replaces the state it reads.
+        """
         try:
             ui_cells = []
             if hasattr(self, 'last_detected_cells'):
@@ -1451,16 +2096,35 @@ class RainPredictor:
                 "bearing": str(values.get('bearing', 'N/A')),
                 "rain_cell_latitude": prediction.get('rain_cell_latitude') if prediction else None,
                 "rain_cell_longitude": prediction.get('rain_cell_longitude') if prediction else None,
-                "cells": ui_cells
+                "cells": ui_cells,
+                "nowcast": self._nowcast_ui_grid(),
+                "locations": [{
+                    "name": location.name,
+                    "latitude": location.latitude,
+                    "longitude": location.longitude,
+                    "time_to_rain": str(loc_values.get('time', '--')),
+                    "distance": str(loc_values.get('distance', '--'))
+                } for location, loc_values in zip(self.locations, location_values or [values])]
             }
 
-            cache_data = {
+            return {
                 "timestamp": time.time(),
                 "values": values,
                 "prediction": prediction,
                 "ui_data": ui_data
             }
+        except Exception as e:
+            logging.debug(f"Cache data skipped: {e}")
+            return None
+
+    def _share_analysis(self, cache_data):
+        """Push a result to connected Web UIs, then persist it (called on the publisher thread)"""
+        self.state_server.publish('analysis', cache_data)
+        self._write_analysis_cache(cache_data)
 
+    def _write_analysis_cache(self, cache_data):
+        """Atomically replace the cache file, which serves the Web UI across restarts"""
+        try:
             temp_path = self.latest_analysis_path + ".tmp"
             with open(temp_path, 'w') as f:
                 json.dump(cache_data, f)
@@ -1469,12 +2133,8 @@ class RainPredictor:
         except Exception as e:
             logging.debug(f"Cache write skipped: {e}")
 
-    def run_prediction(self):
-        """Run a single prediction cycle"""
-        logging.info("\n\n" + "=" * 60)
-        logging.info(f"PREDICTION CYCLE STARTING - {datetime.now()}")
-        logging.info("=" * 60)
-
+    def _prediction_values(self, prediction):
+        """Entity values for one location's prediction, using the configured defaults for missing parts"""
         values = {
             'time': self.defaults['no_rain'],
             'distance': self.defaults['no_rain'],
@@ -1484,76 +2144,197 @@ class RainPredictor:
             'rain_cell_latitude': None,
             'rain_cell_longitude': None
         }
-
-        prediction = None
-        
+        if not prediction:
+            return values
+        
+        if prediction.get('time_to_rain') is not None:
+            values['time'] = max(0, round(prediction['time_to_rain']))
+        if prediction.get('distance_km') is not None:
+            values['distance'] = max(0, round(prediction['distance_km'], 1))
+        if prediction.get('speed_kph') is not None:
+            values['speed'] = max(0, round(prediction['speed_kph'], 1))
+        if prediction.get('direction_deg') is not None:
+            values['direction'] = round(prediction['direction_deg'], 1)
+        if prediction.get('bearing_to_cell_deg') is not None:
+            values['bearing'] = round(prediction['bearing_to_cell_deg'], 1)
+        if prediction.get('rain_cell_latitude') is not None:
+            values['rain_cell_latitude'] = prediction['rain_cell_latitude']
+        if prediction.get('rain_cell_longitude') is not None:
+            values['rain_cell_longitude'] = prediction['rain_cell_longitude']
+        return values
+
+    def _fetch_api_data(self):
+        """Fetch and validate the RainViewer weather-maps.json metadata, or None on failure"""
         try:
             logging.info(f"Fetching API data from: {self.api_url}")
-            logging.info("Making request...")
             response = requests.get(self.api_url, timeout=10)
             logging.info(f"Request finished. Status code: {response.status_code}")
             response.raise_for_status()
             api_data = response.json()
-            logging.info("Successfully fetched and parsed API data.")
-            
             logging.info(f"API response received. Host: {api_data.get('host', 'unknown')}")
+        except Exception as e:
+            logging.error(f"❌ Error fetching API data: {e}")
+            return None
+        
+        if not self._validate_api_response(api_data):
+            logging.error("❌ Invalid API response")
+            return None
+        
+        past_frames = api_data['radar'].get('past', [])
+        if past_frames:
+            self.latest_frame_time = past_frames[-1]['time']
+            if len(past_frames) > 1:
+                self.frame_step = max(60, past_frames[-1]['time'] - past_frames[-2]['time'])
+        return api_data
+
+    def run_prediction(self, api_data=None):
+        """Run a single prediction cycle, fetching the metadata unless it is given"""
+        logging.info("\n\n" + "=" * 60)
+        logging.info(f"PREDICTION CYCLE STARTING - {datetime.now()}")
+        logging.info("=" * 60)
+
+        predictions = [None] * len(self.locations)
+        
+        try:
+            if api_data is None:
+                api_data = self._fetch_api_data()
             
-            if not self._validate_api_response(api_data):
-                logging.error("❌ Invalid API response")
-            else:
+            if api_data is not None:
                 past_frames = api_data['radar'].get('past', [])
                 logging.info(f"Found {len(past_frames)} past frames")
                 
                 if past_frames:
-                    prediction = self.analyze_radar_data(past_frames, api_data)
-                    
-                    if prediction.get('time_to_rain') is not None:
-                        values['time'] = max(0, round(prediction['time_to_rain']))
-                    if prediction.get('distance_km') is not None:
-                        values['distance'] = max(0, round(prediction['distance_km'], 1))
-                    if prediction.get('speed_kph') is not None:
-                        values['speed'] = max(0, round(prediction['speed_kph'], 1))
-                    if prediction.get('direction_deg') is not None:
-                        values['direction'] = round(prediction['direction_deg'], 1)
-                    if prediction.get('bearing_to_cell_deg') is not None:
-                        values['bearing'] = round(prediction['bearing_to_cell_deg'], 1)
-                    if prediction.get('rain_cell_latitude') is not None:
-                        values['rain_cell_latitude'] = prediction['rain_cell_latitude']
-                    if prediction.get('rain_cell_longitude') is not None:
-                        values['rain_cell_longitude'] = prediction['rain_cell_longitude']
+                    self.analyzed_frame_time = past_frames[-1]['time']
+                    predictions = self.analyze_radar_data(past_frames, api_data)
                 else:
                     logging.warning("❌ No past radar frames available")
         
         except Exception as e:
             logging.error(f"❌ Error in prediction cycle: {e}", exc_info=True)
         
-        self._save_analysis_to_cache(values, prediction)
-        self._update_entities(values)
+        self.last_predictions = predictions
+        self.predicted_at = time.time()
+        all_values = self._publish_predictions(predictions)
         
         logging.info("\n" + "=" * 60)
         logging.info(f"FINAL VALUES TO BE SENT:")
-        logging.info(f"  Time to rain: {values['time']} minutes")
-        logging.info(f"  Distance: {values['distance']} km")
-        logging.info(f"  Speed: {values['speed']} km/h")
-        logging.info(f"  Direction: {values['direction']}°")
-        logging.info(f"  Bearing: {values['bearing']}°")
+        for location, values in zip(self.locations, all_values):
+            if len(self.locations) > 1:
+                logging.info(f" {location.name}:")
+            logging.info(f"  Time to rain: {values['time']} minutes")
+            logging.info(f"  Distance: {values['distance']} km")
+            logging.info(f"  Speed: {values['speed']} km/h")
+            logging.info(f"  Direction: {values['direction']}°")
+            logging.info(f"  Bearing: {values['bearing']}°")
         logging.info("=" * 60 + "\n")
 
+    def _publish_predictions(self, predictions):
+        """Submit every location's values to the publisher thread and update the threat level"""
+        all_values = [self._prediction_values(prediction) for prediction in predictions]
+        # Every location's entities go out in one publish so they share the concurrency
+        updates = {}
+        for location, values in zip(self.locations, all_values):
+            updates.update(self._entity_updates(values, location.entities))
+        # Cache and entity writes happen on the publisher thread
+        self.result_publisher.submit(self._analysis_cache_data(all_values[0], predictions[0], all_values), updates)
+        self.threat_level = self._threat_level(predictions)
+        return all_values
+
+    def _refresh_countdown(self):
+        """Re-publish the last predictions with the time since the analysis taken off
+        
+        Between radar frames the cells are assumed to keep their speed, so the time
+        to rain and the distance count down until the next frame is analysed.
+        """
+        if self.predicted_at is None:
+            return
+        elapsed_minutes = (time.time() - self.predicted_at) / 60.0
+        predictions = []
+        for prediction in self.last_predictions:
+            if prediction and prediction.get('time_to_rain') is not None:
+                prediction = dict(prediction, time_to_rain=max(0.0, prediction['time_to_rain'] - elapsed_minutes))
+                if prediction.get('distance_km') is not None and prediction.get('speed_kph'):
+                    prediction['distance_km'] = max(0.0, prediction['distance_km']
+                                                    - prediction['speed_kph'] * elapsed_minutes / 60.0)
+            predictions.append(prediction)
+        logging.info(f"Counting down the last prediction ({elapsed_minutes:.1f} min since the analysis)")
+        self._publish_predictions(predictions)
+
+    def _next_cycle_time(self, after):
+        """First slot of the fixed cadence strictly after `after` (epoch seconds)
+        
+        The cadence is anchored on the latest radar frame time plus the delay
+        before RainViewer publishes it, so cycles start just as frames appear.
+        """
+        anchor = (self.latest_frame_time or after) + FRAME_PUBLISH_DELAY_SECONDS
+        return anchor + (math.floor((after - anchor) / self.run_interval) + 1) * self.run_interval
+
+    def _threat_level(self, predictions):
+        """'imminent' if rain reaches a location soon, 'watch' if cells are within tracking range, else 'clear'"""
+        arrivals = [p['time_to_rain'] for p in predictions if p and p.get('time_to_rain') is not None]
+        if arrivals and min(arrivals) <= IMMINENT_THREAT_MINUTES:
+            return 'imminent'
+        if arrivals:
+            return 'watch'
+        cells = self.last_detected_cells
+        if cells:
+            distances = self._location_distances(np.array([c['lat'] for c in cells], dtype=np.float64),
+                                                 np.array([c['lon'] for c in cells], dtype=np.float64))
+            if (distances <= self.max_track_dist).any():
+                return 'watch'
+        return 'clear'
+
+    def _next_poll_time(self, now):
+        """When to next check weather-maps.json for a new frame
+        
+        While rain is imminent, every `min_interval_minutes`: polls between frames
+        count the published time to rain down. Otherwise never before the next frame
+        is due (latest frame + frame step + publication delay), and not sooner than
+        the threat level's interval, which is the retry period while a frame is late.
+        """
+        interval = self.poll_intervals[self.threat_level]
+        if self.latest_frame_time is None or self.threat_level == 'imminent':
+            return now + interval
+        expected = self.latest_frame_time + self.frame_step + FRAME_PUBLISH_DELAY_SECONDS
+        return max(expected, now + interval)
+
+    def _stop(self, signum=None, frame=None):
+        logging.info("Received stop signal, shutting down...")
+        self.running = False
+        self.stop_event.set()
+
     def run(self):
         """Main execution loop"""
         logging.info("Starting Rain Predictor main loop")
         self.running = True
-
-        # Initial prediction
-        self.run_prediction()
+        signal.signal(signal.SIGTERM, self._stop)
+        self.state_server.start()
 
         try:
             while self.running:
-                # Wait for next interval
-                time.sleep(self.run_interval)
-
-                # Run prediction cycle
-                self.run_prediction()
+                if self.adaptive:
+                    # The metadata is tiny; the analysis only runs when it lists a new frame
+                    api_data = self._fetch_api_data()
+                    if api_data is None:
+                        logging.warning("Radar metadata unavailable, keeping the last prediction")
+                    elif self.latest_frame_time == self.analyzed_frame_time:
+                        logging.info(f"No new radar frame since {datetime.fromtimestamp(self.latest_frame_time)}, "
+                                     f"skipping analysis")
+                        if self.threat_level == 'imminent':
+                            self._refresh_countdown()
+                    else:
+                        self.run_prediction(api_data)
+                    next_run = self._next_poll_time(time.time())
+                else:
+                    self.run_prediction()
+                    # Cycles keep to the cadence however long the last one took; missed slots are skipped
+                    next_run = self._next_cycle_time(time.time())
+                
+                delay = max(0.0, next_run - time.time())
+                logging.info(f"Next check at {datetime.fromtimestamp(next_run).strftime('%H:%M:%S')} "
+                             f"(in {delay:.0f}s, threat level: {self.threat_level})")
+                if self.stop_event.wait(delay):
+                    break
 
         except KeyboardInterrupt:
             logging.info("Received interrupt signal, shutting down...")
@@ -1561,9 +2342,10 @@ class RainPredictor:
             logging.error(f"Unexpected error in main loop: {e}", exc_info=True)
         finally:
             self.running = False
+            self.result_publisher.stop()
+            self.state_server.close()
             logging.info("Rain Predictor stopped")
 
-
 def main():
     """Main entry point"""
     logging.basicConfig(
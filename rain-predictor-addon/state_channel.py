@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+# /rain-predictor-addon/state_channel.py
+"""
+Local pub/sub between the predictor and the web UI over a Unix domain socket.
+
+The predictor hosts a StateServer and broadcasts every analysis result to the
+connected StateClients as one line of JSON; a client that connects later gets
+the latest result at once. Clients send view bounds back over the same
+connection. Messages are {"type": ..., "data": ...}. Both processes keep their
+JSON files only as a fallback for when the other side is not connected.
+"""
+
+import json
+import logging
+import os
+import socket
+import struct
+import threading
+import time
+
+SOCKET_PATH = os.environ.get("RAIN_PREDICTOR_SOCKET", "/tmp/rain_predictor.sock")
+RECONNECT_SECONDS = 3
+# A client that cannot take a message within this time is dropped, so it never stalls the predictor
+SEND_TIMEOUT_SECONDS = 2
+
+
+def _encode(kind, data):
+    return (json.dumps({"type": kind, "data": data}) + "\n").encode("utf-8")
+
+
+def _close(conn):
+    """Shut a connection down, which also wakes a thread blocked reading from it"""
+    try:
+        conn.shutdown(socket.SHUT_RDWR)
+    except OSError:
+        pass
+    conn.close()
+
+
+def _messages(conn):
+    """Yield (type, data) for each JSON line received until the peer disconnects"""
+    with conn.makefile("r", encoding="utf-8") as stream:
+        for line in stream:
+            try:
+                message = json.loads(line)
+                yield message.get("type"), message.get("data")
+            except ValueError as e:
+                logging.warning(f"Ignoring malformed state message: {e}")
+
+
+class StateServer:
+    """Predictor side: keeps the latest message of each type and pushes updates to every client"""
+
+    def __init__(self, path=SOCKET_PATH, on_message=None):
+        self.path = path
+        self.on_message = on_message
+        self.latest = {}
+        self.clients = {}
+        self.lock = threading.Lock()
+        self.sock = None
+
+    def start(self):
+        try:
+            if os.path.exists(self.path):
+                os.unlink(self.path)
+            self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.sock.bind(self.path)
+            self.sock.listen()
+        except OSError as e:
+            logging.warning(f"State channel unavailable at {self.path}: {e}")
+            self.sock = None
+            return False
+        threading.Thread(target=self._accept, name="state-server", daemon=True).start()
+        logging.info(f"State channel listening on {self.path}")
+        return True
+
+    def close(self):
+        if self.sock is not None:
+            _close(self.sock)
+            self.sock = None
+        with self.lock:
+            for conn in list(self.clients):
+                _close(conn)
+            self.clients.clear()
+
+    def publish(self, kind, data):
+        """Remember `data` as the latest `kind` and send it to every connected client"""
+        payload = _encode(kind, data)
+        with self.lock:
+            self.latest[kind] = payload
+            clients = list(self.clients.items())
+        for conn, send_lock in clients:
+            self._send(conn, send_lock, payload)
+
+    def _send(self, conn, send_lock, payload):
+        try:
+            with send_lock:
+                conn.sendall(payload)
+        except OSError:
+            self._drop(conn)
+
+    def _drop(self, conn):
+        with self.lock:
+            self.clients.pop(conn, None)
+        _close(conn)
+
+    def _accept(self):
+        while self.sock is not None:
+            try:
+                conn, _ = self.sock.accept()
+            except OSError:
+                return
+            # A send-only timeout: reads stay blocking, as clients may be quiet for hours
+            conn.setsockopt(socket.SOL_SOCKET, socket.SO_SNDTIMEO, struct.pack("ll", SEND_TIMEOUT_SECONDS, 0))
+            send_lock = threading.Lock()
+            # Holding the client's send lock keeps a concurrent publish from overtaking the backlog
+            with send_lock:
+                with self.lock:
+                    self.clients[conn] = send_lock
+                    backlog = list(self.latest.values())
+                try:
+                    for payload in backlog:
+                        conn.sendall(payload)
+                except OSError:
+                    self._drop(conn)
+                    continue
+            logging.info(f"State channel client connected ({len(self.clients)} total)")
+            threading.Thread(target=self._read, args=(conn,), name="state-client", daemon=True).start()
+
+    def _read(self, conn):
+        try:
+            for kind, data in _messages(conn):
+                if self.on_message is not None:
+                    self.on_message(kind, data)
+        except OSError:
+            pass
+        finally:
+            self._drop(conn)
+
+
+class StateClient:
+    """Web UI side: holds the latest message of each type in memory, reconnecting as needed"""
+
+    def __init__(self, path=SOCKET_PATH):
+        self.path = path
+        self.latest = {}
+        self.listeners = []
+        self.conn = None
+        self.send_lock = threading.Lock()
+        self.thread = threading.Thread(target=self._run, name="state-client", daemon=True)
+
+    @property
+    def connected(self):
+        return self.conn is not None
+
+    def start(self):
+        if not self.thread.is_alive():
+            self.thread.start()
+
+    def subscribe(self, callback):
+        """Call callback(type, data) for every message received"""
+        self.listeners.append(callback)
+
+    def unsubscribe(self, callback):
+        if callback in self.listeners:
+            self.listeners.remove(callback)
+
+    def get(self, kind, default=None):
+        return self.latest.get(kind, default)
+
+    def send(self, kind, data):
+        """Send a message to the server; False if not connected"""
+        conn = self.conn
+        if conn is None:
+            return False
+        try:
+            with self.send_lock:
+                conn.sendall(_encode(kind, data))
+            return True
+        except OSError as e:
+            logging.warning(f"State channel send failed: {e}")
+            return False
+
+    def _run(self):
+        while True:
+            try:
+                conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+                conn.connect(self.path)
+            except OSError:
+                conn.close()
+                time.sleep(RECONNECT_SECONDS)
+                continue
+
+            self.conn = conn
+            logging.info(f"Connected to state channel {self.path}")
+            try:
+                for kind, data in _messages(conn):
+                    self.latest[kind] = data
+                    for callback in list(self.listeners):
+                        try:
+                            callback(kind, data)
+                        except Exception as e:
+                            logging.error(f"State listener failed: {e}")
+            except OSError:
+                pass
+            finally:
+                self.conn = None
+                conn.close()
+            logging.warning("State channel disconnected, reconnecting")
+            time.sleep(RECONNECT_SECONDS)
@@ -50,7 +50,7 @@ def test_directional_filtering():
     
     predictor.tracked_cells = {1: cell_away}
     
-    result_away = predictor._find_threatening_cell()
+    result_away = predictor._find_threatening_cells()[0]
     print(f"Result: {result_away}")
     print(f"PASS: {result_away is not None}")  # With fallback logic, should still return a cell
     print(f"Note: Fallback logic ensures visual tracking matches user screen\n")
@@ -70,7 +70,7 @@ def test_directional_filtering():
     
     predictor.tracked_cells = {2: cell_toward}
     
-    result_toward = predictor._find_threatening_cell()
+    result_toward = predictor._find_threatening_cells()[0]
     print(f"Result: {result_toward}")
     print(f"PASS: {result_toward is not None}\n")
     
@@ -79,7 +79,7 @@ def test_directional_filtering():
     
     predictor.tracked_cells = {1: cell_away, 2: cell_toward}
     
-    result_mixed = predictor._find_threatening_cell()
+    result_mixed = predictor._find_threatening_cells()[0]
     print(f"Result: {result_mixed}")
     print(f"PASS: {result_mixed is not None and result_mixed['distance_km'] < 50.0}\n")
     
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Check script for the Web Mercator tile mosaic: pixel <-> lat/lon round trips
+"""
+
+import sys
+import os
+sys.path.insert(0, os.path.dirname(__file__))
+
+import numpy as np
+
+from mercator import TileMosaic, lonlat_to_tilexy
+
+# Home, an extra location and the corners of a typical analysis box
+test_points = [
+    (-27.4, 152.9),
+    (-31.0, 156.5),
+    (-25.0, 150.0),
+    (-32.0, 157.5),
+]
+
+
+def test_mosaic_round_trip():
+    """Points survive lat/lon -> pixel -> lat/lon, at several zooms and for a cropped window"""
+    print("=== TESTING TILE MOSAIC ROUND TRIP ===\n")
+    lats = np.array([p[0] for p in test_points])
+    lons = np.array([p[1] for p in test_points])
+    results = []
+
+    for max_zoom in (3, 6, 8):
+        mosaic = TileMosaic.covering(lons.min(), lats.min(), lons.max(), lats.max(), max_zoom, 16)
+        rows, cols = mosaic.latlon_to_pixel(lats, lons)
+        back_lats, back_lons = mosaic.pixel_to_latlon(rows, cols)
+        error = max(np.abs(back_lats - lats).max(), np.abs(back_lons - lons).max())
+        inside = bool(((rows >= 0) & (rows < mosaic.shape[0]) & (cols >= 0) & (cols < mosaic.shape[1])).all())
+        passed = error < 1e-9 and inside and len(mosaic.tiles) <= 16
+        print(f"Zoom {mosaic.zoom} (max {max_zoom}), {len(mosaic.tiles)} tile(s): "
+              f"max error {error:.2e}°, all points inside: {inside} -> {'PASS' if passed else 'FAIL'}")
+        results.append(passed)
+
+    # A pixel centre maps into the tile it belongs to
+    mosaic = TileMosaic.covering(lons.min(), lats.min(), lons.max(), lats.max(), 8, 16)
+    lat, lon = mosaic.pixel_to_latlon(np.array([10.0]), np.array([mosaic.tile_size + 10.0]))
+    x, y = lonlat_to_tilexy(float(lon[0]), float(lat[0]), mosaic.zoom)
+    passed = (int(x), int(y)) == (mosaic.x_min + 1, mosaic.y_min)
+    print(f"Pixel (10, {mosaic.tile_size + 10}) falls in tile ({int(x)}, {int(y)}) -> {'PASS' if passed else 'FAIL'}")
+    results.append(passed)
+
+    # A window shares the mosaic's georeferencing, offset by its origin
+    window = mosaic.window(152.0, -28.0, 154.0, -26.5)
+    rows, cols = window.latlon_to_pixel(lats[:1], lons[:1])
+    back_lats, back_lons = window.pixel_to_latlon(rows, cols)
+    error = max(abs(back_lats[0] - lats[0]), abs(back_lons[0] - lons[0]))
+    passed = error < 1e-9 and 0 <= rows[0] < window.shape[0] and 0 <= cols[0] < window.shape[1]
+    print(f"Window {window.shape[1]}x{window.shape[0]} px: home at ({rows[0]:.1f}, {cols[0]:.1f}), "
+          f"max error {error:.2e}° -> {'PASS' if passed else 'FAIL'}")
+    results.append(passed)
+
+    all_passed = all(results)
+    print(f"\nOVERALL: {'ALL TESTS PASSED' if all_passed else 'SOME TESTS FAILED'}")
+    return all_passed
+
+
+if __name__ == "__main__":
+    sys.exit(0 if test_mosaic_round_trip() else 1)
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Check script for the motion field engine: phase correlation recovers known shifts
+"""
+
+import sys
+import os
+sys.path.insert(0, os.path.dirname(__file__))
+
+import numpy as np
+from scipy import ndimage
+
+from motion_field import compute_motion_field, phase_correlation
+
+
+def rain_field(shape, seed=0):
+    """Smooth random rain mask, so every block has structure to correlate"""
+    rng = np.random.default_rng(seed)
+    field = ndimage.gaussian_filter(rng.random(shape), 4)
+    return (field > np.percentile(field, 70)).astype(np.float32)
+
+
+def test_phase_correlation():
+    """Shift a frame by known amounts and check the recovered displacement"""
+    print("=== TESTING PHASE CORRELATION ===\n")
+    results = []
+    frame = rain_field((128, 128))
+
+    # Integer shifts, including negative ones; +dy is down, +dx is right
+    for dy, dx in [(0, 0), (3, 5), (-4, 2), (7, -6)]:
+        shifted = np.roll(frame, (dy, dx), axis=(0, 1))
+        got_dy, got_dx, peak = phase_correlation(frame, shifted)
+        passed = abs(got_dy - dy) < 0.5 and abs(got_dx - dx) < 0.5
+        print(f"Shift ({dy}, {dx}): got ({got_dy:.2f}, {got_dx:.2f}), peak {peak:.2f} -> {'PASS' if passed else 'FAIL'}")
+        results.append(passed)
+
+    # Sub-pixel shift from bilinear resampling
+    shifted = ndimage.shift(frame, (2.5, -1.5), order=1, mode='wrap')
+    got_dy, got_dx, _ = phase_correlation(frame, shifted)
+    passed = abs(got_dy - 2.5) < 0.35 and abs(got_dx + 1.5) < 0.35
+    print(f"Shift (2.5, -1.5): got ({got_dy:.2f}, {got_dx:.2f}) -> {'PASS' if passed else 'FAIL'}")
+    results.append(passed)
+
+    # Block field: a uniform 4 px/10 min drift right is 24 px/h in every block
+    frame = rain_field((256, 256), seed=1)
+    field = compute_motion_field(frame, np.roll(frame, (0, 4), axis=(0, 1)), 600)
+    vy, vx = field.mean()
+    passed = field.coverage > 0.9 and abs(vy) < 1.0 and abs(vx - 24.0) < 1.0
+    print(f"Motion field: coverage {field.coverage:.0%}, mean ({vy:.2f}, {vx:.2f}) px/h -> {'PASS' if passed else 'FAIL'}")
+    results.append(passed)
+
+    # Empty frames carry no velocity
+    empty = np.zeros((128, 128), dtype=np.float32)
+    field = compute_motion_field(empty, empty, 600)
+    passed = field.mean() is None and field.dense() is None
+    print(f"Empty frames: coverage {field.coverage:.0%} -> {'PASS' if passed else 'FAIL'}")
+    results.append(passed)
+
+    all_passed = all(results)
+    print(f"\nOVERALL: {'ALL TESTS PASSED' if all_passed else 'SOME TESTS FAILED'}")
+    return all_passed
+
+
+if __name__ == "__main__":
+    sys.exit(0 if test_phase_correlation() else 1)
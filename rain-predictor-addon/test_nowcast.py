@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Check script for the extrapolation nowcast: a blob advected onto a known pixel
+"""
+
+import sys
+import os
+sys.path.insert(0, os.path.dirname(__file__))
+
+import numpy as np
+from scipy import ndimage
+
+from nowcast import arrival_minutes, coarsen_minutes, extrapolate
+
+
+def test_blob_arrival():
+    """A blob drifting at a constant velocity reaches a target pixel on schedule"""
+    print("=== TESTING NOWCAST ADVECTION ===\n")
+    results = []
+    shape = (100, 100)
+
+    # 5x5 blob centred on (20, 20), moving 30 px/h right and 15 px/h down
+    mask = np.zeros(shape, dtype=np.float32)
+    mask[18:23, 18:23] = 1.0
+    vy, vx = np.full(shape, 15.0), np.full(shape, 30.0)
+
+    # After 60 minutes the blob centre is at (35, 50)
+    forecast = list(extrapolate(mask, vy, vx, step_minutes=5, horizon_minutes=60))
+    centre = np.round(ndimage.center_of_mass(forecast[-1]))
+    passed = len(forecast) == 13 and np.array_equal(forecast[0], mask) and tuple(int(v) for v in centre) == (35, 50)
+    print(f"{len(forecast)} steps, blob centre after 60 min at {tuple(int(v) for v in centre)} "
+          f"(expected (35, 50)) -> {'PASS' if passed else 'FAIL'}")
+    results.append(passed)
+
+    minutes = arrival_minutes(mask, vy, vx, step_minutes=5, horizon_minutes=120)
+
+    # The leading edge (x = 22) reaches x = 42 after 20 px at 30 px/h = 40 minutes; y = 30 is covered by then
+    passed = minutes[20, 20] == 0 and minutes[30, 42] == 40
+    print(f"Raining now: {minutes[20, 20]:.0f} min, pixel (30, 42): {minutes[30, 42]:.0f} min "
+          f"(expected 0 and 40) -> {'PASS' if passed else 'FAIL'}")
+    results.append(passed)
+
+    # Pixels the blob never crosses, and pixels upwind of it, stay NaN
+    passed = bool(np.isnan(minutes[90, 5]) and np.isnan(minutes[5, 90]))
+    print(f"Untouched pixels: {minutes[90, 5]}, {minutes[5, 90]} -> {'PASS' if passed else 'FAIL'}")
+    results.append(passed)
+
+    # The coarse grid keeps the earliest arrival of each block
+    coarse = coarsen_minutes(minutes, 10)
+    passed = coarse.shape == (10, 10) and coarse[3, 4] == np.nanmin(minutes[30:40, 40:50])
+    print(f"Coarse grid {coarse.shape}, block (3, 4): {coarse[3, 4]:.0f} min -> {'PASS' if passed else 'FAIL'}")
+    results.append(passed)
+
+    all_passed = all(results)
+    print(f"\nOVERALL: {'ALL TESTS PASSED' if all_passed else 'SOME TESTS FAILED'}")
+    return all_passed
+
+
+if __name__ == "__main__":
+    sys.exit(0 if test_blob_arrival() else 1)
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Check script for the state channel: StateServer/StateClient round trip over a temporary socket
+"""
+
+import sys
+import os
+import tempfile
+import threading
+import time
+sys.path.insert(0, os.path.dirname(__file__))
+
+import state_channel
+from state_channel import StateClient, StateServer
+
+# Reconnect quickly so the restart case does not wait the production delay
+state_channel.RECONNECT_SECONDS = 0.1
+
+
+def wait_for(condition, timeout=5.0):
+    """Poll `condition` until it is true or the timeout passes"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.02)
+    return False
+
+
+def test_state_round_trip():
+    """Results flow server -> client, view bounds flow client -> server, and clients reconnect"""
+    print("=== TESTING STATE CHANNEL ROUND TRIP ===\n")
+    results = []
+    path = os.path.join(tempfile.mkdtemp(), "state.sock")
+
+    received = []
+    got_message = threading.Event()
+
+    def on_message(kind, data):
+        received.append((kind, data))
+        got_message.set()
+
+    server = StateServer(path, on_message=on_message)
+    server.start()
+    # Published before the client connects, so it arrives as the backlog
+    server.publish("analysis", {"time_to_rain": 25})
+
+    client = StateClient(path)
+    pushed = []
+    client.subscribe(lambda kind, data: pushed.append((kind, data)))
+    client.start()
+
+    passed = wait_for(lambda: client.get("analysis") == {"time_to_rain": 25})
+    print(f"Backlog on connect: {client.get('analysis')} -> {'PASS' if passed else 'FAIL'}")
+    results.append(passed)
+
+    server.publish("analysis", {"time_to_rain": 20})
+    passed = wait_for(lambda: client.get("analysis") == {"time_to_rain": 20}) and ("analysis", {"time_to_rain": 20}) in pushed
+    print(f"Pushed update: {client.get('analysis')}, listener saw {len(pushed)} message(s) -> {'PASS' if passed else 'FAIL'}")
+    results.append(passed)
+
+    bounds = {"north": -27.0, "south": -27.8, "east": 153.3, "west": 152.5}
+    sent = client.send("view_bounds", bounds)
+    passed = sent and got_message.wait(5) and received[-1] == ("view_bounds", bounds)
+    print(f"View bounds to server: sent {sent}, received {received[-1] if received else None} -> {'PASS' if passed else 'FAIL'}")
+    results.append(passed)
+
+    # The client reconnects to a restarted server and gets its latest result
+    server.close()
+    passed = wait_for(lambda: not client.connected)
+    server = StateServer(path)
+    server.start()
+    server.publish("analysis", {"time_to_rain": 5})
+    passed = passed and wait_for(lambda: client.get("analysis") == {"time_to_rain": 5})
+    print(f"After server restart: {client.get('analysis')} -> {'PASS' if passed else 'FAIL'}")
+    results.append(passed)
+    server.close()
+
+    all_passed = all(results)
+    print(f"\nOVERALL: {'ALL TESTS PASSED' if all_passed else 'SOME TESTS FAILED'}")
+    return all_passed
+
+
+if __name__ == "__main__":
+    sys.exit(0 if test_state_round_trip() else 1)
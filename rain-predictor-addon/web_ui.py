@@ -7,12 +7,18 @@ import json
 import math
 import time
 import logging
+import queue
+from concurrent.futures import ThreadPoolExecutor
 from typing import Optional, Tuple, Dict, Any, List
 
 import numpy as np
 import requests
 from PIL import Image
-from flask import Flask, render_template, jsonify, request
+from flask import Flask, Response, render_template, jsonify, request
+
+from mercator import lonlat_to_pixel, meters_per_pixel, tilexy_bounds
+from motion_field import MotionField, MotionFieldCache
+from state_channel import StateClient
 
 app = Flask(__name__)
 logging.basicConfig(level=logging.INFO)
@@ -26,6 +32,8 @@ RAIN_THRESHOLD = 65          # 60–75 works well; raise if motion looks noisy
 MAX_TILES = 8                # safety cap on tile grid size for a click
 META_TTL_SECONDS = 120       # cache RainViewer meta for 2 minutes
 TILE_COLOR_SCHEME = 2        # grayscale is derived from this color scheme when downloading tiles
+HA_FALLBACK_TTL_SECONDS = 60 # reuse entity states read while no analysis is available
+SSE_KEEPALIVE_SECONDS = 25   # comment sent on idle event streams so proxies keep them open
 
 # Persistence
 DATA_PATH = os.environ.get("DATA_PATH", "/data")
@@ -81,43 +89,61 @@ class HomeAssistantAPI:
 
 ha_api = HomeAssistantAPI()
 
+# Analysis results pushed by the predictor; started in __main__
+state_client = StateClient()
+
+def _fresh_ui_data(data):
+    """ui_data of a cached analysis if it is less than 10 minutes old"""
+    if data and time.time() - data.get('timestamp', 0) < 600:
+        return data.get('ui_data', {})
+    return None
+
 def get_all_data():
-    """Get all rain prediction data for the frontend from cache"""
-    cache_path = "/data/latest_analysis.json"
+    """Get all rain prediction data for the frontend, from memory or else the cache file"""
+    ui_data = _fresh_ui_data(state_client.get('analysis'))
+    if ui_data is not None:
+        return ui_data
     
+    cache_path = "/data/latest_analysis.json"
     try:
         if os.path.exists(cache_path):
             with open(cache_path, 'r') as f:
-                data = json.load(f)
-                # Check if cache is fresh (within 10 minutes)
-                if time.time() - data.get('timestamp', 0) < 600:
-                    logging.info("Returning data from cache")
-                    return data.get('ui_data', {})
+                ui_data = _fresh_ui_data(json.load(f))
+            if ui_data is not None:
+                logging.info("Returning data from cache")
+                return ui_data
         
         logging.warning("Cache missing or stale, returning defaults")
     except Exception as e:
         logging.error(f"Error reading cache: {e}")
 
-    # Fallback to current state from HA or defaults
+    return _ha_state_fallback()
+
+# Entity id and default for each UI field when the predictor has no fresh analysis
+HA_FALLBACK_ENTITIES = {
+    "time_to_rain": ("input_number.rain_arrival_minutes", "--"),
+    "distance": ("input_number.rain_prediction_distance", "--"),
+    "speed": ("input_number.rain_prediction_speed", "--"),
+    "direction": ("input_number.rain_cell_direction", "N/A"),
+    "bearing": ("input_number.bearing_to_rain_cell", "N/A"),
+    "rain_cell_latitude": ("input_number.rain_cell_latitude", None),
+    "rain_cell_longitude": ("input_number.rain_cell_longitude", None),
+}
+_ha_fallback = {"time": 0.0, "data": None}
+
+def _ha_state_fallback():
+    """Current entity states from HA, read concurrently and reused for HA_FALLBACK_TTL_SECONDS"""
+    if _ha_fallback["data"] is not None and time.time() - _ha_fallback["time"] < HA_FALLBACK_TTL_SECONDS:
+        return _ha_fallback["data"]
     try:
-        time_to_rain = ha_api.get_state("input_number.rain_arrival_minutes", "--")
-        distance = ha_api.get_state("input_number.rain_prediction_distance", "--")
-        speed = ha_api.get_state("input_number.rain_prediction_speed", "--")
-        direction = ha_api.get_state("input_number.rain_cell_direction", "N/A")
-        bearing = ha_api.get_state("input_number.bearing_to_rain_cell", "N/A")
-        rain_cell_lat = ha_api.get_state("input_number.rain_cell_latitude", None)
-        rain_cell_lng = ha_api.get_state("input_number.rain_cell_longitude", None)
-        
-        return {
-            "time_to_rain": str(time_to_rain),
-            "distance": str(distance),
-            "speed": str(speed),
-            "direction": str(direction),
-            "bearing": str(bearing),
-            "rain_cell_latitude": rain_cell_lat,
-            "rain_cell_longitude": rain_cell_lng,
-            "cells": []
-        }
+        with ThreadPoolExecutor(max_workers=len(HA_FALLBACK_ENTITIES)) as pool:
+            states = dict(zip(HA_FALLBACK_ENTITIES, pool.map(lambda item: ha_api.get_state(*item),
+                                                             HA_FALLBACK_ENTITIES.values())))
+        data = {key: (str(value) if key not in ("rain_cell_latitude", "rain_cell_longitude") else value)
+                for key, value in states.items()}
+        data["cells"] = []
+        _ha_fallback.update(time=time.time(), data=data)
+        return data
     except Exception as e:
         logging.error(f"Fallback failed: {e}")
         return {
@@ -143,6 +169,16 @@ def read_options_latlon(default_lat=-24.98, default_lng=151.86) -> Tuple[float,
         logging.warning(f"read_options_latlon failed: {e}")
     return float(default_lat), float(default_lng)
 
+def read_allowed_origin() -> str:
+    """Origin (e.g. http://homeassistant.local:8123) allowed to open /api/stream cross-site, or '' for none"""
+    try:
+        if os.path.exists(OPTIONS_PATH):
+            with open(OPTIONS_PATH, "r") as f:
+                return str((json.load(f).get("dashboard") or {}).get("allowed_origin") or "").rstrip("/")
+    except Exception as e:
+        logging.warning(f"read_allowed_origin failed: {e}")
+    return ""
+
 def write_options_latlon(lat: float, lng: float) -> None:
     try:
         os.makedirs(DATA_PATH, exist_ok=True)
@@ -163,6 +199,7 @@ def write_options_latlon(lat: float, lng: float) -> None:
 
 # ========== RainViewer helpers ==========
 _meta_cache: Dict[str, Any] = {"data": None, "ts": 0.0}
+_motion_cache = MotionFieldCache(max_entries=32)
 
 def _fetch_rainviewer_meta() -> Dict[str, Any]:
     now = time.time()
@@ -183,38 +220,18 @@ def _download_tile(ts: int, z: int, x: int, y: int, color: int = TILE_COLOR_SCHE
     # Convert to grayscale
     return Image.open(io.BytesIO(r.content)).convert("L")
 
-def _lonlat_to_tilexy(lon: float, lat: float, z: int) -> Tuple[int, int]:
-    n = 2 ** z
-    xtile = int((lon + 180.0) / 360.0 * n)
-    lat_rad = math.radians(lat)
-    ytile = int((1.0 - math.asinh(math.tan(lat_rad)) / math.pi) / 2.0 * n)
-    return xtile, ytile
-
-def _tilexy_bounds(west: float, south: float, east: float, north: float, z: int) -> Tuple[int, int, int, int]:
-    x1, y2 = _lonlat_to_tilexy(west, south, z)
-    x2, y1 = _lonlat_to_tilexy(east, north, z)
-    x_min, x_max = sorted([x1, x2])
-    y_min, y_max = sorted([y1, y2])
-    return x_min, x_max, y_min, y_max
-
-def _phase_correlation(a: np.ndarray, b: np.ndarray) -> Tuple[float, float, float]:
-    # a, b: 2D arrays (float32) same shape
-    A = np.fft.rfft2(a)
-    B = np.fft.rfft2(b)
-    R = A * np.conj(B)
-    R /= np.maximum(1e-6, np.abs(R))
-    r = np.fft.irfft2(R, s=a.shape)
-    maxpos = np.unravel_index(np.argmax(r), r.shape)
-    shifts = np.array(maxpos, dtype=np.float32)
-    h, w = a.shape
-    if shifts[0] > h // 2:
-        shifts[0] -= h
-    if shifts[1] > w // 2:
-        shifts[1] -= w
-    dy, dx = shifts  # rows (y), cols (x)
-    return float(dy), float(dx), float(r.max())
-
-def _avg_motion_over_view(meta: Dict[str, Any], bounds: Dict[str, float], zoom_for_tiles: Optional[int] = None) -> Optional[Tuple[float, float]]:
+def _frame_mosaic(ts: int, z: int, x_idxs: List[int], y_idxs: List[int]) -> np.ndarray:
+    """Rain mask (0/1) of the given tiles stitched into one array"""
+    tiles: List[np.ndarray] = []
+    for y in y_idxs:
+        row = [np.asarray(_download_tile(ts, z, x, y), dtype=np.float32) for x in x_idxs]
+        tiles.append(np.concatenate(row, axis=1))
+    canvas = np.concatenate(tiles, axis=0)
+    return (canvas >= RAIN_THRESHOLD).astype(np.float32)
+
+def _avg_motion_over_view(meta: Dict[str, Any], bounds: Dict[str, float], zoom_for_tiles: Optional[int] = None,
+                          point: Optional[Tuple[float, float]] = None) -> Optional[Tuple[float, float]]:
+    """(speed_kph, bearing) of rain over the view; local to `point` (lat, lng) when the field resolves it"""
     past = meta.get("radar", {}).get("past") or []
     if len(past) < 3:
         return None
@@ -224,56 +241,47 @@ def _avg_motion_over_view(meta: Dict[str, Any], bounds: Dict[str, float], zoom_f
     z = int(zoom_for_tiles or 6)
     z = max(3, min(8, z))
 
-    x_min, x_max, y_min, y_max = _tilexy_bounds(bounds["west"], bounds["south"], bounds["east"], bounds["north"], z)
+    x_min, x_max, y_min, y_max = tilexy_bounds(bounds["west"], bounds["south"], bounds["east"], bounds["north"], z)
     # Cap the grid size
+    step = 1
     if (x_max - x_min + 1) * (y_max - y_min + 1) > MAX_TILES * MAX_TILES:
         step = math.ceil((x_max - x_min + 1) / MAX_TILES)
-        x_idxs = list(range(x_min, x_max + 1, step))
-        y_idxs = list(range(y_min, y_max + 1, step))
-    else:
-        x_idxs = list(range(x_min, x_max + 1))
-        y_idxs = list(range(y_min, y_max + 1))
-
-    stacks: List[np.ndarray] = []
-    for f in frames:
-        tiles: List[np.ndarray] = []
-        for y in y_idxs:
-            row = []
-            for x in x_idxs:
-                im = _download_tile(f["time"], z, x, y)
-                row.append(np.asarray(im, dtype=np.float32))
-            tiles.append(np.concatenate(row, axis=1))
-        canvas = np.concatenate(tiles, axis=0) if tiles else None
-        if canvas is None:
-            return None
-        # Threshold to rain mask
-        mask = (canvas >= RAIN_THRESHOLD).astype(np.float32)
-        stacks.append(mask)
-
-    shifts: List[Tuple[float, float]] = []
-    peaks: List[float] = []
-    for i in range(1, len(stacks)):
-        dy, dx, peak = _phase_correlation(stacks[i - 1], stacks[i])
-        shifts.append((dy, dx))
-        peaks.append(peak)
-    if not shifts:
+    x_idxs = list(range(x_min, x_max + 1, step))
+    y_idxs = list(range(y_min, y_max + 1, step))
+    if not x_idxs or not y_idxs:
+        return None
+
+    # Motion fields are cached per frame pair and tile grid; only download frames an uncached pair needs
+    grid = (z, tuple(x_idxs), tuple(y_idxs))
+    keys = [(frames[i - 1]["time"], frames[i]["time"]) + grid for i in range(1, len(frames))]
+    needed = {j for i, key in enumerate(keys, start=1) if key not in _motion_cache for j in (i - 1, i)}
+    masks = {j: _frame_mosaic(frames[j]["time"], z, x_idxs, y_idxs) for j in sorted(needed)}
+
+    fields = [
+        _motion_cache.get_or_compute(key, masks.get(i - 1), masks.get(i), frames[i]["time"] - frames[i - 1]["time"])
+        for i, key in enumerate(keys, start=1)
+    ]
+    field = MotionField.average(fields)
+    if field is None:
         return None
 
-    weights = np.maximum(1e-6, np.array(peaks, dtype=np.float32))
-    dy = float(np.average([s[0] for s in shifts], weights=weights))
-    dx = float(np.average([s[1] for s in shifts], weights=weights))
+    velocity = None
+    if point is not None and step == 1:
+        px, py = lonlat_to_pixel(point[1], point[0], z)
+        vy, vx = field.at(py - y_min * 256, px - x_min * 256)
+        if np.isfinite(vy) and np.isfinite(vx):
+            velocity = (float(vy), float(vx))
+    if velocity is None:
+        velocity = field.mean()
+    if velocity is None:
+        return None
+    vy, vx = velocity  # pixels per hour, +vy is south
 
     # Pixels -> meters per pixel at this latitude and zoom (WebMercator)
-    center_lat = (bounds["north"] + bounds["south"]) / 2.0
-    m_per_pixel = 156543.03392 * math.cos(math.radians(center_lat)) / (2 ** z)
-
-    # RainViewer "past" frames are ~5 minutes apart
-    minutes_per_step = 5.0
-    # dy positive = south, so invert to meters north
-    meters_y = -dy * m_per_pixel
-    meters_x = dx * m_per_pixel
-    meters_per_hour_x = meters_x * (60.0 / minutes_per_step)
-    meters_per_hour_y = meters_y * (60.0 / minutes_per_step)
+    center_lat = point[0] if point is not None else (bounds["north"] + bounds["south"]) / 2.0
+    m_per_pixel = float(meters_per_pixel(center_lat, z))
+    meters_per_hour_x = vx * m_per_pixel
+    meters_per_hour_y = -vy * m_per_pixel
     speed_kph = math.hypot(meters_per_hour_x, meters_per_hour_y) / 1000.0
 
     # Bearing: 0°=N, 90°=E
@@ -293,6 +301,46 @@ def index():
 def api_data():
     return jsonify(get_all_data())
 
+@app.route("/api/stream")
+def api_stream():
+    """Server-sent events: the current data at once, then every analysis the predictor publishes"""
+    updates = queue.Queue(maxsize=1)
+
+    def on_message(kind, data):
+        ui_data = _fresh_ui_data(data) if kind == "analysis" else None
+        if ui_data is None:
+            return
+        # A client that has not read the previous update only needs the newest one
+        try:
+            updates.get_nowait()
+        except queue.Empty:
+            pass
+        try:
+            updates.put_nowait(ui_data)
+        except queue.Full:
+            pass
+
+    def stream():
+        state_client.subscribe(on_message)
+        try:
+            yield f"data: {json.dumps(get_all_data())}\n\n"
+            while True:
+                try:
+                    yield f"data: {json.dumps(updates.get(timeout=SSE_KEEPALIVE_SECONDS))}\n\n"
+                except queue.Empty:
+                    yield ": keep-alive\n\n"
+        finally:
+            state_client.unsubscribe(on_message)
+
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    # The dashboard card runs on Home Assistant's origin, not the add-on's
+    allowed_origin = read_allowed_origin()
+    if allowed_origin:
+        headers["Vary"] = "Origin"
+        if allowed_origin in ("*", request.headers.get("Origin")):
+            headers["Access-Control-Allow-Origin"] = allowed_origin
+    return Response(stream(), mimetype="text/event-stream", headers=headers)
+
 @app.route("/api/set_location", methods=["POST"])
 def set_location():
     logging.info("set_location endpoint called")
@@ -339,7 +387,7 @@ def update_config():
 
 @app.route("/api/manual_selection", methods=["POST"])
 def manual_selection():
-    """Estimate prevailing rain motion over the current map view and return a vector."""
+    """Estimate rain motion at the clicked point from the motion field over the current map view."""
     logging.info("manual_selection endpoint called")
     try:
         data = request.get_json(force=True) or {}
@@ -369,12 +417,12 @@ def manual_selection():
             "west": lng - pad,
         }
 
-    # Compute average motion
+    # Compute motion at the click
     speed_kph = 0.0
     direction_deg = 0.0
     try:
         meta = _fetch_rainviewer_meta()
-        result = _avg_motion_over_view(meta, bounds, zoom_for_tiles=zoom)
+        result = _avg_motion_over_view(meta, bounds, zoom_for_tiles=zoom, point=(lat, lng))
         if result:
             speed_kph, direction_deg = result
         else:
@@ -403,7 +451,7 @@ def update_view_bounds():
         logging.info(f"View bounds update: center=({center.get('lat', 0):.4f}, {center.get('lng', 0):.4f}), zoom={zoom}")
         logging.info(f"View bounds update: size={view_size.get('width', 0):.1f}km x {view_size.get('height', 0):.1f}km")
         
-        # Store view bounds in shared file for rain predictor to read
+        # Push view bounds to the rain predictor, or leave them in the shared file if it is not connected
         try:
             view_data = {
                 'bounds': bounds,
@@ -413,10 +461,12 @@ def update_view_bounds():
                 'timestamp': time.time()
             }
             
-            with open('/tmp/view_bounds.json', 'w') as f:
-                json.dump(view_data, f)
-            
-            logging.info("View bounds saved to shared file for rain predictor")
+            if state_client.send('view_bounds', view_data):
+                logging.info("View bounds sent to rain predictor")
+            else:
+                with open('/tmp/view_bounds.json', 'w') as f:
+                    json.dump(view_data, f)
+                logging.info("View bounds saved to shared file for rain predictor")
             
         except Exception as e:
             logging.error(f"Error saving view bounds: {e}", exc_info=True)
@@ -432,5 +482,6 @@ def health_check():
     return "OK", 200
 
 if __name__ == "__main__":
+    state_client.start()
     # Port 8099 to match your addon setup
     app.run(host="0.0.0.0", port=8099, debug=False)
\ No newline at end of file